@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Check chunked JSX generation and the resume bookkeeping of run_jsx_chunks without InDesign.
+
+Writes a generated document (body paragraphs around a table split into segments) with
+write_jsx(..., chunk_ops=N), checks that no chunk boundary falls inside the table's segment
+run, then drives run_jsx_chunks with a fake runner that records chunks in the state file the
+way the chunk scripts do:
+
+  - a runner that returns True without advancing "done" counts as a failure,
+  - the run stops after JSX_CHUNK_RETRIES failed retries of the same chunk,
+  - calling run_jsx_chunks again resumes at done+1.
+
+    python benchmarks/chunk_resume_check.py
+    python benchmarks/chunk_resume_check.py --chunk-ops 5 --segments 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xml_to_idml as X  # noqa: E402
+from paragraph_ir import Paragraph, TableRef, TextRun  # noqa: E402
+
+
+def build_paragraphs(before, segments, after):
+    paras = [Paragraph("Level1", [TextRun("Chapter 1")])]
+    paras += [Paragraph("Body", [TextRun(f"before {i}")]) for i in range(before)]
+    for index in range(segments):
+        table = {
+            "segment": {"index": index, "id": "tbl1", "count": segments, "firstRow": index * 2},
+            "rows": 2, "cols": 2,
+            "data": [[f"r{index * 2 + r}c{c}" for c in range(2)] for r in range(2)],
+        }
+        json_text = json.dumps(table)
+        paras.append(Paragraph("Body", [TableRef(json_text, f"[[TABLE {json_text}]]")]))
+    paras += [Paragraph("Body", [TextRun(f"after {i}")]) for i in range(after)]
+    return paras
+
+
+def read_ops(script):
+    with open(script, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("var __OPS = "):
+                return json.loads(line[len("var __OPS = "):-1])["ops"]
+    raise RuntimeError(f"no op stream in {script}")
+
+
+def check_boundaries(state_path, chunk_ops):
+    base_dir = os.path.dirname(state_path)
+    with open(state_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f)["chunks"]
+    problems = []
+    longest = 0
+    for number, name in enumerate(chunks, 1):
+        ops = [op for op in read_ops(os.path.join(base_dir, name)) if op[0] != "end"]
+        longest = max(longest, len(ops))
+        tables = [op for op in ops if op[0] == "tbl"]
+        if tables and tables[-1][2] == 0:
+            problems.append(f"part {number} ends inside a table segment run")
+        if tables and ops[0][0] == "tbl" and tables[0][1].get("segment", {}).get("index", 0) >= 1:
+            problems.append(f"part {number} starts with a continuation segment")
+    ok = not problems and len(chunks) > 1 and longest > chunk_ops
+    print(f"boundary   parts={len(chunks)}  chunk_ops={chunk_ops}  longest_part={longest}  "
+          f"{'ok' if ok else 'FAILED ' + '; '.join(problems or ['table run was never deferred'])}")
+    return ok
+
+
+class FakeRunner(object):
+    """Stands in for run_indesign_*: plan maps chunk index -> list of outcomes for its attempts.
+
+    "ok" records the chunk as done in the state file, "stall" returns True without doing so
+    (the script ran but stopped early), "fail" returns False (InDesign could not be driven).
+    """
+
+    def __init__(self, state_path, plan=None):
+        self.state_path = state_path
+        self.plan = {k: list(v) for k, v in (plan or {}).items()}
+        self.calls = []
+
+    def __call__(self, script):
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        index = state["chunks"].index(os.path.basename(script)) + 1
+        self.calls.append(index)
+        outcomes = self.plan.get(index)
+        outcome = outcomes.pop(0) if outcomes else "ok"
+        if outcome != "ok":
+            return outcome == "stall"
+        state["done"] = index
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+        return True
+
+
+def run_chunks(state_path, runner, retries):
+    # run_jsx_chunks reports progress on stdout; keep the check output to its own lines
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = X.run_jsx_chunks(state_path, runner, retries=retries)
+    with open(state_path, "r", encoding="utf-8") as f:
+        return ok, json.load(f)
+
+
+def check_resume(state_path, retries):
+    with open(state_path, "r", encoding="utf-8") as f:
+        count = len(json.load(f)["chunks"])
+    results = []
+
+    # chunk 2 stalls once: retried (and finished) if retries allow, otherwise the run stops there
+    runner = FakeRunner(state_path, {2: ["stall"]})
+    ok, state = run_chunks(state_path, runner, retries)
+    if retries:
+        passed = ok and state["done"] == count and runner.calls == [1, 2, 2] + list(range(3, count + 1))
+    else:
+        passed = not ok and state["done"] == 1 and runner.calls == [1, 2]
+    results.append(("stall", passed, f"calls={runner.calls}"))
+
+    # chunk 2 never advances: stop after the retries, leaving done at 1
+    _reset_done(state_path)
+    runner = FakeRunner(state_path, {2: ["stall"] * (retries + 5)})
+    ok, state = run_chunks(state_path, runner, retries)
+    expected = [1] + [2] * (retries + 1)
+    results.append(("retries", not ok and state["done"] == 1 and runner.calls == expected,
+                    f"calls={runner.calls} done={state['done']}"))
+
+    # a second call picks up at done+1 and finishes
+    runner = FakeRunner(state_path)
+    ok, state = run_chunks(state_path, runner, retries)
+    expected = list(range(2, count + 1))
+    results.append(("resume", ok and state["done"] == count and runner.calls == expected,
+                     f"calls={runner.calls}"))
+
+    for name, passed, detail in results:
+        print(f"{name:<10} retries={retries}  {'ok' if passed else 'FAILED'}  {detail}")
+    return all(passed for _, passed, _ in results)
+
+
+def _reset_done(state_path):
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    state["done"] = 0
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check chunked JSX generation and resume bookkeeping")
+    parser.add_argument("--chunk-ops", type=int, default=6, help="ops per chunk passed to write_jsx")
+    parser.add_argument("--segments", type=int, default=6, help="segments of the split table")
+    parser.add_argument("--retries", type=int, default=X.JSX_CHUNK_RETRIES, help="retries per chunk")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsx_path = os.path.join(tmp_dir, "check.jsx")
+        # the heading writes two ops, so the first segment fills the first chunk and a plain
+        # op count would cut through the rest of the table
+        paras = build_paragraphs(max(args.chunk_ops - 3, 0), args.segments, args.chunk_ops * 2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            X.write_jsx(jsx_path, paras, chunk_ops=args.chunk_ops)
+        state_path = X.chunk_state_path_for(jsx_path)
+        ok = check_boundaries(state_path, args.chunk_ops)
+        ok = check_resume(state_path, args.retries) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the formatted_output.xml reader in xml_to_idml.
+
+Compares the iterative _collect_inline_with_notes with the recursive version it replaced
+(kept below as the reference), then times iter_paragraphs_with_levels on each available
+parser backend, and checks that a deeply nested paragraph no longer hits the recursion limit.
+The two collectors run at about the same speed (within run-to-run noise); what the
+rewrite buys is that nesting depth is no longer bound by the recursion limit.
+
+    python benchmarks/xml_reader_bench.py                 # synthetic inline-heavy XML
+    python benchmarks/xml_reader_bench.py formatted_output.xml --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xml_to_idml as X  # noqa: E402
+from paragraph_ir import ImageRef, NoteRef, append_text, strip_tokens, tokens_to_marker_text  # noqa: E402
+
+_REFERENCE_STYLE_TAGS = {
+    "i": X.STYLE_I, "em": X.STYLE_I,
+    "b": X.STYLE_B, "strong": X.STYLE_B,
+    "u": X.STYLE_U,
+    "sup": X.STYLE_SUP,
+    "sub": X.STYLE_SUB,
+}
+
+
+def collect_inline_recursive(elem, foot_map, end_map, tokens=None, style=0):
+    """The recursive collector as it was before the explicit-stack rewrite."""
+    if tokens is None:
+        tokens = []
+    if elem.text:
+        append_text(tokens, elem.text, style)
+    for c in elem:
+        tag = X._strip_ns(c.tag)
+        if tag in ("meta", "prop", "footnotes", "endnotes"):
+            if c.tail: append_text(tokens, c.tail, style)
+            continue
+        flag = _REFERENCE_STYLE_TAGS.get(tag)
+        if flag:
+            collect_inline_recursive(c, foot_map, end_map, tokens, style | flag)
+            if c.tail: append_text(tokens, c.tail, style)
+            continue
+        if tag in ("footnote", "fn", "endnote", "en"):
+            note = X._collect_all_text(c).strip()
+            tokens.append(NoteRef("FN" if tag in ("footnote", "fn") else "EN", None, note, style))
+            if c.tail: append_text(tokens, c.tail, style)
+            continue
+        if tag in ("fnref", "enref"):
+            rid = c.attrib.get("id") or c.attrib.get("rid") or c.attrib.get("ref")
+            note = (foot_map if tag == "fnref" else end_map).get(str(rid), "")
+            tokens.append(NoteRef("FN" if tag == "fnref" else "EN", str(rid), note, style))
+            X._debug_log(
+                f"[{tag.upper()}] id={rid} has_note={bool(note)} noteSnippet={X._log_snippet(note)} tailSnippet={X._log_snippet(c.tail)}"
+            )
+            if c.tail: append_text(tokens, c.tail, style)
+            continue
+        if tag in ("img", "image", "graphic", "figureimage", "inlinegraphic"):
+            src = c.attrib.get("src") or c.attrib.get("href") or ""
+            if src:
+                attr_text = f'src="{src}" w="{c.attrib.get("w", "")}" h="{c.attrib.get("h", "")}" align=""'
+                tokens.append(ImageRef(attr_text, f"[[IMG {attr_text}]]"))
+            if c.tail: append_text(tokens, c.tail, style)
+            continue
+        collect_inline_recursive(c, foot_map, end_map, tokens, style)
+        if c.tail: append_text(tokens, c.tail, style)
+    return tokens
+
+
+def build_xml(path, chapters, paras, seed=1):
+    rnd = random.Random(seed)
+    inline = ["<i>italic</i>", "<b>bold <sup>2</sup></b>", "<span data-font=\"x\">span</span>",
+              "<u>under <i>both</i></u>", None]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<document>\n')
+        for c in range(chapters):
+            f.write(f"<chapter><h1>Chapter {c}</h1>\n")
+            for _ in range(paras):
+                parts = []
+                for _ in range(rnd.randint(3, 12)):
+                    piece = rnd.choice(inline) or f'<fnref id="{rnd.randint(1, 500)}"/>'
+                    parts.append("text &amp; more " + piece)
+                f.write("<p>" + " ".join(parts) + " tail</p>\n")
+            f.write("</chapter>\n")
+        f.write("<footnotes>")
+        f.write("".join(f'<footnote id="{i}">note {i} body</footnote>' for i in range(1, 501)))
+        f.write("</footnotes>\n</document>\n")
+
+
+def best_of(repeat, fn):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        took = time.perf_counter() - start
+        best = took if best is None else min(best, took)
+    return best, result
+
+
+def bench_collector(xml_path, repeat):
+    root = ET.parse(xml_path).getroot()
+    foot_map, end_map = {}, {}
+    for kind, target in (("footnote", foot_map), ("endnote", end_map)):
+        for note in root.iter(kind):
+            target[note.get("id")] = X._collect_all_text(note).strip()
+    paras = [e for e in root.iter() if X._strip_ns(e.tag) in ("p", "title") or X._hn_re.match(X._strip_ns(e.tag))]
+
+    def run(collect):
+        return [tokens_to_marker_text(strip_tokens(collect(p, foot_map, end_map))) for p in paras]
+
+    t_rec, out_rec = best_of(repeat, lambda: run(collect_inline_recursive))
+    t_it, out_it = best_of(repeat, lambda: run(X._collect_inline_with_notes))
+    print(f"collector  paragraphs={len(paras)}  recursive={t_rec:.3f}s  iterative={t_it:.3f}s  "
+          f"speedup={t_rec / t_it:.2f}x  same_output={out_rec == out_it}")
+
+
+def bench_reader(xml_path, repeat):
+    backends = ["etree"] + (["lxml"] if X.LXML_ETREE is not None else [])
+    saved = X.XML_READER_BACKEND
+    try:
+        for backend in backends:
+            X.XML_READER_BACKEND = backend
+            took, count = best_of(repeat, lambda: sum(1 for _ in X.iter_paragraphs_with_levels(xml_path)))
+            print(f"reader     backend={backend:<6} paragraphs={count}  {took:.3f}s")
+    finally:
+        X.XML_READER_BACKEND = saved
+
+
+def check_deep_nesting(depth):
+    elem = ET.Element("p")
+    node = elem
+    for _ in range(depth):
+        node = ET.SubElement(node, "span")
+    node.text = "deep"
+    try:
+        collect_inline_recursive(elem, {}, {})
+        recursive = "ok"
+    except RecursionError:
+        recursive = "RecursionError"
+    text = tokens_to_marker_text(X._collect_inline_with_notes(elem, {}, {}))
+    iterative = "ok" if text == "deep" else repr(text)
+    print(f"nesting    depth={depth}  recursive={recursive}  iterative={iterative}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the formatted_output.xml reader")
+    parser.add_argument("xml", nargs="?", help="XML to read (default: a generated inline-heavy document)")
+    parser.add_argument("--chapters", type=int, default=100, help="chapters in the generated XML")
+    parser.add_argument("--paras", type=int, default=200, help="paragraphs per generated chapter")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("--depth", type=int, default=5000, help="nesting depth for the recursion check")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    xml_path = args.xml
+    if not xml_path:
+        tmp_dir = tempfile.TemporaryDirectory()
+        xml_path = os.path.join(tmp_dir.name, "bench.xml")
+        build_xml(xml_path, args.chapters, args.paras)
+    try:
+        print(f"xml: {xml_path} ({os.path.getsize(xml_path) / 1e6:.1f} MB)")
+        bench_collector(xml_path, args.repeat)
+        bench_reader(xml_path, args.repeat)
+        check_deep_nesting(args.depth)
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,7 @@ import hashlib
 import time
 import zipfile
 import logging
+from itertools import chain, islice
 from xml.etree import ElementTree as ET
 from typing import Optional
 
@@ -54,10 +55,11 @@ if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
 import xml_to_idml as X
-from docx_to_xml_outline_notes_v13 import DOCXOutlineExporter
-from xml_to_idml import XML_PATH, extract_paragraphs_with_levels, write_jsx, JSX_PATH
+from docx_to_xml_outline_notes_v13 import DOCXOutlineExporter, DocxPackage
+from xml_to_idml import XML_PATH, write_jsx, JSX_PATH
 from xml_to_idml import AUTO_RUN_MACOS, AUTO_RUN_WINDOWS, run_indesign_windows, run_indesign_macos
 from xml_to_idml import LOG_PATH
+from paragraph_ir import Paragraph, TableRef, is_table_continuation, split_media
 from pipeline_logger import PipelineLogger
 import re
 
@@ -147,11 +149,10 @@ def _debug_log(message: str):
         PIPELINE_LOGGER.debug(message)
 
 
-def _read_docx_app_props(docx_path: str) -> dict:
+def _read_docx_app_props(package: DocxPackage) -> dict:
     stats = {"pages": None, "paragraphs": None, "tables": None}
     try:
-        with zipfile.ZipFile(docx_path) as zf:
-            data = zf.read("docProps/app.xml")
+        data = package.read("docProps/app.xml")
         root = ET.fromstring(data)
         for node in root.iter():
             tag = node.tag.split("}", 1)[-1]
@@ -236,11 +237,12 @@ def _load_caption_rules():
 
 def _apply_caption_styles(paragraphs, rules):
     """
-    Given list of (style, text), return new list with figure/table caption styles applied.
-    只调整样式名，不移动/删除段落。
+    Given Paragraph (or (style, text)) items, yield them with figure/table caption styles applied.
+    只调整样式名，不移动/删除段落；逐段处理，可直接接在流式段落源之后。
     """
     if not rules or not rules.get("enabled", True):
-        return paragraphs
+        yield from paragraphs
+        return
     fig_cfg = rules.get("figure") or {}
     tab_cfg = rules.get("table") or {}
     fig_style = (fig_cfg.get("style") or "").strip()
@@ -250,18 +252,43 @@ def _apply_caption_styles(paragraphs, rules):
     fig_re = [re.compile(p, re.IGNORECASE) for p in fig_patterns] if fig_patterns else []
     tab_re = [re.compile(p, re.IGNORECASE) for p in tab_patterns] if tab_patterns else []
 
-    out = []
-    for sty, txt in paragraphs:
+    for para in paragraphs:
+        if isinstance(para, Paragraph):
+            sty = para.style
+            # captions start with plain text; the runs are matched without serializing the paragraph
+            stripped = para.leading_text().strip()
+        else:
+            sty, txt = para
+            stripped = (txt or "").strip()
         new_style = sty
-        stripped = (txt or "").strip()
         if stripped and fig_style and fig_re and sty.lower() in ("body",):
             if any(r.match(stripped) for r in fig_re):
                 new_style = fig_style
         if stripped and new_style == sty and tab_style and tab_re and sty.lower() in ("body",):
             if any(r.match(stripped) for r in tab_re):
                 new_style = tab_style
-        out.append((new_style, txt))
-    return out
+        if new_style == sty:
+            yield para
+        elif isinstance(para, Paragraph):
+            yield para.restyled(new_style)
+        else:
+            yield (new_style, txt)
+
+
+def _count_converted(paragraphs, counts):
+    """Pass paragraphs through unchanged, counting them and their tables for the summary report."""
+    for para in paragraphs:
+        counts["paragraphs"] += 1
+        if isinstance(para, Paragraph):
+            tokens = para.tokens
+        else:
+            text = para[1]
+            tokens = split_media(text) if text and "[[TABLE" in text else ()
+        # continuation segments of a split table belong to the table counted at segment 0
+        counts["tables"] += sum(
+            1 for tok in tokens if type(tok) is TableRef and not is_table_continuation(tok.json_text)
+        )
+        yield para
 
 
 def _verify_flow(cli_password: str | None) -> bool:
@@ -341,9 +368,12 @@ def main(argv=None):
     parser.add_argument("--no-images", action="store_true", help="不处理图片")
     parser.add_argument("--no-tables", action="store_true", help="不处理表格")
     parser.add_argument("--no-textboxes", action="store_true", default=True, help=argparse.SUPPRESS)
+    parser.add_argument("--stream", action="store_true", help="流式读取 word/document.xml，不加载完整 DOM（超大文档降低内存峰值）")
     parser.add_argument("--log-dir", help="日志文件目录")
     parser.add_argument("--debug-log", action="store_true", help=argparse.SUPPRESS)
     parser.add_argument("--no-run", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--payload-sidecar", action="store_true", help="正文/表格数据写入 JSX 旁的 .payload.jsonl，由脚本运行时逐行读取")
+    parser.add_argument("--chunk-ops", type=int, default=None, help="把 JSX 拆成每段约 N 个操作的多个脚本依次执行，失败后可用 xml_to_idml.py --resume 续跑")
     parser.add_argument("--no-inline-list-labels", dest="inline_list_labels", action="store_false", help="不把列表编号前缀写回正文，仅保留为元数据（默认写回，与 Word 视觉一致）")
     parser.set_defaults(inline_list_labels=True)
     args = parser.parse_args(argv)
@@ -384,7 +414,7 @@ def main(argv=None):
         f"[ARGS] mode={args.mode} regex_cfg={args.regex_config or '(default)'} "
         f"regex_max_depth={args.regex_max_depth if args.regex_max_depth is not None else '(default 200)'} "
         f"skip_images={args.no_images} skip_tables={args.no_tables} "
-        f"skip_textboxes={args.no_textboxes} template={eff_template} out={getattr(X, 'IDML_OUT_PATH', None)} "
+        f"skip_textboxes={args.no_textboxes} stream={args.stream} template={eff_template} out={getattr(X, 'IDML_OUT_PATH', None)} "
         f"log_dir={args.log_dir or '(default)'} no_run={args.no_run}"
     )
 
@@ -407,6 +437,10 @@ def main(argv=None):
     X.LOG_PATH = str(PIPELINE_LOGGER.jsx_event_log_path)
     LOG_PATH = X.LOG_PATH
     X.LOG_WRITE = args.debug_log
+    if args.payload_sidecar:
+        X.JSX_PAYLOAD_SIDECAR = True
+    if args.chunk_ops is not None:
+        X.JSX_CHUNK_OPS = max(args.chunk_ops, 0)
     if args.debug_log:
         # reduce console noise; forward all logs to pipeline debug log
         root_logger = logging.getLogger()
@@ -433,67 +467,77 @@ def main(argv=None):
     _debug_log(arg_debug_line)
 
     # 1) XML
-    docx_meta = _read_docx_app_props(input_path)
-
-    exporter = DOCXOutlineExporter(
-        input_path,
-        mode=args.mode,
-        regex_config_path=args.regex_config,
-        regex_max_depth=args.regex_max_depth,
-        skip_images=args.no_images,
-        skip_tables=args.no_tables,
-        skip_textboxes=args.no_textboxes,
-        inline_list_labels=args.inline_list_labels,
-    )
-    if args.mode == "regex":
-        rules_path = getattr(exporter, "regex_rules_path", None)
-        if rules_path:
-            def _is_under(base_dir: Optional[str], target: str) -> bool:
-                try:
-                    if not base_dir:
+    # the shared archive handle is closed even if the exporter raises
+    with DocxPackage(input_path) as docx_package:
+        docx_meta = _read_docx_app_props(docx_package)
+
+        exporter = DOCXOutlineExporter(
+            input_path,
+            mode=args.mode,
+            regex_config_path=args.regex_config,
+            regex_max_depth=args.regex_max_depth,
+            skip_images=args.no_images,
+            skip_tables=args.no_tables,
+            skip_textboxes=args.no_textboxes,
+            inline_list_labels=args.inline_list_labels,
+            streaming=args.stream,
+            package=docx_package,
+        )
+        if args.mode == "regex":
+            rules_path = getattr(exporter, "regex_rules_path", None)
+            if rules_path:
+                def _is_under(base_dir: Optional[str], target: str) -> bool:
+                    try:
+                        if not base_dir:
+                            return False
+                        base_abs = os.path.abspath(base_dir)
+                        return os.path.commonprefix([base_abs, os.path.abspath(target)]) == base_abs
+                    except Exception:
                         return False
-                    base_abs = os.path.abspath(base_dir)
-                    return os.path.commonprefix([base_abs, os.path.abspath(target)]) == base_abs
-                except Exception:
-                    return False
 
-            onefile_temp = os.environ.get("NUITKA_ONEFILE_TEMP")
-            onefile_parent = os.environ.get("NUITKA_ONEFILE_PARENT")
-            if _is_under(onefile_temp, rules_path) or _is_under(onefile_parent, rules_path):
-                _log_user("[INFO] regex 规则使用内置默认")
+                onefile_temp = os.environ.get("NUITKA_ONEFILE_TEMP")
+                onefile_parent = os.environ.get("NUITKA_ONEFILE_PARENT")
+                if _is_under(onefile_temp, rules_path) or _is_under(onefile_parent, rules_path):
+                    _log_user("[INFO] regex 规则使用内置默认")
+                else:
+                    _log_user(f"[INFO] regex 规则来源: {rules_path}")
             else:
-                _log_user(f"[INFO] regex 规则来源: {rules_path}")
-        else:
-            _log_user("[INFO] regex 规则使用内置默认")
-    export_summary = exporter.process(XML_PATH)
+                _log_user("[INFO] regex 规则使用内置默认")
+        # XML 仅作调试产物：未开启 debug-log 时不写出，段落直接在进程内交给 JSX 生成
+        export_summary = exporter.process(XML_PATH, write_xml=args.debug_log)
     if not export_summary:
         export_summary = exporter.summary()
     image_stats = export_summary.get("image_fragments", 0) or 0
+    image_errors = export_summary.get("image_errors") or []
+    if image_errors:
+        _log_user(f"[WARN] 图片导出失败 {len(image_errors)} 个")
+        for msg in image_errors:
+            _debug_log(f"[IMG-EXPORT] {msg}")
     if args.debug_log:
         _log_user(f"[OK] mode={args.mode} XML saved -> {XML_PATH}")
 
-    # 2)  XML -> paragraphs
-    paragraphs = extract_paragraphs_with_levels(XML_PATH)
+    # 2)  tree -> paragraphs，逐段流入 write_jsx
     cap_rules = _load_caption_rules()
-    paragraphs = _apply_caption_styles(paragraphs, cap_rules)
-    if args.debug_log:
-        _log_user(f"[INFO] 解析到 {len(paragraphs)} 段；示例前3段: {paragraphs[:3]}")
+    converted = {"paragraphs": 0, "tables": 0}
+    paragraphs = _count_converted(_apply_caption_styles(exporter.iter_paragraphs(), cap_rules), converted)
+    sample = list(islice(paragraphs, 3))
     if PIPELINE_LOGGER and args.debug_log:
         PIPELINE_LOGGER.debug(
             f"[DOCX2IDML] skip_flags images={args.no_images} tables={args.no_tables} textboxes={args.no_textboxes}"
         )
 
-    write_jsx(JSX_PATH, paragraphs)
+    write_jsx(JSX_PATH, chain(sample, paragraphs))
     if args.debug_log:
+        _log_user(f"[INFO] 解析到 {converted['paragraphs']} 段；示例前3段: {sample}")
         _log_user(f"[OK] JSX 写入: {JSX_PATH}")
         _log_user(f"[INFO] JSX 模板来源: {X.TEMPLATE_PATH}")
         _log_user(f"[INFO] JSX 事件日志: {LOG_PATH}")
 
     ran = False
     if AUTO_RUN_WINDOWS and sys.platform.startswith("win"):
-        ran = run_indesign_windows(JSX_PATH)
+        ran = X.run_jsx(JSX_PATH, run_indesign_windows)
     elif AUTO_RUN_MACOS and sys.platform == "darwin":
-        ran = run_indesign_macos(JSX_PATH)
+        ran = X.run_jsx(JSX_PATH, run_indesign_macos)
 
     # 生成 IDML 文件名与输入 DOCX 同名
     try:
@@ -508,7 +552,10 @@ def main(argv=None):
     _log_user("\n=== 完成 ===")
     if args.debug_log:
         _log_user(f"XML: {XML_PATH}")
-        _log_user(f"JSX: {JSX_PATH}")
+        jsx_shown, data_shown = X.reported_jsx_paths(JSX_PATH)
+        _log_user(f"JSX: {jsx_shown}")
+        if data_shown:
+            _log_user(f"DATA: {data_shown}")
         _log_user(f"LOG: {LOG_PATH}")
 
     _log_user(f"IDML: {getattr(X, 'IDML_OUT_PATH', None)}")
@@ -524,12 +571,8 @@ def main(argv=None):
     if ran:
         _log_user("InDesign 已执行 JSX；若设置 AUTO_EXPORT_IDML=True，将在脚本目录生成idml文件。")
 
-    converted_tables = 0
-    for _, text in paragraphs:
-        if not text:
-            continue
-        converted_tables += text.count("[[TABLE")
-    converted_paragraphs = len(paragraphs)
+    converted_tables = converted["tables"]
+    converted_paragraphs = converted["paragraphs"]
     converted_images = image_stats
     converted_pages = None
     if ran:
@@ -555,7 +598,15 @@ def main(argv=None):
     _log_user(summary_report)
     # 清理中间产物：未开启 debug-log 时移除 XML 和 JSX，避免暴露技术文件
     if not args.debug_log:
-        for path in (XML_PATH, JSX_PATH):
+        cleanup_paths = [XML_PATH, JSX_PATH, X.payload_path_for(JSX_PATH)]
+        # an unfinished chunked run keeps its scripts and state for --resume
+        chunk_state = X._read_chunk_state(X.chunk_state_path_for(JSX_PATH)) if X.JSX_CHUNK_OPS else None
+        if chunk_state and int(chunk_state.get("done") or 0) >= len(chunk_state["chunks"]):
+            for index in range(1, len(chunk_state["chunks"]) + 1):
+                script = X.chunk_path_for(JSX_PATH, index)
+                cleanup_paths += [script, X.payload_path_for(script)]
+            cleanup_paths.append(X.chunk_state_path_for(JSX_PATH))
+        for path in cleanup_paths:
             try:
                 if path and os.path.exists(path):
                     os.remove(path)
@@ -11,7 +11,7 @@ Original features preserved:
 
 Additions/repairs in this fix:
 - Proper block traversal (paragraphs + tables) in document order
-- Inline image extraction from runs (saved to assets/, inserted as [[IMG ...]] placeholder)
+- Inline image extraction from runs (saved to assets/ by content hash, inserted as [[IMG ...]] placeholder)
 - Table serialization to [[TABLE {...}]] placeholder (cell text uses existing run-to-text logic)
 - Fixed multiple indentation breaks and missing imports
 """
@@ -36,9 +36,13 @@ STYLE_FLAGS = {
 import sys, os
 import re
 import json
+import hashlib
 import zipfile
+import threading
 import argparse
 import copy
+import gc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
 try:
@@ -62,9 +66,20 @@ ACTIVE_REGEX_RULES_PATH: Optional[str] = None
 
 from docx import Document
 from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup, parse_xml
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.image.image import Image as DocxImage
+from docx.styles import BabelFish
+from docx.styles.styles import Styles
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 from lxml import etree
+import posixpath
 
+from image_probe import probe_image
+from paragraph_ir import (STYLE_B, STYLE_I, STYLE_SUB, STYLE_SUP, STYLE_U, NoteRef, TableRef,
+                          Paragraph as IRParagraph, append_text, is_table_continuation, split_media,
+                          strip_tokens)
 import logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
@@ -98,6 +113,7 @@ XP_POS_V     = etree.XPath(".//wp:anchor/wp:positionV", namespaces=NSMAP_ALL)
 
 # Precompiled XPaths
 XP_P_OUTLINE = etree.XPath("./w:pPr/w:outlineLvl", namespaces=NSMAP)
+XP_SDT_SECTPR = etree.XPath("./w:sdtContent/w:p/w:pPr/w:sectPr", namespaces=NSMAP)
 XP_RUN_TEXTS = etree.XPath(".//w:t", namespaces=NSMAP)
 XP_RUN_TABS  = etree.XPath(".//w:tab", namespaces=NSMAP)
 XP_RUN_FOOTREF = etree.XPath(".//w:footnoteReference", namespaces=NSMAP)
@@ -107,10 +123,13 @@ XP_RUN_LAST_PAGEBREAK = etree.XPath(".//w:lastRenderedPageBreak", namespaces=NSM
 
 COMPILED_FIXED: List[Optional[re.Pattern]] = []
 COMPILED_NEGATIVE: List[Optional[re.Pattern]] = []
+HEADING_CLASSIFIER: Optional["HeadingClassifier"] = None  # rebuilt by _compile_patterns()
 # allow “1.1标题”无空格也算编号；终止于非数字字符（可被 JSON 覆盖）
 DEFAULT_NUMERIC_DOTTED_PATTERN = r'^(\d+(?:[\.．]\d+)*)(?!\d)'
 NUMERIC_DOTTED_PATTERN = DEFAULT_NUMERIC_DOTTED_PATTERN
 NUMERIC_DOTTED: re.Pattern = re.compile(NUMERIC_DOTTED_PATTERN)
+NUMERIC_SEGMENT_SPLIT = re.compile(r'[\.．]')
+HEADING_STYLE_RE = re.compile(r"Heading\s+(\d+)$", flags=re.IGNORECASE)
 NOTE_MARKER_TRIM = " \t\r\n()（）[]【】〔〕{}<>《》〈〉「」『』.,．、，。:：;-—﹣﹘"
 NOTE_MARKER_EDGE = " \t\r\n()（）[]【】〔〕{}<>《》〈〉「」『』"
 NOTE_MARKER_CHAR_SET = set(
@@ -165,8 +184,257 @@ def _twip_to_pt(val: Optional[str]) -> Optional[float]:
     except Exception:
         return None
 
+_FIRST_ATOM_STOP = set(".$*+?{}|)")
+_REGEX_BRACE_QUANT = re.compile(r"\{(\d*)(?:,\d*)?\}")
+
+
+def _regex_scan(p: str, i: int, end: int):
+    """Yield (index, char) of the unescaped characters of p[i:end] outside [...] classes."""
+    while i < end:
+        c = p[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            # a ] right after [ or [^ is a literal member
+            i += 3 if p.startswith("[^]", i) else 2 if p.startswith("[]", i) else 1
+            while i < end and p[i] != "]":
+                i += 2 if p[i] == "\\" else 1
+            i += 1
+            continue
+        yield i, c
+        i += 1
+
+
+def _regex_escape_char(p: str, i: int) -> Tuple[Optional[frozenset], bool, int]:
+    """Read the escape at p[i] ('\\'): (chars or None when unbounded, is \\d, index after)."""
+    c = p[i + 1:i + 2]
+    if c == "d":
+        return frozenset(), True, i + 2
+    if c in ("u", "x"):
+        size = 4 if c == "u" else 2
+        code = p[i + 2:i + 2 + size]
+        if len(code) == size and all(h in "0123456789abcdefABCDEF" for h in code):
+            return frozenset((chr(int(code, 16)),)), False, i + 2 + size
+        return None, False, i + 2
+    if c and not c.isalnum():
+        return frozenset((c,)), False, i + 2
+    return None, False, i + 2
+
+
+def _regex_class_chars(p: str, i: int) -> Tuple[Optional[Tuple[frozenset, bool]], int]:
+    """First chars of the [...] class opening at p[i]; None for negated or unbounded classes."""
+    i += 1
+    if p[i:i + 1] in ("^", "]"):
+        return None, i
+    chars: set = set()
+    digits = False
+    while i < len(p) and p[i] != "]":
+        if p[i] == "\\":
+            got, is_digit, i = _regex_escape_char(p, i)
+            if got is None:
+                return None, i
+            digits = digits or is_digit
+        else:
+            got, i = frozenset((p[i],)), i + 1
+        if p[i:i + 1] == "-" and p[i + 1:i + 2] not in ("", "]"):
+            if len(got) != 1:
+                return None, i
+            if p[i + 1] == "\\":
+                hi, _digit, i = _regex_escape_char(p, i + 1)
+            else:
+                hi, i = frozenset((p[i + 1],)), i + 2
+            if hi is None or len(hi) != 1:
+                return None, i
+            lo_code, hi_code = ord(next(iter(got))), ord(next(iter(hi)))
+            if hi_code - lo_code > 256:
+                return None, i
+            got = frozenset(chr(code) for code in range(lo_code, hi_code + 1))
+        chars |= got
+    if i >= len(p):
+        return None, i
+    return (frozenset(chars), digits), i + 1
+
+
+def _regex_first_of_branches(p: str, i: int, end: int) -> Optional[Tuple[frozenset, bool]]:
+    """First chars of the alternation p[i:end] (the union over its top-level branches)."""
+    bounds = [i]
+    depth = 0
+    for pos, c in _regex_scan(p, i, end):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            bounds += [pos, pos + 1]
+    bounds.append(end)
+    chars: set = set()
+    digits = False
+    for start, stop in zip(bounds[::2], bounds[1::2]):
+        got = _regex_first_of_sequence(p, start, stop)
+        if got is None:
+            return None
+        chars |= got[0]
+        digits = digits or got[1]
+    return frozenset(chars), digits
+
+
+def _regex_first_of_sequence(p: str, i: int, end: int) -> Optional[Tuple[frozenset, bool]]:
+    """First chars of the branch p[i:end], read from its first atom; None if it may be skipped."""
+    while i < end and p[i] == "^":
+        i += 1
+    if i >= end or p[i] in _FIRST_ATOM_STOP:
+        return None
+    c = p[i]
+    if c == "(":
+        if p.startswith("(?:", i):
+            start = i + 3
+        elif p.startswith("(?P<", i):
+            start = p.find(">", i) + 1
+            if start <= 0:
+                return None
+        elif p.startswith("(?", i):
+            return None  # lookarounds, inline flags, conditionals
+        else:
+            start = i + 1
+        depth = 0
+        close = None
+        for pos, ch in _regex_scan(p, i, end):
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+                if depth == 0:
+                    close = pos
+                    break
+        if close is None:
+            return None
+        got = _regex_first_of_branches(p, start, close)
+        after = close + 1
+    elif c == "[":
+        got, after = _regex_class_chars(p, i)
+    elif c == "\\":
+        chars, digits, after = _regex_escape_char(p, i)
+        got = None if chars is None else (chars, digits)
+    else:
+        got, after = (frozenset((c,)), False), i + 1
+    # an optional first atom lets the match start with whatever follows it
+    quant = p[after:after + 1]
+    if quant in ("?", "*"):
+        return None
+    if quant == "{":
+        m = _REGEX_BRACE_QUANT.match(p, after)
+        if m and not int(m.group(1) or 0):
+            return None
+    return got
+
+
+def _first_chars(pattern: str) -> Optional[Tuple[frozenset, bool]]:
+    """
+    Characters a match of `pattern` (anchored at the line start) can begin with, as
+    (literal chars, any decimal digit), read from the pattern source. None when that cannot
+    be bounded (e.g. \\s*, '.', inline flags or optional leading items), which disables the prefilter.
+    """
+    try:
+        return _regex_first_of_branches(pattern, 0, len(pattern))
+    except (IndexError, ValueError):
+        return None
+
+
+class HeadingClassifier(object):
+    """
+    REGEX_ORDER, NEGATIVE_PATTERNS and NUMERIC_DOTTED compiled into one line classifier.
+
+    Fixed rules are joined into a single alternation with one named group per rule, and a
+    first-character prefilter rejects most body lines before any pattern runs. classify()
+    returns (rule index or -1, numeric depth or -1, excluded) with the same precedence as walking
+    REGEX_ORDER in turn; `excluded` is only evaluated for lines some rule pattern matches.
+    """
+
+    NO_MATCH = (-1, -1, False)
+
+    def __init__(self, order, fixed: List[Optional[re.Pattern]], negative: List[Optional[re.Pattern]],
+                 numeric: re.Pattern):
+        self._fixed = fixed
+        self._negative = [pat for pat in negative if pat is not None]
+        self._numeric = numeric
+        self._numeric_idx = next((idx for idx, (kind, _pat) in enumerate(order) if kind == "numeric_dotted"), None)
+        fixed_idx = [idx for idx, (kind, _pat) in enumerate(order) if kind == "fixed" and fixed[idx] is not None]
+        self._master: Optional[re.Pattern] = None
+        self._group_rule: Dict[int, int] = {}
+        if fixed_idx:
+            try:
+                master = re.compile("|".join(f"(?P<_rule{idx}>{fixed[idx].pattern})" for idx in fixed_idx))
+                # user patterns with back-references would be renumbered inside the alternation
+                if not any("\\" + str(n) in fixed[idx].pattern for idx in fixed_idx for n in range(1, 10)):
+                    self._master = master
+                    self._group_rule = {master.groupindex[f"_rule{idx}"]: idx for idx in fixed_idx}
+            except re.error:
+                self._master = None
+        self._fixed_idx = fixed_idx
+        # prefilter: union of the first characters every participating pattern can start with
+        self._first_chars: Optional[frozenset] = None
+        self._first_digit = False
+        sources = [fixed[idx].pattern for idx in fixed_idx]
+        if self._numeric_idx is not None:
+            sources.append(numeric.pattern)
+        chars: set = set()
+        for src in sources:
+            fc = _first_chars(src)
+            if fc is None:
+                break
+            chars |= fc[0]
+            self._first_digit = self._first_digit or fc[1]
+        else:
+            self._first_chars = frozenset(chars)
+
+    def _first_fixed(self, s: str) -> int:
+        if self._master is not None:
+            m = self._master.match(s)
+            return self._group_rule[m.lastindex] if m else -1
+        for idx in self._fixed_idx:
+            if self._fixed[idx].match(s):
+                return idx
+        return -1
+
+    def classify(self, s: str) -> Tuple[int, int, bool]:
+        """Classify a stripped line; see the class docstring for the returned triple."""
+        if not s:
+            return self.NO_MATCH
+        if self._first_chars is not None and s[0] not in self._first_chars \
+                and not (self._first_digit and s[0].isdecimal()):
+            return self.NO_MATCH
+        fixed_rule = self._first_fixed(s)
+        depth = -1
+        m = None
+        numeric_ok = False
+        if self._numeric_idx is not None:
+            m = self._numeric.match(s)
+            if m:
+                token = m.group(1) or ""
+                depth = len([seg for seg in NUMERIC_SEGMENT_SPLIT.split(token) if seg])
+                rest = s[m.end():].lstrip()
+                numeric_ok = bool(rest) and not (rest[0] in "年月日" and len(token) >= 4)
+        if fixed_rule < 0 and m is None:
+            return self.NO_MATCH
+        excluded = any(pat.search(s) for pat in self._negative)
+        if excluded:
+            return -1, depth, True
+        if numeric_ok and (fixed_rule < 0 or self._numeric_idx < fixed_rule):
+            return self._numeric_idx, depth, False
+        return fixed_rule, depth, False
+
+    def fixed_matches(self, rule_idx: int, s: str, cls: Tuple[int, int, bool]) -> bool:
+        """Whether fixed rule `rule_idx` matches a line already classified as `cls`."""
+        rule = cls[0]
+        if rule == rule_idx:
+            return True
+        # only an earlier rule can shadow a later pattern that also matches
+        return 0 <= rule < rule_idx and bool(self._fixed[rule_idx].match(s))
+
+
 def _compile_patterns():
-    global COMPILED_FIXED, COMPILED_NEGATIVE, NUMERIC_DOTTED
+    global COMPILED_FIXED, COMPILED_NEGATIVE, NUMERIC_DOTTED, HEADING_CLASSIFIER
     COMPILED_FIXED = []
     for kind, pat in REGEX_ORDER:
         if kind == "fixed" and pat:
@@ -185,6 +453,7 @@ def _compile_patterns():
     except re.error:
         logger.warning(f"Invalid numeric_dotted pattern, falling back to default: {NUMERIC_DOTTED_PATTERN}")
         NUMERIC_DOTTED = re.compile(DEFAULT_NUMERIC_DOTTED_PATTERN)
+    HEADING_CLASSIFIER = HeadingClassifier(REGEX_ORDER, COMPILED_FIXED, COMPILED_NEGATIVE, NUMERIC_DOTTED)
 
 def load_regex_rules(config_path: Optional[str] = None) -> Optional[str]:
     """
@@ -235,17 +504,6 @@ def load_regex_rules(config_path: Optional[str] = None) -> Optional[str]:
 
 load_regex_rules()
 
-def _is_regex_excluded(text: str) -> bool:
-    if not text:
-        return False
-    stripped = text.strip()
-    if not stripped:
-        return False
-    for pat in COMPILED_NEGATIVE:
-        if pat is not None and pat.search(stripped):
-            return True
-    return False
-
 def _int_to_roman(n: int, upper: bool=True) -> str:
     if n <= 0:
         return str(n)
@@ -304,21 +562,26 @@ def _int_to_chinese(n: int) -> str:
         unit_idx += 1
     return "".join(reversed(parts)).rstrip("零")
 
-def _strip_pstyle_marker(text: str) -> str:
-    return re.sub(r'\s*\[\[PSTYLE\b[^\]]*\]\]\s*$', '', text or '')
-
-def _parse_pstyle_marker(text: str) -> Tuple[str, Dict[str, str]]:
-    """Extract [[PSTYLE ...]] from tail and return (text_wo_marker, attrs_dict)."""
-    attrs: Dict[str, str] = {}
-    m = re.search(r'\[\[PSTYLE\s+([^\]]+)\]\]\s*$', text or '')
-    if not m:
-        return text, attrs
-    attr_s = m.group(1)
-    # parse key="value" pairs
-    for k, v in re.findall(r'([a-zA-Z\-]+)="([^"]*)"', attr_s):
-        attrs[k] = v
-    text_wo = text[:m.start()].rstrip()
-    return text_wo, attrs
+# ---------- Inline markers ----------
+# [[FNREF:n]] / [[ENREF:n]] references and the paired formatting markers written by
+# _collect_inline_with_notes; any other [[...]] marker is left in the text untouched.
+INLINE_MARKER_RE = re.compile(
+    r'\[\[(?:(FNREF|ENREF):(-?\d+)|(/?)(I|B|U|SUP|SUB|SPAN)((?<=SPAN)\s.*?)?)\]\]', re.DOTALL)
+# the same scan for XML output, also stopping at the characters the text must escape; they
+# come first as plain literals (no group) so the regex still searches by first character
+INLINE_XML_RE = re.compile(r'&|<|>|' + INLINE_MARKER_RE.pattern, re.DOTALL)
+XML_TEXT_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;"}
+INLINE_REF_TAGS = {"FNREF": "fnref", "ENREF": "enref"}
+INLINE_FORMAT_TAGS = {"I": "i", "B": "b", "U": "u", "SUP": "sup", "SUB": "sub", "SPAN": "span"}
+SPAN_ATTR_RE = re.compile(r'([a-zA-Z\-]+)="([^"]*)"')
+SPAN_DATA_ATTRS = (("font", "data-font"), ("size", "data-size"),
+                   ("color", "data-color"), ("tracking", "data-tracking"))
+# how the paragraph IR sees the same markers (spans carry no inline style)
+INLINE_TAG_STYLES = {"i": STYLE_I, "b": STYLE_B, "u": STYLE_U, "sup": STYLE_SUP, "sub": STYLE_SUB}
+INLINE_REF_KINDS = {"fnref": "FN", "enref": "EN"}
+
+def _escape_xml_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
 class MyDOCNode(object):
     LEVEL_TAGS = {1: "chapter", 2: "section", 3: "subsection"}
@@ -332,12 +595,25 @@ class MyDOCNode(object):
         self.children: List["MyDOCNode"] = []
         self.element_type = element_type
         self.properties = properties or {}
-        self.body_paragraphs: List[str] = []  # paragraphs stored as text + optional [[PSTYLE ...]] marker
-        self._pending_for_children: List[str] = []
+        # (text, paragraph attributes or None) per body paragraph
+        self.body_paragraphs: List[Tuple[str, Optional[Dict[str, str]]]] = []
 
     def add_child(self, child: "MyDOCNode"):
         self.children.append(child)
 
+    def to_payload(self) -> tuple:
+        """Picklable (name, level, index, type, properties, bodies, children) tuple of this subtree."""
+        return (self.name, self.level, self.index, self.element_type, self.properties,
+                self.body_paragraphs, [c.to_payload() for c in self.children])
+
+    @classmethod
+    def from_payload(cls, payload: tuple, parent: Optional["MyDOCNode"] = None) -> "MyDOCNode":
+        name, level, index, element_type, properties, bodies, children = payload
+        node = cls(name, level, index, parent=parent, element_type=element_type, properties=properties)
+        node.body_paragraphs = list(bodies)
+        node.children = [cls.from_payload(c, node) for c in children]
+        return node
+
     @staticmethod
     def container_tag(level: int) -> str:
         return MyDOCNode.LEVEL_TAGS.get(level, f"level{level}")
@@ -348,7 +624,7 @@ class MyDOCNode(object):
 
     @staticmethod
     def _escape_xml(text: str) -> str:
-        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        return _escape_xml_text(text)
 
     @staticmethod
     def _escape_attr(val: str) -> str:
@@ -358,98 +634,816 @@ class MyDOCNode(object):
                    .replace(">", "&gt;"))
 
     @staticmethod
-    def _convert_refs_to_xml(text: str) -> str:
-        # helpers
-        def repl_fn(m): return f'<fnref id="{m.group(1)}"/>'
-        def repl_en(m): return f'<enref id="{m.group(1)}"/>'
-        def repl_i(m):  return f'<i>{m.group(1)}</i>'
-        def repl_b(m):  return f'<b>{m.group(1)}</b>'
-        def repl_u(m):  return f'<u>{m.group(1)}</u>'
-        def repl_sup(m): return f'<sup>{m.group(1)}</sup>'
-        def repl_sub(m): return f'<sub>{m.group(1)}</sub>'
-        def repl_span(m):
-            attrs = m.group(1) or ""
-            content = m.group(2)
-            out_attrs = []
-            for key, data_key in (
-                ("font", "data-font"),
-                ("size", "data-size"),
-                ("color", "data-color"),
-                ("tracking", "data-tracking"),
-            ):
-                mm = re.search(rf'{key}="([^"]*)"', attrs)
-                if mm:
-                    out_attrs.append(f'{data_key}="{MyDOCNode._escape_attr(mm.group(1))}"')
-            attr_out = (" " + " ".join(out_attrs)) if out_attrs else ""
-            return f'<span{attr_out}>{content}</span>'
-
-        # apply replacements
-        text = re.sub(r"\[\[FNREF:(-?\d+)\]\]", repl_fn, text)
-        text = re.sub(r"\[\[ENREF:(-?\d+)\]\]", repl_en, text)
-        text = re.sub(r"\[\[I\]\](.*?)\[\[/I\]\]", repl_i, text, flags=re.DOTALL)
-        text = re.sub(r"\[\[B\]\](.*?)\[\[/B\]\]", repl_b, text, flags=re.DOTALL)
-        text = re.sub(r"\[\[U\]\](.*?)\[\[/U\]\]", repl_u, text, flags=re.DOTALL)
-        text = re.sub(r"\[\[SUP\]\](.*?)\[\[/SUP\]\]", repl_sup, text, flags=re.DOTALL)
-        text = re.sub(r"\[\[SUB\]\](.*?)\[\[/SUB\]\]", repl_sub, text, flags=re.DOTALL)
-        text = re.sub(r'\[\[SPAN(.*?)\]\](.*?)\[\[/SPAN\]\]', repl_span, text, flags=re.DOTALL)
-        return text
+    def _resolve_inline_markers(text: str, escape: bool = False) -> List[Any]:
+        """Pair up the [[...]] inline markers of text in one scan.
+
+        Returns plain str pieces (including markers left literal) and marker items:
+        ("ref", xml_tag, id), ("open", xml_tag, span_attrs) and ("close", xml_tag).
+        Formatting markers are matched with a stack, so nested or repeated tags pair up
+        correctly; a closing marker that crosses an inner open one closes and reopens it,
+        which keeps the opens and closes in the result properly nested. With escape, the
+        str pieces come out XML-escaped, by the same scan; span_attrs stay as written.
+        """
+        out: List[Any] = []
+        append = out.append
+        # open markers: (xml tag, slot in out, literal if never closed, open item)
+        stack: List[Tuple[str, int, str, Tuple[str, str, Optional[str]]]] = []
+        pos = 0
+        for m in (INLINE_XML_RE if escape else INLINE_MARKER_RE).finditer(text):
+            start = m.start()
+            if start > pos:
+                append(text[pos:start])
+            pos = m.end()
+            if m.lastindex is None:  # &, < or > (every marker sets a group)
+                append(XML_TEXT_ESCAPES[m.group()])
+                continue
+            ref_kind, ref_id, closing, tag, span_attrs = m.groups()
+            if ref_kind:
+                append(("ref", INLINE_REF_TAGS[ref_kind], ref_id))
+                continue
+            xml_tag = INLINE_FORMAT_TAGS[tag]
+            literal = m.group(0)
+            if span_attrs and escape:
+                literal = _escape_xml_text(literal)
+            if not closing:
+                stack.append((xml_tag, len(out), literal, ("open", xml_tag, span_attrs)))
+                append("")
+                continue
+            if span_attrs is None and stack and stack[-1][0] == xml_tag:
+                _, slot, _, open_item = stack.pop()
+                out[slot] = open_item
+                append(("close", xml_tag))
+                continue
+            depth = next((i for i in range(len(stack) - 1, -1, -1) if stack[i][0] == xml_tag), -1)
+            if span_attrs is not None or depth < 0:
+                append(literal)
+                continue
+            crossed = stack[depth + 1:]
+            del stack[depth + 1:]
+            for entry in reversed(crossed):
+                out[entry[1]] = entry[3]
+                append(("close", entry[0]))
+            _, slot, _, open_item = stack.pop()
+            out[slot] = open_item
+            append(("close", xml_tag))
+            for entry in crossed:
+                stack.append((entry[0], len(out), "", entry[3]))
+                append("")
+        if pos < len(text):
+            append(text[pos:])
+        for _, slot, literal, _ in stack:
+            out[slot] = literal
+        return out
+
+    @staticmethod
+    def _inline_to_xml(text: str) -> str:
+        """Escape text and turn its [[...]] inline markers into XML, in one scan."""
+        if "[[" not in text:
+            return _escape_xml_text(text)
+        out: List[str] = []
+        append = out.append
+        for item in MyDOCNode._resolve_inline_markers(text, escape=True):
+            if type(item) is str:
+                append(item)
+            elif item[0] == "close":
+                append(f"</{item[1]}>")
+            elif item[0] == "open":
+                append(f"<span{MyDOCNode._span_attrs_xml(item[2])}>" if item[2] else f"<{item[1]}>")
+            else:
+                append(f'<{item[1]} id="{item[2]}"/>')
+        return "".join(out)
+
+    @staticmethod
+    def _inline_to_tokens(text: str, notes: Dict[str, Dict[str, str]]) -> List[Any]:
+        """Paragraph IR tokens for text, as xml_to_idml would read them back from _inline_to_xml."""
+        tokens: List[Any] = []
+        if "[[" not in text:
+            if text:
+                append_text(tokens, text, 0)
+            return tokens
+        styles = [0]
+        for item in MyDOCNode._resolve_inline_markers(text):
+            if type(item) is str:
+                if item:
+                    append_text(tokens, item, styles[-1])
+            elif item[0] == "close":
+                styles.pop()
+            elif item[0] == "open":
+                styles.append(styles[-1] | INLINE_TAG_STYLES.get(item[1], 0))
+            else:
+                kind = INLINE_REF_KINDS[item[1]]
+                tokens.append(NoteRef(kind, item[2], notes[kind].get(item[2], ""), styles[-1]))
+        return tokens
 
     @staticmethod
-    def _escape_attr_dict(d: Dict[str, str]) -> Dict[str, str]:
-        return {k: MyDOCNode._escape_attr(v) for k, v in d.items() if v is not None}
+    def _span_attrs_xml(attr_s: str) -> str:
+        found: Dict[str, str] = {}
+        for k, v in SPAN_ATTR_RE.findall(attr_s):
+            found.setdefault(k, v)
+        # the pattern stops values at '"', so only &, < and > need escaping
+        pairs = [f'{data_key}="{_escape_xml_text(found[key])}"' for key, data_key in SPAN_DATA_ATTRS if key in found]
+        return (" " + " ".join(pairs)) if pairs else ""
+
+    @classmethod
+    def _paragraph_xml(cls, text: str, pattrs: Optional[Dict[str, str]], pad: str) -> str:
+        escaped = cls._inline_to_xml(text)
+        # build <p ...attrs>
+        attrs_str = ""
+        if pattrs:
+            attrs_pairs = [f'{k}="{cls._escape_attr(v)}"' for k, v in pattrs.items() if v]
+            if attrs_pairs:
+                attrs_str = " " + " ".join(attrs_pairs)
+        return f'{pad}<p{attrs_str}>{escaped}</p>'
+
+    @classmethod
+    def _paragraph_ir(cls, style: str, text: str, pattrs: Optional[Dict[str, str]],
+                      notes: Dict[str, Dict[str, str]]) -> Optional[IRParagraph]:
+        tokens = strip_tokens(cls._inline_to_tokens(text, notes))
+        return IRParagraph(style, tokens, attrs=pattrs) if tokens else None
+
+    def iter_xml_lines(self, indent: int = 0):
+        """Yield the lines of this subtree's XML in order, walking it with an explicit stack."""
+        stack: List[Tuple["MyDOCNode", int, bool]] = [(self, indent, False)]
+        while stack:
+            node, ind, closing = stack.pop()
+            pad = "  " * ind
+            if closing:
+                yield f'{pad}</{node.container_tag(node.level)}>'
+                continue
+            yield f'{pad}<{node.container_tag(node.level)}>'
+            heading_text = node._inline_to_xml(node.name)
+            yield f'{pad}  <{node.heading_tag(node.level)}>{heading_text}</{node.heading_tag(node.level)}>'
+            if node.properties:
+                yield f'{pad}  <meta>'
+                for k, v in node.properties.items():
+                    v_str = node._escape_xml(str(v))
+                    yield f'{pad}    <prop name="{k}">{v_str}</prop>'
+                yield f'{pad}  </meta>'
+            for text, pattrs in node.body_paragraphs:
+                yield node._paragraph_xml(text, pattrs, pad + "  ")
+            stack.append((node, ind, True))
+            stack.extend((c, ind + 1, False) for c in reversed(node.children))
 
     def to_xml_string(self, notes: dict = None, indent: int = 0) -> str:
-        pad = "  " * indent
-        parts = [f'{pad}<{self.container_tag(self.level)}>']
-        heading_text = self._escape_xml(self.name)
-        heading_text = self._convert_refs_to_xml(heading_text)
-        parts.append(f'{pad}  <{self.heading_tag(self.level)}>{heading_text}</{self.heading_tag(self.level)}>')
-        if self.properties:
-            parts.append(f'{pad}  <meta>')
-            for k, v in self.properties.items():
-                v_str = self._escape_xml(str(v))
-                parts.append(f'{pad}    <prop name="{k}">{v_str}</prop>')
-            parts.append(f'{pad}  </meta>')
-        for para in self.body_paragraphs:
-            text, pattrs = _parse_pstyle_marker(para) if STYLE_FLAGS.get("paragraph", True) else (para, {})
-            escaped = self._escape_xml(text)
-            escaped = self._convert_refs_to_xml(escaped)
-            # build <p ...attrs>
-            attrs_str = ""
-            if STYLE_FLAGS.get("paragraph", True) and pattrs:
-                attrs_pairs = [f'{k}="{self._escape_attr(v)}"' for k, v in pattrs.items() if v is not None and v != ""]
-                if attrs_pairs:
-                    attrs_str = " " + " ".join(attrs_pairs)
-            parts.append(f'{pad}  <p{attrs_str}>{escaped}</p>')
-        for c in self.children:
-            parts.append(c.to_xml_string(notes, indent + 1))
-        parts.append(f'{pad}</{self.container_tag(self.level)}>')
-        return "\n".join(parts)
-
-class Splitter:
-    def matches(self, line: str) -> bool:
-        raise NotImplementedError
-
-class FixedRegexSplitter(Splitter):
-    def __init__(self, pat: re.Pattern):
-        self.pat = pat
-    def matches(self, line: str) -> bool:
-        return bool(self.pat.match(line))
-
-class NumericDepthSplitter(Splitter):
-    def __init__(self, depth: int):
-        self.depth = depth
-    def matches(self, line: str) -> bool:
-        m = NUMERIC_DOTTED.match(line)
-        if not m:
-            return False
-        segs = re.split(r'[\.．]', m.group(1))
-        return len([s for s in segs if s]) == self.depth
+        return "\n".join(self.iter_xml_lines(indent))
+
+    def iter_paragraphs(self, notes: Dict[str, Dict[str, str]]):
+        """Yield this subtree's paragraphs in XML order, as xml_to_idml reads them from iter_xml_lines.
+
+        notes maps "FN"/"EN" to {id: note text}; see DOCXOutlineExporter.note_texts().
+        """
+        stack: List["MyDOCNode"] = [self]
+        while stack:
+            node = stack.pop()
+            tokens = strip_tokens(node._inline_to_tokens(node.name, notes))
+            if tokens:
+                yield IRParagraph(f"Level{node.level}", tokens)
+            for text, pattrs in node.body_paragraphs:
+                ir = node._paragraph_ir("Body", text, pattrs, notes)
+                if ir is not None:
+                    yield ir
+            stack.extend(reversed(node.children))
+
+# ---------- List numbering (numbering.xml compiled per numId) ----------
+_CHINESE_NUMFMTS = (
+    "chineseCountingThousand",
+    "chineseCounting",
+    "chineseLegalSimplified",
+    "chineseLegal",
+    "chineseCountingSimplified",
+    "chineseCountingTraditional",
+    "japaneseCounting",
+)
+NUMFMT_FORMATTERS = {
+    "decimal": str,
+    "lowerLetter": lambda n: _int_to_alpha(n, upper=False),
+    "upperLetter": lambda n: _int_to_alpha(n, upper=True),
+    "lowerRoman": lambda n: _int_to_roman(n, upper=False),
+    "upperRoman": lambda n: _int_to_roman(n, upper=True),
+    "bullet": lambda n: "•",
+}
+NUMFMT_FORMATTERS.update({fmt: _int_to_chinese for fmt in _CHINESE_NUMFMTS})
+LVLTEXT_PLACEHOLDER_RE = re.compile(r"%([1-9])")
+
+
+def _compile_lvl_text(lvl_text: Optional[str]) -> Optional[List[Any]]:
+    """Split lvlText into literal strings and 0-based level indexes ("%1.%2" -> [0, ".", 1])."""
+    if not lvl_text:
+        return None
+    parts: List[Any] = []
+    pos = 0
+    for m in LVLTEXT_PLACEHOLDER_RE.finditer(lvl_text):
+        if m.start() > pos:
+            parts.append(lvl_text[pos:m.start()])
+        parts.append(int(m.group(1)) - 1)
+        pos = m.end()
+    if pos < len(lvl_text):
+        parts.append(lvl_text[pos:])
+    return parts
+
+
+def _w_int(el, attr: str = "val") -> Optional[int]:
+    if el is None:
+        return None
+    try:
+        return int(el.get(f"{{{W_NS}}}{attr}"))
+    except (TypeError, ValueError):
+        return None
+
+
+class NumberingDefinition(object):
+    """One w:num resolved against its abstractNum: per-level reset values, formatters and templates."""
+
+    __slots__ = ("num_id", "abstract_id", "resets", "formatters", "templates", "num_fmts", "lvl_texts")
+
+    def __init__(self, num_id: int, abstract_id: Optional[int],
+                 levels: Dict[int, Dict[str, Any]], overrides: Dict[int, int]):
+        n = NumberingTables.LEVELS
+        self.num_id = num_id
+        self.abstract_id = abstract_id
+        self.num_fmts: List[Optional[str]] = [None] * n
+        self.lvl_texts: List[Optional[str]] = [None] * n
+        self.resets = [0] * n
+        for i in range(n):
+            lvl = levels.get(i)
+            if lvl is not None:
+                self.num_fmts[i] = lvl["numFmt"]
+                self.lvl_texts[i] = lvl["lvlText"]
+            start = overrides.get(i)
+            if start is None:
+                start = (lvl["start"] if lvl is not None else 1) or 1
+            self.resets[i] = start - 1
+        self.formatters = [NUMFMT_FORMATTERS.get(fmt, str) for fmt in self.num_fmts]
+        self.templates = [_compile_lvl_text(t) for t in self.lvl_texts]
+
+    def label(self, ilvl: int, counters: List[int]) -> str:
+        template = self.templates[ilvl]
+        if template is None:
+            return self.formatters[ilvl](counters[ilvl]) + "."
+        fmts = self.formatters
+        return "".join(part if part.__class__ is str else fmts[part](counters[part])
+                       for part in template)
+
+
+class NumberingTables(object):
+    """
+    numbering.xml compiled once into NumberingDefinition tables keyed by numId, plus the
+    running counters (one fixed-size array per numId) used while walking the body.
+    """
+
+    LEVELS = 9
+
+    def __init__(self):
+        self._defs: Dict[int, NumberingDefinition] = {}
+        self._counters: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._defs)
+
+    @classmethod
+    def from_xml(cls, xml_bytes: bytes) -> "NumberingTables":
+        tables = cls()
+        root = etree.fromstring(xml_bytes)
+        abstracts: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        for abs_num in root.iterchildren(f"{{{W_NS}}}abstractNum"):
+            anid = _w_int(abs_num, "abstractNumId")
+            if anid is None:
+                continue
+            lvls: Dict[int, Dict[str, Any]] = {}
+            for lvl in abs_num.iterchildren(f"{{{W_NS}}}lvl"):
+                ilvl = _w_int(lvl, "ilvl")
+                if ilvl is None:
+                    continue
+                start = _w_int(lvl.find("w:start", NSMAP))
+                numFmt_el = lvl.find("w:numFmt", NSMAP)
+                lvlText_el = lvl.find("w:lvlText", NSMAP)
+                lvls[ilvl] = {
+                    "start": 1 if start is None else start,
+                    "numFmt": numFmt_el.get(f"{{{W_NS}}}val") if numFmt_el is not None else None,
+                    "lvlText": lvlText_el.get(f"{{{W_NS}}}val") if lvlText_el is not None else None,
+                }
+            abstracts[anid] = lvls
+        for num in root.iterchildren(f"{{{W_NS}}}num"):
+            numId = _w_int(num, "numId")
+            if numId is None:
+                continue
+            anid = _w_int(num.find("w:abstractNumId", NSMAP))
+            overrides: Dict[int, int] = {}
+            for ov in num.iterchildren(f"{{{W_NS}}}lvlOverride"):
+                ilvl = _w_int(ov, "ilvl")
+                start_val = _w_int(ov.find(".//w:startOverride", NSMAP))
+                if ilvl is not None and start_val is not None:
+                    overrides[ilvl] = start_val
+            tables._defs[numId] = NumberingDefinition(numId, anid, abstracts.get(anid, {}), overrides)
+        return tables
+
+    def definition(self, num_id: int) -> NumberingDefinition:
+        d = self._defs.get(num_id)
+        if d is None:
+            # numId missing from numbering.xml: plain decimal numbering starting at 1
+            d = self._defs[num_id] = NumberingDefinition(num_id, None, {}, {})
+        return d
+
+    def advance(self, num_id: int, ilvl: int) -> Tuple[NumberingDefinition, List[int]]:
+        """Count one paragraph at (num_id, ilvl); deeper levels restart from their reset values."""
+        d = self.definition(num_id)
+        counters = self._counters.get(num_id)
+        if counters is None:
+            counters = self._counters[num_id] = list(d.resets)
+        counters[ilvl] += 1
+        counters[ilvl + 1:] = d.resets[ilvl + 1:]
+        return d, counters
+
+
+# ---------- Package access (one open archive per conversion) ----------
+class DocxPackage(object):
+    """
+    Single read-only handle on a .docx archive shared by every reader of one conversion.
+
+    The file is opened and its central directory indexed once; part bytes are read lazily and
+    cached (media is read uncached by default so large images do not pile up in memory).
+    `stream` exposes the underlying file object so python-docx can load from the same handle.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")
+        try:
+            self._zip = zipfile.ZipFile(self._fh, "r")
+        except Exception:
+            self._fh.close()
+            raise
+        self._index: Dict[str, zipfile.ZipInfo] = {info.filename: info for info in self._zip.infolist()}
+        self._cache: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def _name(partname: str) -> str:
+        return (partname or "").lstrip("/")
+
+    @property
+    def stream(self):
+        self._fh.seek(0)
+        return self._fh
+
+    def names(self) -> List[str]:
+        return list(self._index)
+
+    def has_part(self, partname: str) -> bool:
+        return self._name(partname) in self._index
+
+    def part_size(self, partname: str) -> Optional[int]:
+        info = self._index.get(self._name(partname))
+        return info.file_size if info is not None else None
+
+    def read(self, partname: str, cache: bool = True) -> Optional[bytes]:
+        """Return the bytes of a part, or None when the archive does not contain it."""
+        name = self._name(partname)
+        info = self._index.get(name)
+        if info is None:
+            return None
+        with self._lock:
+            data = self._cache.get(name)
+            if data is None:
+                data = self._zip.read(info)
+                if cache:
+                    self._cache[name] = data
+        return data
+
+    def open(self, partname: str):
+        """Open a part as a (decompressing) stream, for parts too large to hold in memory."""
+        return self._zip.open(self._index[self._name(partname)], "r")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._cache.clear()
+        try:
+            self._zip.close()
+        finally:
+            self._fh.close()
+
+
+# ---------- Image assets (content-addressed, de-duplicated) ----------
+class ImageAssetStore(object):
+    """
+    Writes image blobs to assets/ under names derived from their content hash.
+
+    Each package part is hashed once; identical blobs (repeated logos, reused diagrams) map to a
+    single file, and files left by an earlier run with the same name and size are reused instead
+    of being rewritten. `manifest.json` records which source parts resolved to which file, and
+    the header metadata probed for each blob; a manifest left by an earlier run primes that
+    probe cache so unchanged images are not probed again.
+
+    The file writes run on a small thread pool so paragraph traversal never waits on disk; at
+    most MAX_PENDING blobs are held in flight. `finish()` drains the pool and collects failures
+    into `errors`.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+    HASH_CHARS = 16
+    MAX_WORKERS = 4
+    MAX_PENDING = 64
+
+    def __init__(self, assets_dir: str, max_workers: Optional[int] = None):
+        self.assets_dir = assets_dir or "."
+        self._by_part: Dict[str, str] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._max_workers = max(1, int(max_workers or self.MAX_WORKERS))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.MAX_PENDING)
+        self._pending: List[Tuple[str, Any]] = []
+        self._lock = threading.Lock()
+        self.errors: List[str] = []
+        self.written = 0
+        self.reused = 0
+        self._probe_cache: Dict[str, Optional[Dict[str, Any]]] = self._load_probe_cache()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load_probe_cache(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        path = os.path.join(self.assets_dir, self.MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                images = (json.load(f) or {}).get("images") or {}
+        except Exception:
+            return {}
+        cache: Dict[str, Optional[Dict[str, Any]]] = {}
+        for entry in images.values():
+            if isinstance(entry, dict) and entry.get("sha256") and "meta" in entry:
+                cache[entry["sha256"]] = entry["meta"]
+        return cache
+
+    def store(self, image_part) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Return (asset path, header metadata) for an image part; unseen content is queued for
+        writing. Metadata is None when the format is not recognised by the probe.
+        """
+        partname = str(getattr(image_part, "partname", "") or "")
+        fname = self._by_part.get(partname) if partname else None
+        if fname is None:
+            blob = image_part.blob
+            digest = hashlib.sha256(blob).hexdigest()
+            ext = (os.path.splitext(partname)[1] or ".png").lower()
+            fname = f"image_{digest[:self.HASH_CHARS]}{ext}"
+            if fname not in self._entries:
+                if digest in self._probe_cache:
+                    meta = self._probe_cache[digest]
+                else:
+                    meta = self._probe_cache[digest] = probe_image(blob)
+                self._submit(fname, blob)
+                self._entries[fname] = {"sha256": digest, "bytes": len(blob), "parts": [], "refs": 0, "meta": meta}
+            entry = self._entries[fname]
+            if partname:
+                self._by_part[partname] = fname
+                entry["parts"].append(partname)
+        entry = self._entries[fname]
+        entry["refs"] += 1
+        return os.path.join(self.assets_dir, fname), entry["meta"]
+
+    def record_error(self, label: str, exc: BaseException):
+        msg = f"{label}: {exc}"
+        with self._lock:
+            self.errors.append(msg)
+        logger.warning(f"Image export failed for {msg}")
+
+    def _submit(self, fname: str, blob: bytes):
+        if self._pool is None:
+            os.makedirs(self.assets_dir, exist_ok=True)
+            self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="img-export")
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(self._write, fname, blob)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _f: self._slots.release())
+        self._pending.append((fname, future))
+
+    def _write(self, fname: str, blob: bytes):
+        out_path = os.path.join(self.assets_dir, fname)
+        try:
+            if os.path.getsize(out_path) == len(blob):
+                with self._lock:
+                    self.reused += 1
+                return
+        except OSError:
+            pass
+        tmp_path = f"{out_path}.{threading.get_ident()}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, out_path)
+        with self._lock:
+            self.written += 1
+
+    def finish(self):
+        """Wait for queued writes; failures are recorded in `errors` and on the manifest entry."""
+        pending, self._pending = self._pending, []
+        for fname, future in pending:
+            exc = future.exception()
+            if exc is not None:
+                self._entries[fname]["error"] = str(exc)
+                self.record_error(fname, exc)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def write_manifest(self) -> Optional[str]:
+        if not self._entries:
+            return None
+        path = os.path.join(self.assets_dir, self.MANIFEST_NAME)
+        payload = {
+            "images": self._entries,
+            "sources": dict(self._by_part),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2, sort_keys=True)
+        return path
+
+
+# ---------- Style catalog (styles.xml resolved once per document) ----------
+class StyleInfo(object):
+    """Resolved view of one paragraph style: UI name, heading level and inherited numPr."""
+
+    __slots__ = ("style_id", "name", "heading_level", "num_pr")
+
+    def __init__(self, style_id: Optional[str], name: Optional[str], heading_level: Optional[int], num_pr):
+        self.style_id = style_id
+        self.name = name
+        self.heading_level = heading_level
+        self.num_pr = num_pr  # shared <w:numPr> element from the basedOn chain; read-only
+
+
+class StyleCatalog(object):
+    """
+    Paragraph styles of one document keyed by styleId, resolved once up front.
+
+    Lookup follows python-docx `Paragraph.style` semantics: a missing, unknown or
+    non-paragraph styleId falls back to the document's default paragraph style. Names are
+    mapped to their UI form ("heading 1" -> "Heading 1") and numPr is inherited along basedOn,
+    so per-paragraph callers only do a dictionary hit instead of walking the style chain.
+    """
+
+    def __init__(self, styles_el=None):
+        self._by_id: Dict[str, StyleInfo] = {}
+        self.default: Optional[StyleInfo] = None
+        if styles_el is None:
+            return
+        raw: Dict[str, Any] = {}
+        paragraph_ids: List[str] = []
+        default_id = None
+        for st in styles_el.iterchildren(qn("w:style")):
+            sid = st.get(qn("w:styleId"))
+            if sid is None or sid in raw:
+                continue
+            raw[sid] = st
+            if st.get(qn("w:type")) == "paragraph":
+                paragraph_ids.append(sid)
+                if (st.get(qn("w:default")) or "").lower() in ("1", "true", "on"):
+                    default_id = sid
+        for sid in paragraph_ids:
+            self._by_id[sid] = self._resolve(sid, raw)
+        if default_id is not None:
+            self.default = self._by_id[default_id]
+
+    @staticmethod
+    def _resolve(style_id: str, raw: Dict[str, Any]) -> StyleInfo:
+        st = raw[style_id]
+        name_el = st.find(qn("w:name"))
+        name = name_el.get(qn("w:val")) if name_el is not None else None
+        if name is not None:
+            name = BabelFish.internal2ui(name)
+        heading_level = None
+        m = HEADING_STYLE_RE.match(name.strip()) if name else None
+        if m:
+            heading_level = int(m.group(1))
+        num_pr = None
+        cur, seen = st, set()
+        while cur is not None:
+            num_pr = cur.find("./w:pPr/w:numPr", NSMAP)
+            if num_pr is not None:
+                break
+            seen.add(cur.get(qn("w:styleId")))
+            based = cur.find(qn("w:basedOn"))
+            base_id = based.get(qn("w:val")) if based is not None else None
+            cur = raw.get(base_id) if base_id not in seen else None
+        return StyleInfo(style_id, name, heading_level, num_pr)
+
+    @classmethod
+    def from_styles(cls, styles: Optional[Styles]) -> "StyleCatalog":
+        return cls(styles.element if styles is not None else None)
+
+    def lookup(self, style_id: Optional[str]) -> Optional[StyleInfo]:
+        if not style_id:
+            return self.default
+        return self._by_id.get(style_id, self.default)
+
+    def for_paragraph(self, paragraph) -> Optional[StyleInfo]:
+        """Style of a python-docx Paragraph, read straight from w:pPr/w:pStyle."""
+        return self.lookup(paragraph._element.style)
+
+
+# ---------- Streaming ingestion (word/document.xml via pull parser) ----------
+REL_TYPE_IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+class _StreamImagePart(object):
+    """Stand-in for python-docx ImagePart; bytes are read from the package on demand, never cached."""
+
+    def __init__(self, package: DocxPackage, partname: str):
+        self._package = package
+        self.partname = partname
+
+    @property
+    def blob(self) -> bytes:
+        return self._package.read(self.partname, cache=False) or b""
+
+    @property
+    def image(self):
+        return DocxImage.from_blob(self.blob)
+
+
+class _StreamStoryPart(object):
+    """Part-level services (styles, image relationships) that Paragraph/Run proxies ask for."""
+
+    def __init__(self, styles: Optional[Styles], related_parts: Dict[str, _StreamImagePart]):
+        self._styles = styles
+        self.related_parts = related_parts
+
+    def get_style(self, style_id, style_type):
+        if self._styles is None:
+            return None
+        return self._styles.get_by_id(style_id, style_type)
+
+
+class _StreamBodyParent(object):
+    def __init__(self, part: _StreamStoryPart):
+        self.part = part
+
+
+class StreamingDocxReader(object):
+    """
+    Walks word/document.xml with an lxml pull parser instead of building the python-docx DOM.
+
+    A cheap prepass records section boundaries (sectPr positions) and body block counts; the
+    main pass then yields top-level body children in document order and clears each one once
+    the consumer resumes, so memory stays flat regardless of document length. The python-docx
+    element classes are kept, so Paragraph/Table proxies behave exactly like in DOM mode.
+    """
+
+    DOCUMENT_PART = "word/document.xml"
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, package: DocxPackage):
+        self.package = package
+        self.part = _StreamStoryPart(self._load_styles(), self._load_image_rels())
+        self._parent = _StreamBodyParent(self.part)
+        self.section_breaks: List[Tuple[int, Any]] = []  # (top-level index, sectPr copy)
+        self.paragraph_count = 0
+        self.table_count = 0
+        self._scan_sections()
+
+    @property
+    def first_sect_pr(self):
+        return self.section_breaks[0][1] if self.section_breaks else None
+
+    @property
+    def body_sect_pr(self):
+        return self.section_breaks[-1][1] if self.section_breaks else None
+
+    def _load_styles(self) -> Optional[Styles]:
+        data = self.package.read("word/styles.xml")
+        if not data:
+            return None
+        try:
+            return Styles(parse_xml(data))
+        except Exception as exc:
+            logger.warning(f"Failed to parse styles.xml in streaming mode: {exc}")
+            return None
+
+    def _load_image_rels(self) -> Dict[str, _StreamImagePart]:
+        rels: Dict[str, _StreamImagePart] = {}
+        data = self.package.read("word/_rels/document.xml.rels")
+        if not data:
+            return rels
+        root = etree.fromstring(data)
+        for rel in root.findall(f"{{{PKG_REL_NS}}}Relationship"):
+            if rel.get("Type") != REL_TYPE_IMAGE or rel.get("TargetMode") == "External":
+                continue
+            rid = rel.get("Id")
+            target = rel.get("Target") or ""
+            if not rid or not target:
+                continue
+            partname = posixpath.normpath(target if target.startswith("/") else posixpath.join("/word", target))
+            rels[rid] = _StreamImagePart(self.package, partname)
+        return rels
+
+    def _new_pull_parser(self):
+        parser = etree.XMLPullParser(events=("start", "end"), remove_blank_text=True,
+                                     resolve_entities=False, huge_tree=True)
+        parser.set_element_class_lookup(element_class_lookup)
+        return parser
+
+    def _iter_body_children(self):
+        """Yield (index, element) for each completed child of w:body, clearing it afterwards."""
+        parser = self._new_pull_parser()
+        depth = 0
+        idx = 0
+        with self.package.open(self.DOCUMENT_PART) as fh:
+            done = False
+            while not done:
+                data = fh.read(self.CHUNK_SIZE)
+                if data:
+                    parser.feed(data)
+                else:
+                    parser.close()
+                    done = True
+                for event, el in parser.read_events():
+                    if event == "start":
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth != 2:
+                        continue
+                    yield idx, el
+                    idx += 1
+                    el.clear()
+                    while el.getprevious() is not None:
+                        del el.getparent()[0]
+
+    def _scan_sections(self):
+        sect_tag = qn("w:sectPr")
+        p_tag = qn("w:p")
+        tbl_tag = qn("w:tbl")
+        parser = self._new_pull_parser()
+        depth = 0
+        idx = 0
+        last_sect = None
+        with self.package.open(self.DOCUMENT_PART) as fh:
+            done = False
+            while not done:
+                data = fh.read(self.CHUNK_SIZE)
+                if data:
+                    parser.feed(data)
+                else:
+                    parser.close()
+                    done = True
+                for event, el in parser.read_events():
+                    if event == "start":
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth >= 2 and el.tag == sect_tag:
+                        last_sect = copy.deepcopy(el)
+                    if depth != 2:
+                        continue
+                    if el.tag == p_tag:
+                        self.paragraph_count += 1
+                    elif el.tag == tbl_tag:
+                        self.table_count += 1
+                    if last_sect is not None:
+                        self.section_breaks.append((idx, last_sect))
+                        last_sect = None
+                    idx += 1
+                    el.clear()
+                    while el.getprevious() is not None:
+                        del el.getparent()[0]
+
+    def _block_items(self, el):
+        tag = el.tag
+        if tag == qn("w:p"):
+            yield "p", Paragraph(el, self._parent)
+        elif tag == qn("w:tbl"):
+            yield "tbl", Table(el, self._parent)
+        elif tag == qn("w:sdt"):
+            content = el.find("./w:sdtContent", NSMAP)
+            if content is not None:
+                for inner in list(content):
+                    yield from self._block_items(inner)
+
+    def iter_blocks(self):
+        """Yield (top-level index, 'p'/'tbl', proxy) in document order, sdt content expanded."""
+        for idx, child in self._iter_body_children():
+            for kind, obj in self._block_items(child):
+                yield idx, kind, obj
+
 
 class DOCXOutlineExporter:
     _NOTE_STYLE_HINTS = {"footnotereference", "endnotereference"}
     _MAX_NOTE_MARKER_LEN = 4
-    def __init__(self, input_path: str, mode: str = "heading", skip_images: bool = False, skip_tables: bool = False, skip_textboxes: bool = False, regex_config_path: Optional[str] = None, regex_max_depth: Optional[int] = None, inline_list_labels: bool = True):
+    # tables longer than this many rows are emitted as several [[TABLE]] segments
+    _TABLE_SEGMENT_ROWS = 200
+    def __init__(self, input_path: str, mode: str = "heading", skip_images: bool = False, skip_tables: bool = False, skip_textboxes: bool = False, regex_config_path: Optional[str] = None, regex_max_depth: Optional[int] = None, inline_list_labels: bool = True, streaming: bool = False, package: Optional[DocxPackage] = None, hybrid_workers: int = 0):
         assert mode in ("heading", "regex", "hybrid"), "mode must be 'heading', 'regex', or 'hybrid'"
         self.mode = mode
         self.inline_list_labels = bool(inline_list_labels)
@@ -462,8 +1456,22 @@ class DOCXOutlineExporter:
             self._regex_max_depth = None
         else:
             self._regex_max_depth = int(regex_max_depth)
+        # hybrid mode: >1 refines Level1 chapters in that many worker processes
+        self.hybrid_workers = max(0, int(hybrid_workers or 0))
         self.input_path = input_path
-        self.doc = Document(input_path)
+        # one open archive serves python-docx, notes/numbering and media; callers may share theirs
+        self._owns_package = package is None
+        self.package = package if package is not None else DocxPackage(input_path)
+        # streaming=True walks word/document.xml incrementally instead of loading the python-docx DOM
+        self.streaming = bool(streaming)
+        self._stream: Optional[StreamingDocxReader] = None
+        if self.streaming:
+            self.doc = None
+            self._stream = StreamingDocxReader(self.package)
+        else:
+            self.doc = Document(self.package.stream)
+        # paragraph styles resolved once; heading, list and paragraph-attribute code looks them up by styleId
+        self.styles = StyleCatalog.from_styles(self._stream.part._styles if self.streaming else self.doc.styles)
         self.skip_images = bool(skip_images)
         self.skip_tables = bool(skip_tables)
         self.skip_textboxes = bool(skip_textboxes)
@@ -478,17 +1486,17 @@ class DOCXOutlineExporter:
         self._last_summary: Dict[str, Any] = {}
 
         # Numbering (lists)
-        self.num_map_abstract: Dict[int, int] = {}
-        self.abstract_lvls: Dict[int, Dict[int, Dict[str, Optional[str]]]] = {}
-        self.num_overrides: Dict[int, Dict[int, int]] = {}
-        self.num_counters: Dict[int, List[int]] = {}
+        self.numbering = NumberingTables()
         self.assets_dir = None  # set in process()
+        self._assets: Optional[ImageAssetStore] = None
         self.default_section_state = self._resolve_default_section_state()
         self._body_iter_items: List[Tuple[str, int, Dict[str, Any]]] = []
         self._doc_paragraphs: List[Any] = []
         self._doc_tables: List[Any] = []
-        self._build_body_iter_index()
+        if not self.streaming:
+            self._build_body_iter_index()
         self._frame_seq = 0
+        self._table_seq = 0
         self._word_page_width_pt, self._word_page_height_pt = self._resolve_word_page_size()
         self._word_page_seq = 1
         self._stats = {
@@ -499,6 +1507,13 @@ class DOCXOutlineExporter:
         self._last_summary: Dict[str, Any] = {}
 
     def _resolve_word_page_size(self) -> Tuple[float, float]:
+        if self.streaming:
+            sect = self._stream.first_sect_pr
+            pg_sz = sect.find("./w:pgSz", NSMAP) if sect is not None else None
+            if pg_sz is None:
+                return 0.0, 0.0
+            return (_twip_to_pt(pg_sz.get(f"{{{W_NS}}}w")) or 0.0,
+                    _twip_to_pt(pg_sz.get(f"{{{W_NS}}}h")) or 0.0)
         try:
             sect = self.doc.sections[0]
             width = getattr(sect, "page_width", None)
@@ -545,16 +1560,19 @@ class DOCXOutlineExporter:
                 mapping[member] = "justify"
         return mapping.get(val, "")
 
-    def _append_body_fragment(self, target_node, fragment: str):
+    def _append_body_fragment(self, target_node, fragment: str, pattrs: Optional[Dict[str, str]] = None):
         if fragment is None:
             return
         text = fragment.strip()
         if not text:
             return
-        target_node.body_paragraphs.append(fragment)
+        target_node.body_paragraphs.append((fragment, pattrs or None))
         self._stats["body_fragments"] += 1
         if text.startswith("[[TABLE"):
-            self._stats["table_fragments"] += 1
+            # continuation segments of a split table are not counted as tables of their own
+            self._stats["table_fragments"] += sum(
+                1 for tok in split_media(text) if type(tok) is TableRef and not is_table_continuation(tok.json_text)
+            )
 
     def _count_headings(self, node: MyDOCNode) -> int:
         count = 1 if node.element_type == "heading" else 0
@@ -565,9 +1583,12 @@ class DOCXOutlineExporter:
     def _collect_summary(self) -> Dict[str, Any]:
         return {
             "mode": self.mode,
-            "word_paragraphs": len(self.doc.paragraphs),
-            "word_tables": len(self.doc.tables),
+            "word_paragraphs": self._stream.paragraph_count if self.streaming else len(self.doc.paragraphs),
+            "word_tables": self._stream.table_count if self.streaming else len(self.doc.tables),
             "image_fragments": self._stats.get("image_fragments", 0),
+            "image_assets": len(self._assets) if self._assets is not None else 0,
+            "image_assets_reused": self._assets.reused if self._assets is not None else 0,
+            "image_errors": list(self._assets.errors) if self._assets is not None else [],
             "footnotes": len(self.footnotes),
             "endnotes": len(self.endnotes),
             "body_fragments": self._stats.get("body_fragments", 0),
@@ -1148,10 +2169,9 @@ class DOCXOutlineExporter:
         return result
 
     def extract_notes(self):
-        with zipfile.ZipFile(self.input_path, "r") as z:
-            foot_xml = z.read("word/footnotes.xml") if "word/footnotes.xml" in z.namelist() else None
-            end_xml = z.read("word/endnotes.xml") if "word/endnotes.xml" in z.namelist() else None
-            num_xml = z.read("word/numbering.xml") if "word/numbering.xml" in z.namelist() else None
+        foot_xml = self.package.read("word/footnotes.xml")
+        end_xml = self.package.read("word/endnotes.xml")
+        num_xml = self.package.read("word/numbering.xml")
         if foot_xml:
             self.footnotes = self._parse_notes_xml(foot_xml)
             logger.info(f"Footnotes parsed: {len(self.footnotes)}")
@@ -1182,6 +2202,19 @@ class DOCXOutlineExporter:
             copied["pageMarginsPt"] = {k: margins[k] for k in ("top", "bottom", "left", "right") if k in margins}
         return copied
 
+    @staticmethod
+    def _block_sect_pr(child):
+        """sectPr closing a section at this top-level body element, found without descending into runs."""
+        tag = child.tag
+        if tag == qn('w:p'):
+            return child.find("./w:pPr/w:sectPr", NSMAP)
+        if tag == qn('w:sdt'):
+            found = XP_SDT_SECTPR(child)
+            return found[-1] if found else None
+        if tag == qn('w:sectPr'):
+            return child
+        return None
+
     def _build_body_iter_index(self):
         body = self.doc._element.body
         children = list(body)
@@ -1196,14 +2229,12 @@ class DOCXOutlineExporter:
         tbl_map = {t._element: t for t in getattr(self.doc, "tables", [])}
         collected_paras: List[Any] = []
         collected_tbls: List[Any] = []
-        states: List[Dict[str, Any]] = [self._copy_section_state(default_state) for _ in children]
-        next_state = self._copy_section_state(default_state)
-        for idx in range(len(children) - 1, -1, -1):
-            child = children[idx]
-            sects = [el for el in child.iter() if el.tag == qn('w:sectPr')]
-            if sects:
-                next_state = self._merge_section_state(default_state, sects[-1])
-            states[idx] = self._copy_section_state(next_state)
+        # section intervals as (last top-level index, state); states are shared and read-only
+        breaks: List[Tuple[int, Dict[str, Any]]] = []
+        for idx, child in enumerate(children):
+            sect = self._block_sect_pr(child)
+            if sect is not None:
+                breaks.append((idx, self._merge_section_state(default_state, sect)))
         items: List[Tuple[str, int, Dict[str, Any]]] = []
         p_idx = 0
         t_idx = 0
@@ -1234,13 +2265,17 @@ class DOCXOutlineExporter:
                 if content is not None:
                     for inner in list(content):
                         append_child(inner, state)
+        ptr = 0
         for idx, child in enumerate(children):
-            append_child(child, states[idx])
+            while ptr < len(breaks) and breaks[ptr][0] < idx:
+                ptr += 1
+            append_child(child, breaks[ptr][1] if ptr < len(breaks) else default_state)
         self._body_iter_items = items
         self._doc_paragraphs = collected_paras
         self._doc_tables = collected_tbls
 
-    def _table_placeholder(self, tbl_el, section_state) -> Optional[str]:
+    def _table_placeholders(self, tbl_el, section_state) -> List[str]:
+        """Return the [[TABLE]] marker(s) for a table; long tables yield one marker per segment."""
         def _unwrap_nested_table(table_el):
             """Certain word files wrap the real table inside a single-row outer table."""
             try:
@@ -1327,18 +2362,60 @@ class DOCXOutlineExporter:
             cellPadding = {"t": _pad("top"), "l": _pad("left"), "b": _pad("bottom"), "r": _pad("right")}
 
         rows_data: List[List[dict]] = []
-        MAX_ROWS, MAX_COLS, MAX_SPAN = 500, 200, 50
+        MAX_COLS, MAX_SPAN = 200, 50
         all_tr = tbl_el.findall("./w:tr", NSMAP)
+
+        def _grid_span(tcPr) -> int:
+            gridSpan = tcPr.find("./w:gridSpan", NSMAP) if tcPr is not None else None
+            if gridSpan is not None and gridSpan.get(f"{{{W_NS}}}val"):
+                try:
+                    return max(1, min(MAX_SPAN, int(gridSpan.get(f"{{{W_NS}}}val"))))
+                except Exception:
+                    return 1
+            return 1
+
+        def _tcw_pt(tcPr) -> Optional[float]:
+            tcW = tcPr.find("./w:tcW", NSMAP) if tcPr is not None else None
+            if tcW is None or not tcW.get(f"{{{W_NS}}}w"):
+                return None
+            wtype = tcW.get(f"{{{W_NS}}}type")
+            wval = tcW.get(f"{{{W_NS}}}w")
+            if wtype in (None, "dxa"):
+                return _twip_to_pt(wval)
+            if wtype == "pct":
+                try:
+                    return (float(wval) / 50.0) * 4.8
+                except Exception:
+                    return None
+            return None
+
+        # One pass builds the logical grid: every w:tc is placed at its grid column (gridSpan
+        # expanded) and a vMerge restart stays open on that column, gaining a row each time the
+        # cell covering the column below continues it, so rowspans never need a look-down scan.
+        open_spans: Dict[int, dict] = {}
+        first_row_widths: List[Tuple[Optional[float], int]] = []
         for r_idx, tr in enumerate(all_tr):
-            if r_idx >= MAX_ROWS:
-                break
+            placed = []
+            continues_col: List[bool] = []
+            for tc in tr.findall("./w:tc", NSMAP):
+                tcPr = tc.find("./w:tcPr", NSMAP)
+                colspan = _grid_span(tcPr)
+                vMerge = tcPr.find("./w:vMerge", NSMAP) if tcPr is not None else None
+                vm_attr = vMerge.get(f"{{{W_NS}}}val") if vMerge is not None else None
+                placed.append((tc, tcPr, colspan, vMerge, vm_attr, len(continues_col)))
+                continues_col.extend([vMerge is not None and vm_attr in (None, "", "continue", "cont", "1")] * colspan)
+                if r_idx == 0:
+                    first_row_widths.append((_tcw_pt(tcPr), colspan))
+            for col in list(open_spans):
+                if col < len(continues_col) and continues_col[col]:
+                    open_spans[col]["rowspan"] += 1
+                else:
+                    del open_spans[col]
+
             row_cells = []
-            tcs = tr.findall("./w:tc", NSMAP)
-            c_vis = 0
-            for tc in tcs:
+            for c_vis, (tc, tcPr, colspan, vMerge, vm_attr, grid_col) in enumerate(placed):
                 if c_vis >= MAX_COLS:
                     break
-                tcPr = tc.find("./w:tcPr", NSMAP)
 
                 align = "left"
                 p_first = tc.find("./w:p/w:pPr/w:jc", NSMAP)
@@ -1349,80 +2426,29 @@ class DOCXOutlineExporter:
                 if vAli is not None and vAli.get(f"{{{W_NS}}}val"):
                     valign = vAli.get(f"{{{W_NS}}}val")
 
-                shading = None
-                sh = tcPr.find("./w:shd", NSMAP) if tcPr is not None else None
-                if sh is not None and sh.get(f"{{{W_NS}}}val") not in ("nil", "clear"):
-                    shading = sh.get(f"{{{W_NS}}}fill") or sh.get(f"{{{W_NS}}}color")
-
-                cell_text = DOCXOutlineExporter._collect_text_from_p(tc)
-
-                gridSpan = tcPr.find("./w:gridSpan", NSMAP) if tcPr is not None else None
-                colspan = 1
-                if gridSpan is not None and gridSpan.get(f"{{{W_NS}}}val"):
-                    try:
-                        colspan = max(1, min(MAX_SPAN, int(gridSpan.get(f"{{{W_NS}}}val"))))
-                    except Exception:
-                        colspan = 1
-
-                vMerge = tcPr.find("./w:vMerge", NSMAP) if tcPr is not None else None
-                vm_attr = vMerge.get(f"{{{W_NS}}}val") if vMerge is not None else None
                 is_continue = (vMerge is not None and vm_attr in (None, "", "continue"))
                 is_restart = (vMerge is not None and vm_attr not in ("continue", "cont", "0"))
 
                 if is_continue:
                     row_cells.append({"text": "", "colspan": 1, "rowspan": 0, "align": align, "valign": valign})
-                    c_vis += 1
                     continue
 
-                rowspan = 1
-                if is_restart:
-                    col_index = c_vis
-                    down = r_idx + 1
-                    while down < len(all_tr):
-                        tlist = all_tr[down].findall("./w:tc", NSMAP)
-                        if not tlist:
-                            break
-
-                        cur_col = 0
-                        target_tc = None
-                        for n_tc in tlist:
-                            n_pr = n_tc.find("./w:tcPr", NSMAP)
-                            n_grid = n_pr.find("./w:gridSpan", NSMAP) if n_pr is not None else None
-                            n_cs = 1
-                            if n_grid is not None and n_grid.get(f"{{{W_NS}}}val"):
-                                try:
-                                    n_cs = max(1, min(MAX_SPAN, int(n_grid.get(f"{{{W_NS}}}val"))))
-                                except Exception:
-                                    n_cs = 1
-                            if cur_col <= col_index < cur_col + n_cs:
-                                target_tc = n_tc
-                                break
-                            cur_col += n_cs
-
-                        if target_tc is None:
-                            break
-
-                        n_pr = target_tc.find("./w:tcPr", NSMAP)
-                        n_vm = n_pr.find("./w:vMerge", NSMAP) if n_pr is not None else None
-                        if n_vm is None:
-                            break
-                        nv = n_vm.get(f"{{{W_NS}}}val")
-                        if nv in (None, "", "continue", "cont", "1"):
-                            rowspan += 1
-                            down += 1
-                            continue
-                        else:
-                            break
+                shading = None
+                sh = tcPr.find("./w:shd", NSMAP) if tcPr is not None else None
+                if sh is not None and sh.get(f"{{{W_NS}}}val") not in ("nil", "clear"):
+                    shading = sh.get(f"{{{W_NS}}}fill") or sh.get(f"{{{W_NS}}}color")
 
-                row_cells.append({
-                    "text": cell_text,
+                cell = {
+                    "text": DOCXOutlineExporter._collect_text_from_p(tc),
                     "colspan": colspan,
-                    "rowspan": max(1, rowspan),
+                    "rowspan": 1,
                     "align": align,
                     "valign": valign,
                     "shading": shading
-                })
-                c_vis += 1
+                }
+                row_cells.append(cell)
+                if is_restart:
+                    open_spans[grid_col] = cell
 
             rows_data.append(row_cells)
 
@@ -1440,43 +2466,17 @@ class DOCXOutlineExporter:
                 colWidthsPt.append(round(pt, 2))
 
         if (not colWidthsPt) or (len(colWidthsPt) != cols):
-            first_tr = all_tr[0] if all_tr else None
             widths_acc = [0.0] * max(cols, len(colWidthsPt) or cols)
-            used_tcW = False
-            if first_tr is not None:
-                tcs = first_tr.findall("./w:tc", NSMAP)
-                cur_col = 0
-                for tc in tcs:
-                    tcPr = tc.find("./w:tcPr", NSMAP)
-                    wpt = None
-                    if tcPr is not None:
-                        tcW = tcPr.find("./w:tcW", NSMAP)
-                        if tcW is not None and tcW.get(f"{{{W_NS}}}w"):
-                            wtype = tcW.get(f"{{{W_NS}}}type")
-                            wval = tcW.get(f"{{{W_NS}}}w")
-                            if wtype in (None, "dxa"):
-                                wpt = _twip_to_pt(wval)
-                            elif wtype == "pct":
-                                try:
-                                    pct = float(wval) / 50.0
-                                    wpt = pct * 4.8
-                                except Exception:
-                                    wpt = None
-                    gridSpan = tcPr.find("./w:gridSpan", NSMAP) if tcPr is not None else None
-                    cs = 1
-                    if gridSpan is not None and gridSpan.get(f"{{{W_NS}}}val"):
-                        try:
-                            cs = max(1, min(50, int(gridSpan.get(f"{{{W_NS}}}val"))))
-                        except Exception:
-                            cs = 1
-                    if wpt is None:
-                        wpt = tableWidthPt * (cs / float(cols or 1))
-                    share = float(wpt) / float(cs or 1)
-                    for k in range(cs):
-                        if cur_col + k < len(widths_acc):
-                            widths_acc[cur_col + k] += share
-                    cur_col += cs
-                    used_tcW = True
+            used_tcW = bool(first_row_widths)
+            cur_col = 0
+            for wpt, cs in first_row_widths:
+                if wpt is None:
+                    wpt = tableWidthPt * (cs / float(cols or 1))
+                share = float(wpt) / float(cs or 1)
+                for k in range(cs):
+                    if cur_col + k < len(widths_acc):
+                        widths_acc[cur_col + k] += share
+                cur_col += cs
             if used_tcW:
                 colWidthsPt = [round(max(1.0, v), 2) for v in widths_acc[:cols]]
             else:
@@ -1518,7 +2518,56 @@ class DOCXOutlineExporter:
             table_obj["pageHeightPt"] = delta_state["pageHeightPt"]
         if "pageMarginsPt" in delta_state:
             table_obj["pageMarginsPt"] = delta_state["pageMarginsPt"]
-        return "[[TABLE " + json.dumps(table_obj, ensure_ascii=False) + "]]"
+        self._table_seq += 1
+        return ["[[TABLE " + json.dumps(obj, ensure_ascii=False) + "]]"
+                for obj in self._split_table_segments(table_obj, f"tbl{self._table_seq}")]
+
+    def _split_table_segments(self, table_obj: Dict[str, Any], seg_id: str) -> List[Dict[str, Any]]:
+        """
+        Split a long table into row segments of about _TABLE_SEGMENT_ROWS rows.
+
+        Cuts are only made between rows that no rowspan crosses. Every continuation segment
+        repeats the header rows and carries {"segment": {index, id, count, firstRow}} so the
+        JSX side can append its body rows to the table created by segment 0.
+        """
+        data = table_obj.get("data") or []
+        limit = int(self._TABLE_SEGMENT_ROWS or 0)
+        if limit <= 0 or len(data) <= limit:
+            return [table_obj]
+        header_rows = min(int(table_obj.get("headerRows") or 0), len(data))
+        starts = [0]
+        reach = 0
+        for r_idx, row in enumerate(data):
+            if r_idx - starts[-1] >= limit and r_idx > header_rows and reach <= r_idx:
+                starts.append(r_idx)
+            for cell in row:
+                try:
+                    reach = max(reach, r_idx + int(cell.get("rowspan", 1) or 0))
+                except Exception:
+                    pass
+        if len(starts) == 1:
+            return [table_obj]
+
+        header = []
+        for r_idx, row in enumerate(data[:header_rows]):
+            cells = []
+            for cell in row:
+                cell = dict(cell)
+                if int(cell.get("rowspan", 1) or 0) > header_rows - r_idx:
+                    cell["rowspan"] = header_rows - r_idx
+                cells.append(cell)
+            header.append(cells)
+        count = len(starts)
+        segments: List[Dict[str, Any]] = []
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < count else len(data)
+            seg_data = data[start:end] if index == 0 else header + data[start:end]
+            seg = {"segment": {"index": index, "id": seg_id, "count": count, "firstRow": start}}
+            seg.update(table_obj)
+            seg["rows"] = len(seg_data)
+            seg["data"] = seg_data
+            segments.append(seg)
+        return segments
 
 
     def _resolve_default_section_state(self) -> Dict[str, Any]:
@@ -1528,7 +2577,10 @@ class DOCXOutlineExporter:
             "pageHeightPt": 792.0,
             "pageMarginsPt": {"top": 72.0, "bottom": 72.0, "left": 72.0, "right": 72.0},
         }
-        body_sect = getattr(self.doc._element.body, "sectPr", None)
+        if self.streaming:
+            body_sect = self._stream.body_sect_pr
+        else:
+            body_sect = getattr(self.doc._element.body, "sectPr", None)
         if body_sect is not None:
             return self._merge_section_state(base, body_sect)
         return base
@@ -1611,180 +2663,40 @@ class DOCXOutlineExporter:
     # ---------- Numbering (lists) ----------
     def _parse_numbering_xml(self, xml_bytes: bytes):
         try:
-            root = etree.fromstring(xml_bytes)
+            self.numbering = NumberingTables.from_xml(xml_bytes)
         except Exception as e:
             logger.warning(f"Failed to parse numbering.xml: {e}")
-            return
-        for abs_num in root.findall("w:abstractNum", NSMAP):
-            anid_s = abs_num.get(f"{{{W_NS}}}abstractNumId")
-            if anid_s is None:
-                continue
-            try:
-                anid = int(anid_s)
-            except Exception:
-                continue
-            lvls: Dict[int, Dict[str, Optional[str]]] = {}
-            for lvl in abs_num.findall("w:lvl", NSMAP):
-                ilvl_s = lvl.get(f"{{{W_NS}}}ilvl")
-                if ilvl_s is None:
-                    continue
-                try:
-                    ilvl = int(ilvl_s)
-                except Exception:
-                    continue
-                start = 1
-                start_el = lvl.find("w:start", NSMAP)
-                if start_el is not None and start_el.get(f"{{{W_NS}}}val") is not None:
-                    try:
-                        start = int(start_el.get(f"{{{W_NS}}}val"))
-                    except Exception:
-                        start = 1
-                numFmt = None
-                numFmt_el = lvl.find("w:numFmt", NSMAP)
-                if numFmt_el is not None:
-                    numFmt = numFmt_el.get(f"{{{W_NS}}}val")
-                lvlText = None
-                lvlText_el = lvl.find("w:lvlText", NSMAP)
-                if lvlText_el is not None:
-                    lvlText = lvlText_el.get(f"{{{W_NS}}}val")
-                lvls[ilvl] = {"start": start, "numFmt": numFmt, "lvlText": lvlText}
-            self.abstract_lvls[anid] = lvls
-        for num in root.findall("w:num", NSMAP):
-            numId_s = num.get(f"{{{W_NS}}}numId")
-            if numId_s is None:
-                continue
-            try:
-                numId = int(numId_s)
-            except Exception:
-                continue
-            an_el = num.find("w:abstractNumId", NSMAP)
-            if an_el is not None and an_el.get(f"{{{W_NS}}}val") is not None:
-                try:
-                    anid = int(an_el.get(f"{{{W_NS}}}val"))
-                    self.num_map_abstract[numId] = anid
-                except Exception:
-                    pass
-            for ov in root.findall("w:lvlOverride", NSMAP):
-                ilvl_el = ov.find("w:ilvl", NSMAP)
-                if ilvl_el is None or ilvl_el.get(f"{{{W_NS}}}val") is None:
-                    continue
-                try:
-                    ilvl = int(ilvl_el.get(f"{{{W_NS}}}val"))
-                except Exception:
-                    continue
-                start_el = ov.find(".//w:startOverride", NSMAP)
-                if start_el is not None and start_el.get(f"{{{W_NS}}}val") is not None:
-                    try:
-                        start_val = int(start_el.get(f"{{{W_NS}}}val"))
-                    except Exception:
-                        start_val = None
-                else:
-                    start_val = None
-                if start_val is not None:
-                    self.num_overrides.setdefault(numId, {})[ilvl] = start_val
-
-    def _ensure_counters(self, numId: int):
-        if numId not in self.num_counters:
-            counters = [0]*9
-            anid = self.num_map_abstract.get(numId)
-            for il in range(9):
-                start = 1
-                if numId in self.num_overrides and il in self.num_overrides[numId]:
-                    start = self.num_overrides[numId][il]
-                elif anid in self.abstract_lvls and il in self.abstract_lvls[anid]:
-                    try:
-                        start = int(self.abstract_lvls[anid][il].get("start") or 1)
-                    except Exception:
-                        start = 1
-                counters[il] = start - 1
-            self.num_counters[numId] = counters
-
-    def _format_level_num(self, anid: Optional[int], ilvl: int, val: int) -> str:
-        numFmt = None
-        if anid in self.abstract_lvls and ilvl in self.abstract_lvls[anid]:
-            numFmt = self.abstract_lvls[anid][ilvl].get("numFmt")
-        if numFmt in (None, "decimal"):
-            return str(val)
-        if numFmt == "lowerLetter":
-            return _int_to_alpha(val, upper=False)
-        if numFmt == "upperLetter":
-            return _int_to_alpha(val, upper=True)
-        if numFmt == "lowerRoman":
-            return _int_to_roman(val, upper=False)
-        if numFmt == "upperRoman":
-            return _int_to_roman(val, upper=True)
-        if numFmt in (
-            "chineseCountingThousand",
-            "chineseCounting",
-            "chineseLegalSimplified",
-            "chineseLegal",
-            "chineseCountingSimplified",
-            "chineseCountingTraditional",
-            "japaneseCounting",
-        ):
-            return _int_to_chinese(val)
-        if numFmt == "bullet":
-            return "•"
-        return str(val)
-
-    def _build_label_from_lvlText(self, anid: Optional[int], ilvl: int, counters: List[int]) -> str:
-        lvlText = None
-        if anid in self.abstract_lvls and ilvl in self.abstract_lvls[anid]:
-            lvlText = self.abstract_lvls[anid][ilvl].get("lvlText")
-        if not lvlText:
-            cur_val = counters[ilvl]
-            return self._format_level_num(anid, ilvl, cur_val) + "."
-        out = lvlText
-        for i in range(1, 10):
-            if f"%{i}" in out:
-                level_idx = i-1
-                val = counters[level_idx]
-                out = out.replace(f"%{i}", self._format_level_num(anid, level_idx, val))
-        return out
 
     def list_info_for_paragraph(self, paragraph) -> Tuple[str, Dict[str, str]]:
         p_el = paragraph._element
         meta: Dict[str, str] = {}
         numPr = p_el.find("./w:pPr/w:numPr", NSMAP)
-
-        def _numPr_from_style(style_obj):
-            try:
-                st = style_obj
-                visited = set()
-                while st and id(st) not in visited:
-                    visited.add(id(st))
-                    el = getattr(st, "_element", None)
-                    if el is not None:
-                        np = el.find("./w:pPr/w:numPr", NSMAP)
-                        if np is not None:
-                            return copy.deepcopy(np)
-                    st = getattr(st, "base_style", None)
-            except Exception:
-                return None
-            return None
-
-        try:
-            style_name = getattr(getattr(paragraph, "style", None), "name", None)
-        except Exception:
-            style_name = None
+        # paragraph.text is costly; only build the debug messages when they are emitted
+        debug = logger.isEnabledFor(logging.DEBUG)
+        style = self.styles.for_paragraph(paragraph) if numPr is None or debug else None
+        style_name = style.name if style is not None else None
 
         if numPr is None:
-            numPr = _numPr_from_style(getattr(paragraph, "style", None))
+            numPr = style.num_pr if style is not None else None
             if numPr is not None:
-                logger.debug(f"list_info: numPr from style chain; style={style_name} text={paragraph.text!r}")
+                if debug:
+                    logger.debug(f"list_info: numPr from style chain; style={style_name} text={paragraph.text!r}")
             else:
-                logger.debug(f"list_info: no numPr; style={style_name} text={paragraph.text!r}")
+                if debug:
+                    logger.debug(f"list_info: no numPr; style={style_name} text={paragraph.text!r}")
                 return "", {}
 
         numId_el = numPr.find("./w:numId", NSMAP)
         if numId_el is None or numId_el.get(f"{{{W_NS}}}val") is None:
-            logger.debug(f"list_info: no numId; style={style_name} text={paragraph.text!r}")
+            if debug:
+                logger.debug(f"list_info: no numId; style={style_name} text={paragraph.text!r}")
             return "", {}
         ilvl_el = numPr.find("./w:ilvl", NSMAP)
         try:
             numId = int(numId_el.get(f"{{{W_NS}}}val"))
         except Exception:
-            logger.debug(f"list_info: numId parse fail; style={style_name} text={paragraph.text!r}")
+            if debug:
+                logger.debug(f"list_info: numId parse fail; style={style_name} text={paragraph.text!r}")
             return "", {}
         ilvl = 0
         if ilvl_el is not None and ilvl_el.get(f"{{{W_NS}}}val") is not None:
@@ -1792,53 +2704,39 @@ class DOCXOutlineExporter:
                 ilvl = int(ilvl_el.get(f"{{{W_NS}}}val"))
             except Exception:
                 ilvl = 0
-        self._ensure_counters(numId)
-        counters = self.num_counters[numId]
-        counters[ilvl] += 1
-        anid = self.num_map_abstract.get(numId)
-        for j in range(ilvl+1, len(counters)):
-            start = 1
-            if numId in self.num_overrides and j in self.num_overrides[numId]:
-                start = self.num_overrides[numId][j]
-            elif anid in self.abstract_lvls and j in self.abstract_lvls[anid]:
-                try:
-                    start = int(self.abstract_lvls[anid][j].get("start") or 1)
-                except Exception:
-                    start = 1
-            counters[j] = start - 1
-        label = self._build_label_from_lvlText(anid, ilvl, counters)
-        if label and not re.search(r'\s$', label):
+        if not 0 <= ilvl < NumberingTables.LEVELS:
+            if debug:
+                logger.debug(f"list_info: ilvl out of range; ilvl={ilvl} text={paragraph.text!r}")
+            return "", {}
+        numdef, counters = self.numbering.advance(numId, ilvl)
+        anid = numdef.abstract_id
+        label = numdef.label(ilvl, counters)
+        if label and not label[-1].isspace():
             label = label + " "
         if label:
             meta["list-label"] = label
         meta["list-level"] = str(ilvl)
-        numFmt = None
-        if anid in self.abstract_lvls and ilvl in self.abstract_lvls[anid]:
-            lvl_info = self.abstract_lvls[anid][ilvl]
-            numFmt = lvl_info.get("numFmt")
-            if lvl_info.get("lvlText"):
-                meta["list-lvltext"] = lvl_info.get("lvlText")
+        numFmt = numdef.num_fmts[ilvl]
+        if numdef.lvl_texts[ilvl]:
+            meta["list-lvltext"] = numdef.lvl_texts[ilvl]
         if numFmt:
             meta["list-type"] = numFmt
             meta["list-numfmt"] = numFmt
         meta["numId"] = str(numId)
         meta["abstractNumId"] = str(anid) if anid is not None else ""
-        logger.debug(f"list_info: label={label!r} meta={meta} style={style_name}")
+        if debug:
+            logger.debug(f"list_info: label={label!r} meta={meta} style={style_name}")
         return label, meta
 
     # ---------- Paragraph style helpers ----------
-    @staticmethod
-    def _paragraph_style_attrs(p) -> Dict[str, str]:
+    def _paragraph_style_attrs(self, p) -> Dict[str, str]:
         if not STYLE_FLAGS.get("paragraph", True):
             return {}
         attrs: Dict[str, str] = {}
         # style name
-        try:
-            sname = getattr(getattr(p, "style", None), "name", None)
-            if sname:
-                attrs["style-name"] = str(sname)
-        except Exception:
-            pass
+        style = self.styles.for_paragraph(p)
+        if style is not None and style.name:
+            attrs["style-name"] = str(style.name)
         p_el = p._element
         ppr = p_el.find("./w:pPr", NSMAP)
         # alignment
@@ -1904,7 +2802,7 @@ class DOCXOutlineExporter:
         return {k:v for k,v in attrs.items() if v}
 
     # ---------- Text with inline refs + numbering + styles ----------
-    def _paragraph_text_with_refs(self, paragraph, include_pstyle: bool = True, include_list_prefix: bool = False) -> str:
+    def _paragraph_text_with_refs(self, paragraph, include_list_prefix: bool = False) -> str:
         chunks = []
         para_align = self._paragraph_align_token(paragraph)
         # list numbering
@@ -1955,8 +2853,6 @@ class DOCXOutlineExporter:
                 except Exception:
                     blips = []
             if blips:
-                import os
-                os.makedirs(self.assets_dir or ".", exist_ok=True)
                 for bl in blips:
                     rid = bl.get(f"{{{R_NS}}}embed")
                     if not rid:
@@ -1969,18 +2865,13 @@ class DOCXOutlineExporter:
                     if image_part is None:
                         continue
 
-                    # export blob -> assets/...
-                    ext = os.path.splitext(getattr(image_part, "partname", ""))[1] or ".png"
-                    if not hasattr(self, "_img_seq"):
-                        self._img_seq = 0
-                    self._img_seq += 1
-                    fname = f"image_{self._img_seq:04d}{ext}"
-                    out_path = os.path.join(self.assets_dir or ".", fname)
+                    # export blob -> assets/image_<hash>.<ext> (one file per unique blob)
+                    img_meta = None
                     try:
-                        with open(out_path, "wb") as f:
-                            f.write(image_part.blob)
-                    except Exception:
-                        pass
+                        out_path, img_meta = self._image_store().store(image_part)
+                    except Exception as exc:
+                        self._image_store().record_error(str(getattr(image_part, "partname", "") or rid), exc)
+                        out_path = ""
 
                     # size from wp:extent (EMU -> pt)
                     wpt = hpt = ""
@@ -2072,17 +2963,24 @@ class DOCXOutlineExporter:
                     except Exception:
                         pass
 
-                    # original pixel size (if available)
-                    # original pixel size (true pixels, not EMU)
-                    pxw = pxh = ""
-                    try:
-                        im = getattr(image_part, "image", None)
-                        if im is not None and getattr(im, "px_width", None) and getattr(im, "px_height", None):
-                            pxw = str(int(im.px_width))
-                            pxh = str(int(im.px_height))
-                        # fallback: if px not available, leave blank (IDML绔寜 w/h pt 澶勭悊鍗冲彲)
-                    except Exception:
-                        pass
+                    # original pixel size (true pixels, not EMU) from the cached header probe
+                    pxw = pxh = dpi = color_mode = orientation = ""
+                    if img_meta and img_meta.get("pxw") and img_meta.get("pxh"):
+                        pxw = str(img_meta["pxw"])
+                        pxh = str(img_meta["pxh"])
+                        if img_meta.get("dpiX"):
+                            dpi = f"{img_meta['dpiX']:g}"
+                        color_mode = img_meta.get("colorMode") or ""
+                        orientation = str(img_meta.get("orientation") or "")
+                    else:
+                        try:
+                            im = getattr(image_part, "image", None)
+                            if im is not None and getattr(im, "px_width", None) and getattr(im, "px_height", None):
+                                pxw = str(int(im.px_width))
+                                pxh = str(int(im.px_height))
+                            # fallback: if px not available, leave blank (IDML绔寜 w/h pt 澶勭悊鍗冲彲)
+                        except Exception:
+                            pass
 
                     if (not posV) and offY:
                         posV = "paragraph" 
@@ -2098,7 +2996,8 @@ class DOCXOutlineExporter:
                     inline_flag = "1" if is_inline else "0"
 
                     img_tpl = (
-                        '[[IMG src="{src}" w="{w}" h="{h}" pxw="{pxw}" pxh="{pxh}" '
+                        '[[IMG src="{src}" w="{w}" h="{h}" pxw="{pxw}" pxh="{pxh}" dpi="{dpi}" '
+                        'colorMode="{colorMode}" orientation="{orientation}" '
                         'align="{align}" inline="{inline_}" wrap="{wrap}" wrapSide="{wrapSide}" wrapText="{wrapText}" '
                         'posH="{posH}" posHref="{posHref}" posV="{posV}" posVref="{posVref}" rotation="{rotation}" '
                         'flipH="{flipH}" flipV="{flipV}" offX="{offX}" offY="{offY}" distT="{distT}" distB="{distB}" '
@@ -2116,6 +3015,9 @@ class DOCXOutlineExporter:
                         h=hpt,
                         pxw=pxw,
                         pxh=pxh,
+                        dpi=dpi,
+                        colorMode=color_mode,
+                        orientation=orientation,
                         align=para_align,
                         inline_=inline_flag,
                         wrap=wrap,
@@ -2319,29 +3221,9 @@ class DOCXOutlineExporter:
             if has_page_break:
                 self._word_page_seq += 1
 
-        out = "".join(chunks).strip()
-
-        # Paragraph style marker (only for body lines, not headings)
-        if include_pstyle and STYLE_FLAGS.get("paragraph", True):
-            pattrs = MyDOCNode._escape_attr_dict(self._paragraph_style_attrs(paragraph))
-            if pattrs:
-                kv = " ".join([f'{k}="{v}"' for k, v in pattrs.items()])
-                out += f' [[PSTYLE {kv}]]'
-        return out
+        return "".join(chunks).strip()
 
     # ---------- Heading detection (heading mode) ----------
-    @staticmethod
-    def _style_based_heading_level(style_name: Optional[str]) -> Optional[int]:
-        if not style_name:
-            return None
-        m = re.match(r"Heading\s+(\d+)$", str(style_name).strip(), flags=re.IGNORECASE)
-        if m:
-            try:
-                return int(m.group(1))
-            except Exception:
-                return None
-        return None
-
     @staticmethod
     def _outline_level_from_p(paragraph) -> Optional[int]:
         el = paragraph._element
@@ -2356,95 +3238,78 @@ class DOCXOutlineExporter:
         return None
 
     # ---------- Regex mode helpers ----------
-    def _regex_choose_splitter(self, lines: List[str]) -> Optional[object]:
-        for line in lines:
-            s = line.strip()
-            if not s:
-                continue
-            for idx, (kind, pat) in enumerate(REGEX_ORDER):
-                if kind == "fixed":
-                    cp = COMPILED_FIXED[idx]
-                    if cp is not None and cp.match(s):
-                        if _is_regex_excluded(s):
-                            continue
-                        return FixedRegexSplitter(cp)
-                elif kind == "numeric_dotted":
-                    m = NUMERIC_DOTTED.match(s)
-                    if m:
-                        rest = s[m.end():].lstrip()
-                        token = m.group(1) or ""
-                        if rest and rest[0] in "年月日" and len(token) >= 4:
-                            continue
-                        if not rest:
-                            continue
-                        depth = len([seg for seg in re.split(r'[\.．]', token) if seg])
-                        if _is_regex_excluded(s):
-                            continue
-                        return NumericDepthSplitter(depth)
-        return None
-
-    def _regex_split_into_nodes(self, parent: MyDOCNode, level: int, lines: List[str]) -> List[MyDOCNode]:
-        nodes: List[MyDOCNode] = []
-        splitter = self._regex_choose_splitter(lines)
-        found_first = False
-        current: Optional[MyDOCNode] = None
-
-        if splitter is None:
-            for ln in lines:
-                if ln and ln.strip():
-                    self._append_body_fragment(parent, ln)
-            return nodes
-
-        for ln in lines:
-            s = ln.strip()
-            if s.startswith("[[LAYOUT"):
-                # Keep layout markers in place with the current scope
-                if found_first and current is not None:
-                    current._pending_for_children.append(ln)
-                else:
-                    self._append_body_fragment(parent, ln)
-                continue
-            if splitter.matches(s) and not _is_regex_excluded(s):
-                index = len(nodes) + 1
-                props = {"mode": "regex"}
-                title = _strip_pstyle_marker(s)
-                node = MyDOCNode(name=title, level=level, index=index, parent=parent,
-                                 element_type="heading", properties=props)
-                parent.add_child(node)
-                nodes.append(node)
-                current = node
-                found_first = True
-            else:
-                if not found_first:
-                    if s:
-                        self._append_body_fragment(parent, ln)
-                else:
-                    current._pending_for_children.append(ln)
-        return nodes
-
-    def _regex_build_recursive(self, parent: MyDOCNode, level: int, lines: List[str], max_depth: Optional[int] = 200):
-        if max_depth is not None and level > max_depth:
-            for ln in lines:
-                if ln and ln.strip():
-                    self._append_body_fragment(parent, ln)
-            return
-        children = self._regex_split_into_nodes(parent, level, lines)
-        if not children:
-            return
-        for child in children:
-            if child._pending_for_children:
-                child_lines = child._pending_for_children
-                child._pending_for_children = []
-                self._regex_build_recursive(child, level + 1, child_lines, max_depth=max_depth)
-
-    def _regex_finalize_pending_to_body(self, node: MyDOCNode):
-        if node._pending_for_children:
-            for ln in node._pending_for_children:
-                if ln and ln.strip():
-                    self._append_body_fragment(node, ln)
-            node._pending_for_children = []
-        for ch in node.children:
-            self._regex_finalize_pending_to_body(ch)
+    def _regex_build_outline(self, parent: MyDOCNode, level: int, lines: List[Tuple[str, Optional[Dict[str, str]]]],
+                             max_depth: Optional[int] = 200):
+        """
+        Segment `lines` ((text, paragraph attributes) pairs, as in body_paragraphs) into regex
+        headings under `parent` in one pass over an explicit stack.
+
+        Each open level takes its splitter from the first line inside it that a rule accepts (a
+        fixed rule, or a numeric_dotted depth) and applies it to the whole level, including the
+        lines seen before that one, which are held back until the splitter is known. A line a
+        splitter accepts opens the next sibling at that level and closes everything deeper; any
+        other line belongs to the innermost open level. This builds the same tree as re-splitting
+        level by level, but each line is classified once and the lowest accepting level is found
+        through per-splitter position lists, with no recursion.
+        """
+        clf = HEADING_CLASSIFIER
+        # frame: [node, child level, splitter key or None, children opened, lines held back]
+        stack: List[List[Any]] = [[parent, level, None, 0, []]]
+        fixed_open: Dict[int, List[int]] = {}  # fixed rule index -> stack positions splitting on it
+        numeric_open: Dict[int, List[int]] = {}  # numeric depth -> stack positions splitting on it
+
+        def _close_above(pos: int):
+            while len(stack) > pos + 1:
+                node, _lvl, key, _n, held = stack.pop()
+                for item in held:
+                    self._append_body_fragment(node, item[0], item[1])
+                if key is not None:
+                    table = fixed_open if key[0] == "fixed" else numeric_open
+                    table[key[1]].pop()
+                    if not table[key[1]]:
+                        del table[key[1]]
+
+        def _feed(ln: str, pattrs: Optional[Dict[str, str]], s: str, cls: Tuple[int, int, bool], is_layout: bool):
+            rule, depth, excluded = cls
+            if not is_layout and not excluded and (fixed_open or numeric_open):
+                # lowest open level whose splitter accepts this line
+                best = None
+                if depth >= 0 and depth in numeric_open:
+                    best = numeric_open[depth][0]
+                if rule >= 0:
+                    for r, positions in fixed_open.items():
+                        if (best is None or positions[0] < best) and clf.fixed_matches(r, s, cls):
+                            best = positions[0]
+                if best is not None:
+                    _close_above(best)
+                    frame = stack[best]
+                    frame[3] += 1
+                    node = MyDOCNode(name=s, level=frame[1], index=frame[3],
+                                     parent=frame[0], element_type="heading", properties={"mode": "regex"})
+                    frame[0].add_child(node)
+                    stack.append([node, frame[1] + 1, None, 0, []])
+                    return
+            top = len(stack) - 1
+            frame = stack[top]
+            if frame[2] is not None or (max_depth is not None and frame[1] > max_depth):
+                self._append_body_fragment(frame[0], ln, pattrs)
+                return
+            if rule < 0:
+                if s:
+                    frame[4].append((ln, pattrs, s, cls, is_layout))
+                return
+            key = ("numeric", depth) if REGEX_ORDER[rule][0] == "numeric_dotted" else ("fixed", rule)
+            frame[2] = key
+            (fixed_open if key[0] == "fixed" else numeric_open).setdefault(key[1], []).append(top)
+            held, frame[4] = frame[4], []
+            for item in held:
+                _feed(*item)
+            _feed(ln, pattrs, s, cls, is_layout)
+
+        for ln, pattrs in lines:
+            s = ln.strip() if ln else ""
+            _feed(ln, pattrs, s, clf.classify(s), s.startswith("[[LAYOUT"))
+        _close_above(-1)
 
     # ---------- Build tree ----------
     def build_tree(self):
@@ -2455,24 +3320,44 @@ class DOCXOutlineExporter:
         else:
             logger.info("Building hierarchy (hybrid): heading first, then regex refine bodies...")
             self._build_tree_heading_mode()
-            self._refine_bodies_with_regex(self.root)
+            if self.hybrid_workers > 1 and len(self.root.children) > 1:
+                self._refine_chapters_parallel(self.root)
+            else:
+                self._refine_bodies_with_regex(self.root)
             logger.info("Hybrid build complete.")
 
+    def _iter_stream_block_items(self):
+        """Streaming counterpart of _iter_block_items; section states come from the reader's prepass."""
+        default_state = self.default_section_state
+        breaks = [(idx, self._merge_section_state(default_state, sect))
+                  for idx, sect in self._stream.section_breaks]
+        ptr = 0
+        for idx, kind, obj in self._stream.iter_blocks():
+            while ptr < len(breaks) and breaks[ptr][0] < idx:
+                ptr += 1
+            state = breaks[ptr][1] if ptr < len(breaks) else default_state
+            if kind == 'tbl' and self.skip_tables:
+                continue
+            yield (kind, obj, state)
+
     def _iter_block_items(self):
-        """Yield ('p'/'tbl', object, section_state) in document order."""
+        """Yield ('p'/'tbl', object, section_state) in document order; section_state is shared, do not mutate."""
+        if self.streaming:
+            yield from self._iter_stream_block_items()
+            return
         for kind, index, state in self._body_iter_items:
             if kind == 'p':
                 if index >= len(self._doc_paragraphs):
                     logger.warning(f"Paragraph index {index} out of range (len={len(self._doc_paragraphs)}); skipped.")
                     continue
-                yield ('p', self._doc_paragraphs[index], self._copy_section_state(state))
+                yield ('p', self._doc_paragraphs[index], state)
             elif kind == 'tbl':
                 if self.skip_tables:
                     continue
                 if index >= len(self._doc_tables):
                     logger.warning(f"Table index {index} out of range (len={len(self._doc_tables)}); skipped.")
                     continue
-                yield ('tbl', self._doc_tables[index], self._copy_section_state(state))
+                yield ('tbl', self._doc_tables[index], state)
 
     def _build_tree_heading_mode(self):
         logger.info("Building hierarchy (heading mode)...")
@@ -2510,13 +3395,10 @@ class DOCXOutlineExporter:
                 p = obj
                 raw_text = (p.text or "").strip()
 
+                style = self.styles.for_paragraph(p)
                 level = self._outline_level_from_p(p)
                 if level is None:
-                    try:
-                        style_name = getattr(p.style, "name", None)
-                    except Exception:
-                        style_name = None
-                    lvl2 = self._style_based_heading_level(style_name)
+                    lvl2 = style.heading_level if style is not None else None
                     level = lvl2 if lvl2 is not None else 0
 
                 if level > 0 and (raw_text or True):
@@ -2530,8 +3412,8 @@ class DOCXOutlineExporter:
 
                     parent = stack[level - 1]
                     index = sum(1 for c in parent.children if c.level == level) + 1
-                    props = {"style": getattr(p.style, "name", None), "outline_level": level, "mode": "heading"}
-                    heading_text = self._paragraph_text_with_refs(p, include_pstyle=False) or raw_text
+                    props = {"style": style.name if style is not None else None, "outline_level": level, "mode": "heading"}
+                    heading_text = self._paragraph_text_with_refs(p) or raw_text
                     node = MyDOCNode(name=heading_text, level=level, index=index,
                                      parent=parent, element_type="heading", properties=props)
                     parent.add_child(node)
@@ -2542,16 +3424,16 @@ class DOCXOutlineExporter:
                         stack = stack[:level + 1]
                     current = node
                 else:
-                    text_with_refs = self._paragraph_text_with_refs(p, include_pstyle=True)
+                    text_with_refs = self._paragraph_text_with_refs(p)
                     if text_with_refs or raw_text:
                         target = current if current is not None else self.root
                         if text_with_refs.strip():
-                            self._append_body_fragment(target, text_with_refs)
+                            # paragraph attributes for body lines only, not headings
+                            self._append_body_fragment(target, text_with_refs, self._paragraph_style_attrs(p))
 
             elif kind == "tbl":
-                ph = self._table_placeholder(obj._element, section_state)
-                if ph:
-                    target = stack[-1] if stack else self.root
+                target = stack[-1] if stack else self.root
+                for ph in self._table_placeholders(obj._element, section_state):
                     self._append_body_fragment(target, ph)
                 continue
 
@@ -2560,22 +3442,18 @@ class DOCXOutlineExporter:
 
     def _build_tree_regex_mode(self):
         logger.info("Building hierarchy (regex mode, hierarchical segmentation with dynamic numeric depth)...")
-        lines: List[str] = []
+        lines: List[Tuple[str, Optional[Dict[str, str]]]] = []
         for kind, obj, section_state in self._iter_block_items():
             if kind == "layout":
                 marker = self._layout_marker_from_state(section_state)
                 if marker:
-                    lines.append(marker)
+                    lines.append((marker, None))
                 continue
             if kind == "p":
-                line = self._paragraph_text_with_refs(obj, include_pstyle=True)
-                lines.append(line)
+                lines.append((self._paragraph_text_with_refs(obj), self._paragraph_style_attrs(obj) or None))
             elif kind == "tbl":
-                ph = self._table_placeholder(obj._element, section_state)
-                if ph:
-                    lines.append(ph)
-        self._regex_build_recursive(self.root, level=1, lines=lines, max_depth=self._regex_max_depth)
-        self._regex_finalize_pending_to_body(self.root)
+                lines.extend((ph, None) for ph in self._table_placeholders(obj._element, section_state))
+        self._regex_build_outline(self.root, level=1, lines=lines, max_depth=self._regex_max_depth)
         logger.info("Regex tree build complete.")
 
     # ---------- Hybrid refinement ----------
@@ -2584,8 +3462,7 @@ class DOCXOutlineExporter:
             lines = node.body_paragraphs[:]
             node.body_paragraphs = []
             before = len(node.children)
-            self._regex_build_recursive(node, level=node.level + 1, lines=lines, max_depth=self._regex_max_depth)
-            self._regex_finalize_pending_to_body(node)
+            self._regex_build_outline(node, level=node.level + 1, lines=lines, max_depth=self._regex_max_depth)
             after = len(node.children)
             if after > before:
                 newkids = node.children[before:]
@@ -2594,50 +3471,114 @@ class DOCXOutlineExporter:
         for ch in list(node.children):
             self._refine_bodies_with_regex(ch)
 
+    @classmethod
+    def _refinement_only(cls, max_depth: Optional[int]) -> "DOCXOutlineExporter":
+        """Bare exporter carrying just the state regex refinement touches (used in worker processes)."""
+        exporter = cls.__new__(cls)
+        exporter._regex_max_depth = max_depth
+        exporter._stats = {"body_fragments": 0, "table_fragments": 0, "image_fragments": 0}
+        return exporter
+
+    def _refine_chapters_parallel(self, root: MyDOCNode):
+        """
+        Hybrid refinement with each Level1 chapter refined in a worker process.
+
+        Chapters are independent, so each subtree is shipped as a MyDOCNode payload, refined by
+        _refine_chapter_worker and put back at its original position; the tree and the fragment
+        counters end up exactly as a serial _refine_bodies_with_regex(root) would leave them.
+        Falls back to the serial path if the pool cannot be used.
+        """
+        chapters = list(root.children)
+        workers = min(self.hybrid_workers, len(chapters))
+        rules = (list(REGEX_ORDER), list(NEGATIVE_PATTERNS), NUMERIC_DOTTED_PATTERN)
+        payloads = [(self._regex_max_depth, ch.to_payload()) for ch in chapters]
+        logger.info(f"Hybrid refine: {len(chapters)} chapters on {workers} worker processes")
+        # keep the (large) parent heap out of the workers' and our own cyclic GC passes
+        gc.freeze()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_refine_worker,
+                                     initargs=(rules,)) as pool:
+                results = list(pool.map(_refine_chapter_worker, payloads,
+                                        chunksize=max(1, len(payloads) // (workers * 4))))
+        except Exception as exc:
+            logger.warning(f"Parallel hybrid refine failed, refining serially: {exc}")
+            self._refine_bodies_with_regex(root)
+            return
+        finally:
+            gc.unfreeze()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()  # rebuilding allocates many nodes at once; skip the collections it would trigger
+        try:
+            root.children = []
+            for tree, stats in results:
+                root.children.append(MyDOCNode.from_payload(tree, root))
+                for key, val in stats.items():
+                    self._stats[key] = self._stats.get(key, 0) + val
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
     # ---------- XML export ----------
     @staticmethod
     def _escape(text: str) -> str:
         return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
 
-    def _notes_to_xml(self) -> str:
-        parts = []
+    def _iter_notes_xml_lines(self):
         if self.footnotes:
-            parts.append("  <footnotes>")
+            yield "  <footnotes>"
             for nid, body in sorted(self.footnotes.items(), key=lambda kv: int(kv[0])):
-                parts.append(f'    <footnote id="{nid}">{self._escape(body)}</footnote>')
-            parts.append("  </footnotes>")
+                yield f'    <footnote id="{nid}">{self._escape(body)}</footnote>'
+            yield "  </footnotes>"
         if self.endnotes:
-            parts.append("  <endnotes>")
+            yield "  <endnotes>"
             for nid, body in sorted(self.endnotes.items(), key=lambda kv: int(kv[0])):
-                parts.append(f'    <endnote id="{nid}">{self._escape(body)}</endnote>')
-            parts.append("  </endnotes>")
-        return "\n".join(parts)
+                yield f'    <endnote id="{nid}">{self._escape(body)}</endnote>'
+            yield "  </endnotes>"
 
-    def to_xml(self, output_path: str):
-        logger.info("Writing XML")
-        parts = ['<?xml version="1.0" encoding="UTF-8"?>', "<document>"]
+    def iter_xml_lines(self):
+        """Yield formatted_output.xml line by line while walking the tree (no whole-document string)."""
+        yield '<?xml version="1.0" encoding="UTF-8"?>'
+        yield "<document>"
         if self.root.body_paragraphs:
-            parts.append("  <body>")
-            for para in self.root.body_paragraphs:
-                text, pattrs = _parse_pstyle_marker(para) if STYLE_FLAGS.get("paragraph", True) else (para, {})
-                esc = MyDOCNode._escape_xml(text)
-                esc = MyDOCNode._convert_refs_to_xml(esc)
-                attrs_str = ""
-                if STYLE_FLAGS.get("paragraph", True) and pattrs:
-                    kvs = [f'{k}="{MyDOCNode._escape_attr(v)}"' for k,v in pattrs.items() if v]
-                    if kvs:
-                        attrs_str = " " + " ".join(kvs)
-                parts.append(f"    <p{attrs_str}>{esc}</p>")
-            parts.append("  </body>")
+            yield "  <body>"
+            for text, pattrs in self.root.body_paragraphs:
+                yield MyDOCNode._paragraph_xml(text, pattrs, "    ")
+            yield "  </body>"
+        for child in self.root.children:
+            yield from child.iter_xml_lines(indent=1)
+        yield from self._iter_notes_xml_lines()
+        yield "</document>"
+
+    # ---------- Paragraph stream ----------
+    def note_texts(self) -> Dict[str, Dict[str, str]]:
+        """Footnote/endnote text by id, normalised the way xml_to_idml indexes the XML notes."""
+        return {
+            "FN": {str(nid): body.strip() for nid, body in self.footnotes.items()},
+            "EN": {str(nid): body.strip() for nid, body in self.endnotes.items()},
+        }
+
+    def iter_paragraphs(self):
+        """Yield the built tree as paragraph_ir.Paragraph objects, the stream write_jsx consumes.
+
+        Same paragraphs, in the same order, as extract_paragraphs_with_levels() returns for the
+        XML written by to_xml(), without serializing and re-parsing it. Call after process().
+        """
+        notes = self.note_texts()
+        for text, pattrs in self.root.body_paragraphs:
+            ir = MyDOCNode._paragraph_ir("Body", text, pattrs, notes)
+            if ir is not None:
+                yield ir
         for child in self.root.children:
-            parts.append(child.to_xml_string(notes={"footnotes": self.footnotes, "endnotes": self.endnotes}, indent=1))
-        notes_xml = self._notes_to_xml()
-        if notes_xml:
-            parts.append(notes_xml)
-        parts.append("</document>")
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(parts))
+            yield from child.iter_paragraphs(notes)
+
+    def to_xml(self, output_path: str):
+        logger.info("Writing XML")
+        with open(output_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+            lines = self.iter_xml_lines()
+            f.write(next(lines))
+            for line in lines:
+                f.write("\n")
+                f.write(line)
         logger.info("Done.")
 
     def _count_headings(self, node: MyDOCNode) -> int:
@@ -2649,9 +3590,12 @@ class DOCXOutlineExporter:
     def _collect_summary(self) -> Dict[str, Any]:
         return {
             "mode": self.mode,
-            "word_paragraphs": len(self.doc.paragraphs),
-            "word_tables": len(self.doc.tables),
+            "word_paragraphs": self._stream.paragraph_count if self.streaming else len(self.doc.paragraphs),
+            "word_tables": self._stream.table_count if self.streaming else len(self.doc.tables),
             "image_fragments": self._stats.get("image_fragments", 0),
+            "image_assets": len(self._assets) if self._assets is not None else 0,
+            "image_assets_reused": self._assets.reused if self._assets is not None else 0,
+            "image_errors": list(self._assets.errors) if self._assets is not None else [],
             "footnotes": len(self.footnotes),
             "endnotes": len(self.endnotes),
             "body_fragments": self._stats.get("body_fragments", 0),
@@ -2662,18 +3606,49 @@ class DOCXOutlineExporter:
     def summary(self) -> Dict[str, Any]:
         return self._last_summary or self._collect_summary()
 
-    def process(self, output_path: str):
-        # set assets dir next to output
+    def _image_store(self) -> ImageAssetStore:
+        if self._assets is None:
+            self._assets = ImageAssetStore(self.assets_dir or ".")
+        return self._assets
+
+    def process(self, output_path: str, write_xml: bool = True):
+        # set assets dir next to output; with write_xml=False the XML itself is skipped and
+        # the tree is read back through iter_paragraphs()
         outdir = os.path.dirname(os.path.abspath(output_path)) or "."
         self.assets_dir = os.path.join(outdir, "assets")
         self.extract_notes()
         self.build_tree()
-        self.to_xml(output_path)
+        if write_xml:
+            self.to_xml(output_path)
+        if self._assets is not None:
+            self._assets.finish()
+            try:
+                self._assets.write_manifest()
+            except Exception as exc:
+                logger.warning(f"Failed to write image manifest: {exc}")
         self._last_summary = self._collect_summary()
+        if self._owns_package:
+            self.package.close()
         return self._last_summary
         self._last_summary = self._collect_summary()
         return self._last_summary
 
+def _init_refine_worker(rules):
+    """ProcessPoolExecutor initializer: install the parent's regex rules (spawned workers start from defaults)."""
+    global REGEX_ORDER, NEGATIVE_PATTERNS, NUMERIC_DOTTED_PATTERN
+    REGEX_ORDER, NEGATIVE_PATTERNS, NUMERIC_DOTTED_PATTERN = rules
+    _compile_patterns()
+
+
+def _refine_chapter_worker(job):
+    """Refine one Level1 subtree payload; returns the refined payload and the fragment counters it added."""
+    max_depth, payload = job
+    exporter = DOCXOutlineExporter._refinement_only(max_depth)
+    node = MyDOCNode.from_payload(payload)
+    exporter._refine_bodies_with_regex(node)
+    return node.to_payload(), exporter._stats
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser(description="DOCX -> XML exporter (heading/regex/hybrid) with style switches")
     parser.add_argument("--mode", choices=["heading", "regex", "hybrid"], default="heading", help="Detection mode")
@@ -2681,6 +3656,8 @@ def main(argv=None):
     parser.add_argument("--regex-max-depth", type=int, help="Max depth for regex segmentation (0 for unlimited, default 200)")
     parser.add_argument("--no-inline-list-labels", dest="inline_list_labels", action="store_false", help="不把列表编号前缀写回正文，仅保留为元数据（默认写回，与 Word 视觉一致）")
     parser.set_defaults(inline_list_labels=True)
+    parser.add_argument("--stream", action="store_true", help="Stream word/document.xml instead of loading the full python-docx DOM (lower peak memory)")
+    parser.add_argument("--hybrid-workers", type=int, default=0, help="Hybrid mode: refine Level1 chapters in N worker processes (0/1 = serial)")
     parser.add_argument("input", help="Input .docx path")
     parser.add_argument("output", help="Output .xml path")
     args = parser.parse_args(argv)
@@ -2691,6 +3668,8 @@ def main(argv=None):
         regex_config_path=args.regex_config,
         regex_max_depth=args.regex_max_depth,
         inline_list_labels=args.inline_list_labels,
+        streaming=args.stream,
+        hybrid_workers=args.hybrid_workers,
     )
     exporter.process(args.output)
     # print(f"[OK] mode={args.mode} XML saved -> {args.output}")
@@ -0,0 +1,187 @@
+"""
+Header-only image metadata probe.
+
+Reads just enough of a PNG/JPEG/GIF/TIFF/BMP/EMF blob to report pixel size, resolution,
+colour mode and EXIF orientation without decoding pixel data. Results are plain dicts so
+they can be cached in the assets manifest and reused by later runs.
+"""
+import struct
+from typing import Any, Dict, Optional
+
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_COLOR = {0: "Gray", 2: "RGB", 3: "Indexed", 4: "Gray", 6: "RGB"}
+_TIFF_PHOTOMETRIC = {0: "Gray", 1: "Gray", 2: "RGB", 3: "Indexed", 5: "CMYK", 6: "RGB", 8: "Lab"}
+_JPEG_COMPONENTS = {1: "Gray", 3: "RGB", 4: "CMYK"}
+
+
+def _info(fmt: str, pxw: int = 0, pxh: int = 0, dpi_x: float = 0.0, dpi_y: float = 0.0,
+          color_mode: str = "", orientation: int = 1) -> Dict[str, Any]:
+    return {
+        "format": fmt,
+        "pxw": int(pxw or 0),
+        "pxh": int(pxh or 0),
+        "dpiX": round(float(dpi_x or 0.0), 2),
+        "dpiY": round(float(dpi_y or 0.0), 2),
+        "colorMode": color_mode,
+        "orientation": int(orientation or 1),
+    }
+
+
+def _probe_png(data: bytes) -> Optional[Dict[str, Any]]:
+    if len(data) < 29 or data[12:16] != b"IHDR":
+        return None
+    width, height, _depth, color_type = struct.unpack(">IIBB", data[16:26])
+    dpi_x = dpi_y = 0.0
+    pos = 8
+    while pos + 8 <= len(data):
+        length, ctype = struct.unpack(">I4s", data[pos:pos + 8])
+        if ctype in (b"IDAT", b"IEND"):
+            break
+        if ctype == b"pHYs" and length >= 9 and pos + 17 <= len(data):
+            ppu_x, ppu_y, unit = struct.unpack(">IIB", data[pos + 8:pos + 17])
+            if unit == 1:  # pixels per metre
+                dpi_x, dpi_y = ppu_x * 0.0254, ppu_y * 0.0254
+            break
+        pos += 12 + length
+    return _info("png", width, height, dpi_x, dpi_y, _PNG_COLOR.get(color_type, ""))
+
+
+def _tiff_ifd0(data: bytes, base: int = 0) -> Optional[Dict[int, Any]]:
+    """Return IFD0 tags (SHORT/LONG as int, RATIONAL as float) of a TIFF stream starting at base."""
+    head = data[base:base + 8]
+    if head[:4] == b"II*\x00":
+        endian = "<"
+    elif head[:4] == b"MM\x00*":
+        endian = ">"
+    else:
+        return None
+    (ifd,) = struct.unpack(endian + "I", head[4:8])
+    pos = base + ifd
+    if pos + 2 > len(data):
+        return None
+    (count,) = struct.unpack(endian + "H", data[pos:pos + 2])
+    tags: Dict[int, Any] = {}
+    for i in range(count):
+        entry = pos + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, typ, _n = struct.unpack(endian + "HHI", data[entry:entry + 8])
+        raw = data[entry + 8:entry + 12]
+        if typ == 3:
+            tags[tag] = struct.unpack(endian + "H", raw[:2])[0]
+        elif typ == 4:
+            tags[tag] = struct.unpack(endian + "I", raw)[0]
+        elif typ == 5:
+            off = base + struct.unpack(endian + "I", raw)[0]
+            if off + 8 <= len(data):
+                num, den = struct.unpack(endian + "II", data[off:off + 8])
+                tags[tag] = (num / den) if den else 0.0
+    return tags
+
+
+def _tiff_dpi(tags: Dict[int, Any]):
+    scale = 2.54 if tags.get(296, 2) == 3 else 1.0
+    if tags.get(296, 2) == 1:
+        return 0.0, 0.0
+    return float(tags.get(282, 0.0)) * scale, float(tags.get(283, 0.0)) * scale
+
+
+def _probe_tiff(data: bytes) -> Optional[Dict[str, Any]]:
+    tags = _tiff_ifd0(data)
+    if not tags:
+        return None
+    dpi_x, dpi_y = _tiff_dpi(tags)
+    return _info("tiff", tags.get(256, 0), tags.get(257, 0), dpi_x, dpi_y,
+                 _TIFF_PHOTOMETRIC.get(tags.get(262, -1), ""), tags.get(274, 1))
+
+
+def _probe_jpeg(data: bytes) -> Optional[Dict[str, Any]]:
+    pos = 2
+    dpi_x = dpi_y = 0.0
+    orientation = 1
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        seg = pos + 4
+        if marker == 0xE0 and data[seg:seg + 5] == b"JFIF\x00" and seg + 12 <= size:
+            units, den_x, den_y = struct.unpack(">BHH", data[seg + 7:seg + 12])
+            if units == 1:
+                dpi_x, dpi_y = float(den_x), float(den_y)
+            elif units == 2:
+                dpi_x, dpi_y = den_x * 2.54, den_y * 2.54
+        elif marker == 0xE1 and data[seg:seg + 6] == b"Exif\x00\x00":
+            tags = _tiff_ifd0(data[:pos + 2 + length], seg + 6) or {}
+            orientation = tags.get(274, orientation)
+            if not dpi_x:
+                dpi_x, dpi_y = _tiff_dpi(tags)
+        elif marker in _JPEG_SOF and seg + 6 <= size:
+            _precision, height, width, comps = struct.unpack(">BHHB", data[seg:seg + 6])
+            return _info("jpeg", width, height, dpi_x, dpi_y, _JPEG_COMPONENTS.get(comps, ""), orientation)
+        elif marker == 0xDA:
+            break
+        pos += 2 + length
+    return None
+
+
+def _probe_gif(data: bytes) -> Optional[Dict[str, Any]]:
+    if len(data) < 10:
+        return None
+    width, height = struct.unpack("<HH", data[6:10])
+    return _info("gif", width, height, color_mode="Indexed")
+
+
+def _probe_bmp(data: bytes) -> Optional[Dict[str, Any]]:
+    if len(data) < 26:
+        return None
+    (dib_size,) = struct.unpack("<I", data[14:18])
+    if dib_size == 12:
+        width, height, _planes, bits = struct.unpack("<HHHH", data[18:26])
+        return _info("bmp", width, height, color_mode="Indexed" if bits <= 8 else "RGB")
+    if len(data) < 46:
+        return None
+    width, height, _planes, bits = struct.unpack("<iiHH", data[18:30])
+    ppm_x, ppm_y = struct.unpack("<ii", data[38:46])
+    return _info("bmp", abs(width), abs(height), ppm_x * 0.0254, ppm_y * 0.0254,
+                 "Indexed" if bits <= 8 else "RGB")
+
+
+def _probe_emf(data: bytes) -> Optional[Dict[str, Any]]:
+    if len(data) < 88:
+        return None
+    left, top, right, bottom = struct.unpack("<iiii", data[8:24])
+    dev_w, dev_h, mm_w, mm_h = struct.unpack("<iiii", data[72:88])
+    dpi_x = dev_w / (mm_w / 25.4) if mm_w > 0 else 0.0
+    dpi_y = dev_h / (mm_h / 25.4) if mm_h > 0 else 0.0
+    return _info("emf", right - left + 1, bottom - top + 1, dpi_x, dpi_y, "Vector")
+
+
+def probe_image(data: bytes) -> Optional[Dict[str, Any]]:
+    """Return header metadata for an image blob, or None for unknown/truncated formats."""
+    if not data:
+        return None
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return _probe_png(data)
+        if data[:2] == b"\xff\xd8":
+            return _probe_jpeg(data)
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return _probe_gif(data)
+        if data[:4] in (b"II*\x00", b"MM\x00*"):
+            return _probe_tiff(data)
+        if data[:2] == b"BM":
+            return _probe_bmp(data)
+        if data[:4] == b"\x01\x00\x00\x00" and data[40:44] == b" EMF":
+            return _probe_emf(data)
+    except (struct.error, IndexError, ZeroDivisionError):
+        return None
+    return None
@@ -0,0 +1,316 @@
+"""
+Paragraph token IR passed from the XML reader to the JSX writer.
+
+A paragraph is a style name plus a flat token list: text runs carrying an inline-style
+bitmask, note references, and image/table/frame records, together with the paragraph
+attributes (alignment, indents, spacing) the exporter read from Word. The [[...]] marker syntax is
+produced only on demand by marker_text(), for addParaWithNotes in entry.js and for
+callers that still hand over (style, text) tuples.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+STYLE_I = 1
+STYLE_B = 2
+STYLE_U = 4
+STYLE_SUP = 8
+STYLE_SUB = 16
+# opening order used when serializing; closing is always innermost first
+STYLE_MARKERS = ((STYLE_I, "I"), (STYLE_B, "B"), (STYLE_U, "U"), (STYLE_SUP, "SUP"), (STYLE_SUB, "SUB"))
+_STYLE_NAMES = dict(STYLE_MARKERS)
+
+IMG_PLACEHOLDER_ANY_RE = re.compile(r'\[\[IMG\s+(.+?)\]\]', re.I)
+FRAME_OPEN_RE = re.compile(r'\[\[FRAME\s+([^\]]+)\]\]', re.I)
+FRAME_CLOSE_TOKEN = "[[/FRAME]]"
+MEDIA_MARKER_RE = re.compile(r'\[\[(?:(?i:(IMG|FRAME|TABLE))\b|(/FRAME\]\]))')
+
+
+class TextRun:
+    __slots__ = ("text", "style")
+
+    def __init__(self, text: str, style: int = 0):
+        self.text = text
+        self.style = style
+
+
+class NoteRef:
+    """Footnote/endnote reference; rid is None for notes written inline in the XML."""
+    __slots__ = ("kind", "rid", "text", "style")
+
+    def __init__(self, kind: str, rid: Optional[str], text: str, style: int = 0):
+        self.kind = kind
+        self.rid = rid
+        self.text = text
+        self.style = style
+
+    def marker(self) -> str:
+        # the note body is inlined, so a literal ]] would end the marker early
+        text = self.text.replace("]]", "】】")
+        if self.rid is None:
+            return f"[[{self.kind}:{text}]]"
+        note = f"[[{self.kind}:{text}]]" if text else "[*]"
+        return f"[[FNI:{self.rid}]]{note}"
+
+
+class ImageRef:
+    __slots__ = ("attr_text", "raw")
+
+    def __init__(self, attr_text: str, raw: str):
+        self.attr_text = attr_text
+        self.raw = raw
+
+    def marker(self) -> str:
+        return self.raw
+
+
+class TableRef:
+    __slots__ = ("json_text", "raw")
+
+    def __init__(self, json_text: str, raw: str):
+        self.json_text = json_text
+        self.raw = raw
+
+    def marker(self) -> str:
+        return self.raw
+
+
+def is_table_continuation(json_text: str) -> bool:
+    """Whether a [[TABLE {...}]] payload is a continuation segment (index >= 1) of a split table."""
+    try:
+        obj = json.loads(json_text)
+    except ValueError:
+        return False
+    seg = obj.get("segment") if isinstance(obj, dict) else None
+    return isinstance(seg, dict) and int(seg.get("index", 0) or 0) > 0
+
+
+class FrameOpen:
+    __slots__ = ("attr_text", "raw")
+
+    def __init__(self, attr_text: str, raw: str):
+        self.attr_text = attr_text
+        self.raw = raw
+
+    def marker(self) -> str:
+        return self.raw
+
+
+class FrameClose:
+    __slots__ = ("raw",)
+
+    def __init__(self, raw: str = FRAME_CLOSE_TOKEN):
+        self.raw = raw
+
+    def marker(self) -> str:
+        return self.raw
+
+
+class Paragraph:
+    """Style name, tokens and attributes (None if the paragraph has none).
+
+    The tokens are not modified once marker_text() has been called.
+    """
+    __slots__ = ("style", "tokens", "attrs", "_text")
+
+    def __init__(self, style: str, tokens: Optional[List[Any]] = None, text: Optional[str] = None,
+                 attrs: Optional[Dict[str, str]] = None):
+        self.style = style
+        self.tokens = tokens if tokens is not None else []
+        self.attrs = attrs
+        self._text = text
+
+    @classmethod
+    def from_marker_text(cls, style: str, text: str) -> "Paragraph":
+        tokens: List[Any] = []
+        if text:
+            append_text(tokens, text, 0)
+        return cls(style, tokens)
+
+    def marker_text(self) -> str:
+        if self._text is None:
+            self._text = tokens_to_marker_text(self.tokens)
+        return self._text
+
+    def restyled(self, style: str) -> "Paragraph":
+        return Paragraph(style, self.tokens, self._text, self.attrs)
+
+    def leading_text(self) -> str:
+        """Text of the runs before the first note or media token, markers left out."""
+        parts = []
+        for tok in self.tokens:
+            if type(tok) is not TextRun:
+                break
+            parts.append(tok.text)
+        return "".join(parts)
+
+    def __iter__(self) -> Iterator[str]:
+        # lets legacy code keep unpacking paragraphs as (style, text)
+        yield self.style
+        yield self.marker_text()
+
+    def __repr__(self) -> str:
+        return repr((self.style, self.marker_text()))
+
+
+def _table_marker_end(text: str, start: int) -> Optional[Tuple[int, int, int]]:
+    """Return (json start, json end, marker end) of the [[TABLE {...}]] at start, or None."""
+    json_start = text.find("{", start)
+    if json_start == -1:
+        return None
+    brace = 0
+    in_string = False
+    escape = False
+    pos = json_start
+    length = len(text)
+    while pos < length:
+        ch = text[pos]
+        if escape:
+            escape = False
+        elif ch == "\\":
+            escape = True
+        elif ch == '"':
+            in_string = not in_string
+        elif not in_string:
+            if ch == "{":
+                brace += 1
+            elif ch == "}":
+                brace -= 1
+                if brace == 0:
+                    close_idx = text.find("]]", pos + 1)
+                    if close_idx == -1:
+                        return None
+                    return json_start, pos + 1, close_idx + 2
+        pos += 1
+    return None
+
+
+def split_media(text: str) -> List[Any]:
+    """Split text into plain strings and Image/Table/Frame records for its media markers."""
+    pieces: List[Any] = []
+    pos = search = 0
+    while True:
+        m = MEDIA_MARKER_RE.search(text, search)
+        if not m:
+            break
+        start = m.start()
+        kind = (m.group(1) or "").upper()
+        if m.group(2):
+            tok, end = FrameClose(m.group(0)), m.end()
+        elif kind == "IMG":
+            im = IMG_PLACEHOLDER_ANY_RE.match(text, start)
+            if not im:
+                search = start + 2
+                continue
+            tok, end = ImageRef(im.group(1), im.group(0)), im.end()
+        elif kind == "FRAME":
+            fm = FRAME_OPEN_RE.match(text, start)
+            if not fm:
+                search = start + 2
+                continue
+            tok, end = FrameOpen(fm.group(1), fm.group(0)), fm.end()
+        else:
+            span = _table_marker_end(text, start)
+            if not span:
+                search = start + 2
+                continue
+            json_start, json_end, end = span
+            tok = TableRef(text[json_start:json_end], text[start:end])
+        if start > pos:
+            pieces.append(text[pos:start])
+        pieces.append(tok)
+        pos = search = end
+    if pos < len(text):
+        pieces.append(text[pos:])
+    return pieces
+
+
+def _append_run(tokens: List[Any], text: str, style: int) -> None:
+    if tokens:
+        last = tokens[-1]
+        if type(last) is TextRun and last.style == style:
+            last.text += text
+            return
+    tokens.append(TextRun(text, style))
+
+
+def append_text(tokens: List[Any], text: str, style: int) -> None:
+    """Append non-empty text in the given style, lifting any media markers into records."""
+    if "[[" not in text:
+        _append_run(tokens, text, style)
+        return
+    for piece in split_media(text):
+        if type(piece) is str:
+            _append_run(tokens, piece, style)
+        else:
+            tokens.append(piece)
+
+
+def strip_tokens(tokens: List[Any]) -> List[Any]:
+    """Trim whitespace the way str.strip() would on the serialized paragraph."""
+    while tokens and type(tokens[0]) is TextRun and not tokens[0].style:
+        text = tokens[0].text.lstrip()
+        if text:
+            tokens[0].text = text
+            break
+        tokens.pop(0)
+    while tokens and type(tokens[-1]) is TextRun and not tokens[-1].style:
+        text = tokens[-1].text.rstrip()
+        if text:
+            tokens[-1].text = text
+            break
+        tokens.pop()
+    return tokens
+
+
+# (open flags, next style) -> (markers to emit, open flags afterwards)
+_TRANSITIONS: Dict[Tuple[Tuple[int, ...], int], Tuple[str, Tuple[int, ...]]] = {}
+
+
+def _style_transition(opened: Tuple[int, ...], style: int) -> Tuple[str, Tuple[int, ...]]:
+    key = (opened, style)
+    hit = _TRANSITIONS.get(key)
+    if hit is None:
+        keep = 0
+        for flag in opened:
+            if not style & flag:
+                break
+            keep += 1
+        parts = [f"[[/{_STYLE_NAMES[flag]}]]" for flag in reversed(opened[keep:])]
+        still_open = opened[:keep]
+        have = sum(still_open)
+        added = tuple(flag for flag, _ in STYLE_MARKERS if style & flag and not have & flag)
+        parts.extend(f"[[{_STYLE_NAMES[flag]}]]" for flag in added)
+        hit = _TRANSITIONS[key] = ("".join(parts), still_open + added)
+    return hit
+
+
+def tokens_to_marker_text(tokens: List[Any], note_marker: Optional[Callable[[NoteRef], str]] = None) -> str:
+    """Serialize tokens back to the [[...]] marker syntax read by addParaWithNotes.
+
+    note_marker, if given, replaces NoteRef.marker() (e.g. to emit note-table references).
+    """
+    out: List[str] = []
+    append = out.append
+    opened: Tuple[int, ...] = ()
+    current = 0
+    for tok in tokens:
+        kind = type(tok)
+        if kind is TextRun:
+            style, text = tok.style, tok.text
+        else:
+            # media records sit outside any inline formatting
+            if kind is NoteRef:
+                style = tok.style
+                text = note_marker(tok) if note_marker is not None else tok.marker()
+            else:
+                style = 0
+                text = tok.marker()
+        if style != current:
+            markers, opened = _style_transition(opened, style)
+            append(markers)
+            current = style
+        append(text)
+    if opened:
+        append(_style_transition(opened, 0)[0])
+    return "".join(out)
@@ -35,7 +35,10 @@
                        ? CONFIG.flags.logWrite : %LOG_WRITE%;   // true=log debug; false=only warn/error/info
       var ctx = __initEventLog(EVENT_FILE, LOG_WRITE);
       try{
-        if (EVENT_FILE){
+        // later chunk scripts, and retries of the first one, append to the log the first attempt started
+        var chunk = (CONFIG && CONFIG.chunk) ? CONFIG.chunk : null;
+        var appendLog = chunk && (chunk.index > 1 || (__readChunkState(chunk.state) || {}).started);
+        if (EVENT_FILE && !appendLog){
           EVENT_FILE.encoding = "UTF-8";
           EVENT_FILE.open("w");
           EVENT_FILE.writeln("");
@@ -336,7 +339,7 @@
                              ? CONFIG.flags.safePageLimit : 2000;
     function __createProgressTracker(){
       var __PARA_SEQ = 0;
-      var __PROGRESS_TOTAL = %PROGRESS_TOTAL%;
+      var __PROGRESS_TOTAL = 0;
       var __PROGRESS_DONE = 0;
       var __PROGRESS_LAST_PCT = -1;
       var __PROGRESS_LAST_TS = (new Date()).getTime();
@@ -390,11 +393,21 @@
           __pushEvent(__EVENT_CTX, "progress", "[PROGRESS][COMPLETE] done=" + doneDisplay + "/" + __PROGRESS_TOTAL + " pct=" + pct + suffix);
         }catch(_){}
       }
+      function setTotal(total){ __PROGRESS_TOTAL = total; }
+      function snapshot(){ return {done: __PROGRESS_DONE, seq: __PARA_SEQ}; }
+      function restore(saved){
+        if (!saved) return;
+        __PROGRESS_DONE = saved.done || 0;
+        __PARA_SEQ = saved.seq || 0;
+      }
       function resetSeq(){ __PARA_SEQ = 0; }
       function nextSeq(){ __PARA_SEQ++; return __PARA_SEQ; }
       return {
         bump: bump,
         finalize: finalize,
+        setTotal: setTotal,
+        snapshot: snapshot,
+        restore: restore,
         resetSeq: resetSeq,
         nextSeq: nextSeq
       };
@@ -799,7 +812,7 @@ function _holderInnerBounds(holder){
         var __imgGroupSpecs = []; // collect when multi
 
         try{
-                var re = /\[{2,}FNI:(\d+)\]{2,}|\[{2,}(FN|EN):(.*?)\]{2,}|\[\[(\/?)(I|B|U|SUP|SUB)\]\]|\[\[IMG\s+([^\]]+)\]\]|\[\[TABLE\s+(\{[\s\S]*?\})\]\]/g;
+                var re = /\[{2,}FNI:(\d+)\]{2,}|\[{2,}(FN|EN):(.*?)\]{2,}|\[\[(\/?)(I|B|U|SUP|SUB)\]\]|\[\[IMG\s+([^\]]+)\]\]|\[\[TABLE\s+(\{[\s\S]*?\})\]\]|\[\[NOTE:(\d+)\]\]/g;
                 var last = 0, m;
                 var st = {i:0, b:0, u:0, sup:0, sub:0};
                 var noteCtx = {story: story, tf: tf, page: page, stFlags: st, pendingNoteId: null};
@@ -823,7 +836,7 @@ function _holderInnerBounds(holder){
                     try { story.insertionPoints[-1].appliedCharacterStyle = app.activeDocument.characterStyles.itemByName("[None]"); } catch(_){ try { story.insertionPoints[-1].appliedCharacterStyle = app.activeDocument.characterStyles[0]; } catch(__){} }
 
 
-                    if (m[1] || m[2] || m[4]) {
+                    if (m[1] || m[2] || m[4] || m[8]) {
                         __processNoteMatch(m, noteCtx);
                     } else if (m[6]) {
                 try{ log("[IMGDBG] enter [[IMG]] attrs=" + m[6]); }catch(_){}
@@ -1057,6 +1070,344 @@ function _holderInnerBounds(holder){
         }catch(_){}
     }
 
+    // --- operation stream (written by xml_to_idml.write_jsx) ---
+    // ops: ["p", style, text] | ["img", values, forceBlock, logContext] | ["imgs", [[values, forceBlock, logContext], ...]]
+    //      ["frame", values, text] | ["tbl", tableObj, restoreLayout] | ["ch"] | ["skip", style, reason, preview]
+    //      ["note", kind, id, text] (next __NOTES entry) | ["end", opsBefore] (last record)
+    function __specFromValues(keys, values){
+      var spec = {};
+      for (var i = 0; i < keys.length; i++) spec[keys[i]] = (values && i < values.length) ? values[i] : "";
+      return spec;
+    }
+    function __imageSpecFromOp(keys, values, forceBlock, logContext){
+      var spec = __specFromValues(keys, values);
+      spec.forceBlock = !!forceBlock;
+      if (logContext) spec.logContext = logContext;
+      return spec;
+    }
+
+    function __opImage(spec){
+      try {
+        var __imgCtx = spec.logContext || null;
+        var __imgTag = "[IMG]";
+        if (__imgCtx && __imgCtx.id) __imgTag = "[IMG][" + __imgCtx.id + "]";
+        var __imgWarnTag = "[ERROR]";
+        if (__imgCtx && __imgCtx.id) __imgWarnTag = "[ERROR][IMG " + __imgCtx.id + "]";
+        if (__imgCtx){
+          var __imgPrev = __imgCtx.preview ? String(__imgCtx.preview) : "";
+          if (__imgPrev.length > 80) __imgPrev = __imgPrev.substring(0,80) + "...";
+          var __imgSummary = ' para=' + (__imgCtx.paraIndex||"?") + ' style=' + (__imgCtx.style||"");
+          if (__imgPrev) __imgSummary += ' text="' + __imgPrev + '"';
+          log(__imgTag + " ctx" + __imgSummary);
+        }
+        log(__imgTag + " pyMeta src=" + spec.src + " inline=" + spec.inline);
+        // 0) 环境检查
+        log("[DBG] typeof __imgAddFloatingImage=" + (typeof __imgAddFloatingImage)
+            + " typeof __imgAddImageAtV2=" + (typeof __imgAddImageAtV2)
+            + " typeof __imgNormPath=" + (typeof __imgNormPath));
+        log("[DBG] tf=" + (tf&&tf.isValid) + " story=" + (story&&story.isValid) + " page=" + (page&&page.isValid));
+
+        // 1) 排版溢出
+        try{ if(typeof flushOverflow==="function"){ var _rs=flushOverflow(story,page,tf);
+          if(_rs&&_rs.frame&&_rs.page){ page=_rs.page; tf=_rs.frame; story=tf.parentStory; curTextFrame=tf; } } }catch(_){
+        }
+
+        // 2) 锚点
+        var ip=(tf&&tf.isValid)?_safeIP(tf):story.insertionPoints[-1];
+        // 3) 路径
+        var f=__imgNormPath(spec.src);
+        log("[DBG] __imgNormPath ok=" + (!!f) + " exists=" + (f&&f.exists ? "Y":"N") + " fsName=" + (f?f.fsName:"NA"));
+
+        if(f&&f.exists){
+          var inl=_trim(spec.inline); // 兼容 InDesign 2020
+          log(__imgTag + " dispatch src="+spec.src+" inline="+inl+" posH="+(spec.posH||"")+" posV="+(spec.posV||""));
+
+          if(inl==="0"||/^false$/i.test(inl)){
+            log("[DBG] dispatch -> __imgAddFloatingImage");
+            var rect=__imgAddFloatingImage(tf,story,page,spec);
+            if(rect&&rect.isValid) log(__imgTag + " ok (float): " + spec.src);
+            try{
+              if (__FLOAT_CTX && __FLOAT_CTX.lastTf && __FLOAT_CTX.lastTf.isValid){
+                tf = __FLOAT_CTX.lastTf;
+                story = tf.parentStory;
+                if(__FLOAT_CTX.lastPage && __FLOAT_CTX.lastPage.isValid){
+                  page = __FLOAT_CTX.lastPage;
+                } else {
+                  page = tf.parentPage;
+                }
+                try{
+                  if(typeof _safeIP==="function"){
+                    ip = _safeIP(tf);
+                  }
+                }catch(_){
+                }
+                if((!ip || !ip.isValid) && tf && tf.isValid && tf.insertionPoints && tf.insertionPoints.length){
+                  ip = tf.insertionPoints[-1];
+                }
+              }
+            }catch(_){
+            }
+          } else {
+            log("[DBG] dispatch -> __imgAddImageAtV2");
+            var rect=__imgAddImageAtV2(ip,spec);
+            if(rect&&rect.isValid) log(__imgTag + " ok (inline): " + spec.src);
+          }
+        } else {
+          log(__imgWarnTag + " missing: " + spec.src);
+        }
+        try{
+          var __imgDetail = (__imgCtx && __imgCtx.id) ? ("id=" + __imgCtx.id) : ("src=" + (spec && spec.src ? spec.src : ""));
+          __progressBump("IMG", __imgDetail);
+        }catch(_){
+        }
+      } catch(e) {
+        log(__imgWarnTag + " exception " + e);
+      }
+    }
+
+    function __opFrame(spec){
+      log("[PY][frame] id=" + spec.id + " len=" + String(spec.text||"").length);
+      try {
+        if (typeof __imgAddFloatingFrame === "function") {
+          __imgAddFloatingFrame(tf, story, page, spec);
+        } else {
+          log("[FRAME][WARN] addFloatingFrame missing; fallback insert text only (typeof=" + (typeof __imgAddFloatingFrame) + ")");
+          try {
+            var __ip = (typeof _safeIP==="function") ? _safeIP(tf) : null;
+            if (!__ip || !__ip.isValid) {
+              if (tf && tf.isValid && tf.insertionPoints && tf.insertionPoints.length) __ip = tf.insertionPoints[-1];
+              else if (story && story.isValid) __ip = story.insertionPoints[-1];
+            }
+            if (__ip && __ip.isValid) {
+              var txt = spec.text || "";
+              if (typeof smartWrapStr === "function") txt = smartWrapStr(txt);
+              __ip.contents = txt + "\r";
+            }
+          } catch(__fb) {
+            log("[FRAME][WARN] fallback insert failed: " + __fb);
+          }
+        }
+      } catch(e) {
+        log("[FRAME][EXC] " + e);
+      }
+    }
+
+    // ops embedded in __OPS, or (payload sidecar) one JSON record per line after a spec-keys header
+    function __openOpSource(payload){
+      if (!payload || !payload.payload){
+        var ops = (payload && payload.ops) ? payload.ops : [], pos = 0;
+        return {head: payload || {}, next: function(){ return pos < ops.length ? ops[pos++] : null; }, close: function(){}};
+      }
+      var f = File(payload.payload);
+      f.encoding = "UTF-8";
+      if (!f.exists || !f.open("r")){ log("[ERR] payload sidecar not readable: " + payload.payload); return null; }
+      var head = __jsonParseSafe(f.readln()) || {};
+      var lineNo = 1;
+      return {
+        head: head,
+        next: function(){
+          while (!f.eof){
+            var line = f.readln();
+            lineNo++;
+            if (!line) continue;
+            var op = __jsonParseSafe(line);
+            if (op) return op;
+            log("[ERR] payload record unreadable at line " + lineNo);
+          }
+          return null;
+        },
+        close: function(){ try{ f.close(); }catch(_){} }
+      };
+    }
+
+    // the first "ch" op only marks the chapter; later ones start a new page (carried across chunk scripts)
+    var __CHAPTER_SEEN = false;
+    function __runOps(payload){
+      var src = __openOpSource(payload);
+      if (!src) return;
+      var imgKeys = src.head.imgKeys || [], frameKeys = src.head.frameKeys || [];
+      var op, i = 0, expected = null;
+      try{
+        for (; (op = src.next()) !== null; i++){
+          var kind = op[0];
+          if (kind === "p"){
+            __ensureLayoutDefault();
+            addParaWithNotes(story, op[1], op[2]);
+          } else if (kind === "ch"){
+            if (__CHAPTER_SEEN) {
+              var __fl = flushOverflow(story, page, tf); story = __fl.frame.parentStory; page = __fl.page; tf = __fl.frame;
+              var pkt = startNewChapter(story, page, tf); story = pkt.story; page = pkt.page; tf = pkt.frame;
+            } else { __CHAPTER_SEEN = true; }
+          } else if (kind === "img"){
+            __ensureLayoutDefault();
+            __opImage(__imageSpecFromOp(imgKeys, op[1], op[2], op[3]));
+          } else if (kind === "imgs"){
+            __ensureLayoutDefault();
+            try{
+              var specs = [];
+              for (var j = 0; j < op[1].length; j++) specs.push(__imageSpecFromOp(imgKeys, op[1][j][0], op[1][j][1], op[1][j][2]));
+              __imgPlaceImageGroup(tf, story, page, specs);
+            }catch(__e){ try{ log('[IMG-GROUP][ERR] '+__e); }catch(_ee){} }
+          } else if (kind === "frame"){
+            __ensureLayoutDefault();
+            var frameSpec = __specFromValues(frameKeys, op[1]);
+            frameSpec.text = op[2] || "";
+            __opFrame(frameSpec);
+          } else if (kind === "tbl"){
+            __tblAddTableHiFi(op[1]);
+            if (op[2]){
+              try{if(__DEFAULT_LAYOUT && __DEFAULT_LAYOUT.pageOrientation=="landscape"){log("[TABLE][restore] skip: default landscape (py-gen)");}else{__tableRestoreLayout(); __ensureLayoutDefault();}}catch(__tblRest){}
+            }
+          } else if (kind === "skip"){
+            __logSkipParagraph(__nextParaSeq(), op[1], op[2], op[3]);
+          } else if (kind === "note"){
+            __NOTES.push([op[1], op[2], op[3]]);
+          } else if (kind === "end"){
+            expected = op[1];
+            break;
+          } else {
+            try{ log("[WARN] unknown op " + kind + " at " + i); }catch(_){}
+          }
+        }
+      } finally {
+        src.close();
+      }
+      if (expected === null){
+        try{ log("[WARN] payload ended without its end record after " + i + " ops (truncated?)"); }catch(_){}
+      } else if (i !== expected){
+        try{ log("[WARN] payload ops read=" + i + " expected=" + expected); }catch(_){}
+      }
+    }
+
+    // --- chunked run (CONFIG.chunk): the chunk scripts run in turn against one document ---
+    // The state file (first written by xml_to_idml.write_jsx) holds the chunk list, the last completed
+    // chunk and where it stopped. Every chunk but the last saves the document to state.work, with a
+    // copy of the state in a document label, before recording itself in the state file.
+    var __CHUNK = (CONFIG && CONFIG.chunk) ? CONFIG.chunk : null;
+    var __CHUNK_LABEL = "autoflowChunkState";
+    // the state file path, on every document this run created (found again to close a failed attempt)
+    var __CHUNK_RUN_LABEL = "autoflowChunkRun";
+
+    function __readChunkState(path){
+      var f = File(path || __CHUNK.state);
+      f.encoding = "UTF-8";
+      if (!f.exists || !f.open("r")) return null;
+      var text = f.read();
+      f.close();
+      return __jsonParseSafe(text);
+    }
+    function __writeChunkState(state){
+      var f = File(__CHUNK.state + ".tmp");
+      f.encoding = "UTF-8";
+      if (!f.open("w")) return false;
+      f.write(__jsonEncode(state));
+      f.close();
+      var target = File(__CHUNK.state);
+      try{ if (target.exists) target.remove(); }catch(_){}
+      return f.rename(target.name);
+    }
+    function __findOpenDocument(path){
+      var target = File(path);
+      for (var i = 0; i < app.documents.length; i++){
+        try{
+          var d = app.documents[i];
+          if (d.saved && d.fullName.fsName === target.fsName) return d;
+        }catch(_){}
+      }
+      return null;
+    }
+    // close (unsaved) the documents an earlier attempt of this run left open
+    function __closeChunkDocuments(){
+      for (var i = app.documents.length - 1; i >= 0; i--){
+        try{
+          var d = app.documents[i];
+          if (d.extractLabel(__CHUNK_RUN_LABEL) !== __CHUNK.state) continue;
+          d.close(SaveOptions.NO);
+          log("[CHUNK] closed a document left open by an earlier attempt");
+        }catch(eClose){ log("[WARN] chunk document not closed: " + eClose); }
+      }
+    }
+    // {state, doc} for this chunk, or null when it must not run (no state, out of order, already done)
+    function __beginChunk(){
+      var state = __readChunkState();
+      if (!state || !state.chunks){ log("[ERR] chunk state unreadable: " + __CHUNK.state); return null; }
+      var index = __CHUNK.index, d = null;
+      if (index === 1 && state.done === 0){
+        // a retry of the first chunk starts over from the template: drop what the failed attempt built
+        if (state.started) __closeChunkDocuments();
+        else { state.started = true; __writeChunkState(state); }
+      }
+      if (index > 1){
+        d = __findOpenDocument(state.work);
+        if (d && d.modified){
+          // an earlier attempt at this chunk stopped part-way: go back to the last checkpoint
+          try{ d.revert(); log("[CHUNK] reverted an unfinished attempt at chunk " + index); }
+          catch(eRev){ log("[ERR] chunk revert failed: " + eRev); return null; }
+        }
+        if (!d){
+          var wf = File(state.work);
+          if (!wf.exists){ log("[ERR] chunk work document missing: " + state.work); return null; }
+          d = app.open(wf);
+        }
+        // saved before the state file was written: the document's copy wins if it is further along
+        var saved = null;
+        try{ saved = __jsonParseSafe(d.extractLabel(__CHUNK_LABEL) || "null"); }catch(_){}
+        if (saved && saved.done > state.done){
+          state = saved;
+          __writeChunkState(state);
+        }
+      }
+      if (state.done >= index){ log("[CHUNK] chunk " + index + " already in the document; nothing to run"); return null; }
+      if (state.done !== index - 1){ log("[ERR] chunk " + index + " run out of order; state done=" + state.done); return null; }
+      return {state: state, doc: d};
+    }
+    function __chunkIsLast(){ return __CHUNK.index >= __CHUNK_RUN.state.chunks.length; }
+    function __restoreChunkPosition(doc, state){
+      __DEFAULT_LAYOUT = __cloneLayoutState(state.defaultLayout);
+      __CURRENT_LAYOUT = __cloneLayoutState(state.layout);
+      __DEFAULT_INNER_WIDTH = state.innerWidth;
+      __DEFAULT_INNER_HEIGHT = state.innerHeight;
+      __CHAPTER_SEEN = !!state.chapterSeen;
+      __PROGRESS.restore(state.progress);
+      tf = doc.textFrames.itemByID(state.frame);
+      if (!tf || !tf.isValid){
+        var st = doc.stories.itemByID(state.story);
+        tf = st.textContainers[st.textContainers.length - 1];
+      }
+      story = tf.parentStory;
+      page = (tf.parentPage && tf.parentPage.isValid) ? tf.parentPage : doc.pages[state.page];
+      curTextFrame = tf;
+      log("[CHUNK] resume chunk " + __CHUNK.index + " page=" + (page && page.name) + " frame=" + tf.id);
+    }
+    // record this chunk as done; all but the last save the document first (the resume point)
+    function __checkpointChunk(doc, last){
+      var state = __CHUNK_RUN.state;
+      state.done = __CHUNK.index;
+      try{
+        state.page = page.documentOffset;
+        state.frame = tf.id;
+        state.story = story.id;
+      }catch(ePos){ log("[WARN] chunk position unavailable: " + ePos); }
+      state.layout = __CURRENT_LAYOUT;
+      state.defaultLayout = __DEFAULT_LAYOUT;
+      state.innerWidth = __DEFAULT_INNER_WIDTH;
+      state.innerHeight = __DEFAULT_INNER_HEIGHT;
+      state.chapterSeen = __CHAPTER_SEEN;
+      state.progress = __PROGRESS.snapshot();
+      if (!last){
+        try{
+          doc.insertLabel(__CHUNK_LABEL, __jsonEncode(state));
+          doc.save(File(state.work));
+        }catch(eSave){
+          log("[ERR] chunk " + __CHUNK.index + " save failed: " + eSave);
+          return false;
+        }
+      }
+      if (!__writeChunkState(state)){ log("[ERR] chunk state not written: " + __CHUNK.state); return false; }
+      log("[CHUNK] chunk " + __CHUNK.index + "/" + state.chunks.length + " done page=" + state.page + " frame=" + state.frame);
+      return true;
+    }
+
     function __openAndPrepareTemplate(){
       var templateFile = File("%TEMPLATE_PATH%");
       try{
@@ -1124,8 +1475,13 @@ function _holderInnerBounds(holder){
   return doc;
 }
 
-    var doc = __openAndPrepareTemplate();
+    var __CHUNK_RUN = __CHUNK ? __beginChunk() : null;
+    if (__CHUNK && !__CHUNK_RUN) { __restoreEnvironment(__ENV_STATE); return; }
+    var doc = (__CHUNK_RUN && __CHUNK_RUN.doc) ? __CHUNK_RUN.doc : __openAndPrepareTemplate();
     if (!doc || !doc.isValid) { __restoreEnvironment(__ENV_STATE); return; }
+    if (__CHUNK_RUN && !__CHUNK_RUN.doc){
+      try{ doc.insertLabel(__CHUNK_RUN_LABEL, __CHUNK.state); }catch(_){}
+    }
 
 
 
@@ -1174,35 +1530,56 @@ function _holderInnerBounds(holder){
         }
         return ps;
     }
+    var __OPS = %OPS_JSON%;
+
+    // known only once the whole document has been written, so they follow the op stream
+    __PROGRESS.setTotal(%PROGRESS_TOTAL%);
+    if (__CHUNK_RUN) __PROGRESS.setTotal(__CHUNK_RUN.state.progressTotal || 0);
     __STYLE_LINES__
 
     function __composeDocument(doc){
       if (!doc || !doc.isValid) { try{ log("[ERR] compose: doc invalid"); }catch(_){ } return; }
       try{
-        page  = doc.pages[0];
-        try{ log("[LOG] script boot ok; page="+doc.pages.length); }catch(_){}
+        if (__CHUNK_RUN && __CHUNK_RUN.state.done > 0){
+          __restoreChunkPosition(doc, __CHUNK_RUN.state);
+        } else {
+          page  = doc.pages[0];
+          try{ log("[LOG] script boot ok; page="+doc.pages.length); }catch(_){}
 
-        tf    = createTextFrameOnPage(page, __DEFAULT_LAYOUT);
-        if (__DEFAULT_INNER_WIDTH === null) __DEFAULT_INNER_WIDTH = _innerFrameWidth(tf);
-        if (__DEFAULT_INNER_HEIGHT === null) __DEFAULT_INNER_HEIGHT = _innerFrameHeight(tf);
-        try{ log("[LAYOUT] default inner width=" + __DEFAULT_INNER_WIDTH + " height=" + __DEFAULT_INNER_HEIGHT); }catch(_defaultLog){}
-        story = tf.parentStory;
-        curTextFrame = tf; 
+          tf    = createTextFrameOnPage(page, __DEFAULT_LAYOUT);
+          if (__DEFAULT_INNER_WIDTH === null) __DEFAULT_INNER_WIDTH = _innerFrameWidth(tf);
+          if (__DEFAULT_INNER_HEIGHT === null) __DEFAULT_INNER_HEIGHT = _innerFrameHeight(tf);
+          try{ log("[LAYOUT] default inner width=" + __DEFAULT_INNER_WIDTH + " height=" + __DEFAULT_INNER_HEIGHT); }catch(_defaultLog){}
+          story = tf.parentStory;
+          curTextFrame = tf; 
 
-        var firstChapterSeen = false;
-        __resetParaSeq();
+          __resetParaSeq();
+        }
 
-        __ADD_LINES__
+        __runOps(__OPS);
+        if (__CHUNK_RUN && !__chunkIsLast()){
+          __checkpointChunk(doc, false);
+          __restoreEnvironment(__ENV_STATE);
+          return;
+        }
         var tail = flushOverflow(story, page, tf, 1);
-        if (!tail || !tail.frame || !tail.page) { try{ log("[ERR] compose: tail invalid"); }catch(_){ } __finalizeDocument(doc, story, page, tf); return; }
+        if (!tail || !tail.frame || !tail.page) {
+          try{ log("[ERR] compose: tail invalid"); }catch(_){ }
+          __finalizeDocument(doc, story, page, tf);
+          if (__CHUNK_RUN) __checkpointChunk(doc, true);
+          return;
+        }
         page  = tail.page;
         tf    = tail.frame;
         story = tf.parentStory;
         curTextFrame = tf;
       }catch(__composeErr){
         try{ log("[ERR] compose failed: " + __composeErr); }catch(_){}
+        // not recorded as done: run_jsx_chunks retries this chunk or a later --resume starts from it
+        if (__CHUNK_RUN) { __restoreEnvironment(__ENV_STATE); return; }
       }
       __finalizeDocument(doc, story, page, tf);
+      if (__CHUNK_RUN) __checkpointChunk(doc, true);
     }
 
     __composeDocument(doc);
@@ -632,6 +632,17 @@ function __imgFindRectBySrcGlobal(spec, storyMaybe){
   }catch(_doc){}
   return null;
 }
+// pixel aspect ratio probed from the image header (pxw/pxh); 0 when unknown or EXIF-rotated
+function __imgPixelRatio(spec){
+  try{
+    var pw = parseFloat(spec && spec.pxw), ph = parseFloat(spec && spec.pxh);
+    var orient = parseInt(spec && spec.orientation, 10);
+    if (!(pw > 0) || !(ph > 0)) return 0;
+    if (orient >= 5 && orient <= 8) return 0;
+    return pw / ph;
+  }catch(_){ }
+  return 0;
+}
 // clamp target size based on desired w/h and available width; writes geometricBounds
 function __imgClampSize(rect, spec, ratio, innerW){
   if (!rect || !rect.isValid) return {targetW:0, targetH:0, innerW:innerW, wPt:0, hPt:0, ratio:ratio, fillProportional:false};
@@ -639,7 +650,7 @@ function __imgClampSize(rect, spec, ratio, innerW){
   var hPt = __imgToPtLocal(spec && spec.h);
   var gb  = rect.geometricBounds;
   var curW = Math.max(1e-6, gb[3]-gb[1]), curH = Math.max(1e-6, gb[2]-gb[0]);
-  var imgRatio = ratio || (curW/curH) || 1.0;
+  var imgRatio = __imgPixelRatio(spec) || ratio || (curW/curH) || 1.0;
   // ??? innerW ????????????/??????????????????? w ?????
   if (!innerW || innerW <= 0){
     var fallbackW = 0;
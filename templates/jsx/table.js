@@ -1,4 +1,5 @@
 ﻿function __tblAddTableHiFi(obj){
+      if (__tblContinueSegment(obj)) return;
       try{
         var rows = obj.rows|0, cols = obj.cols|0;
         if (rows<=0 || cols<=0) return;
@@ -870,6 +871,7 @@
           return;
         }
         __phase("table-added");
+        try{ if (obj.segment && obj.segment.id) __TBL_SEGMENTS[obj.segment.id] = tbl; }catch(__segReg){}
         try{
           var __colLenInit = 0;
           try{ __colLenInit = tbl.columns.length; }catch(__colErr){}
@@ -1408,6 +1410,129 @@
       }catch(_){}
     }
     
+    // tables split by the exporter: segment id -> InDesign table created by segment 0
+    var __TBL_SEGMENTS = {};
+    // append the body rows of a continuation segment to its table; false -> caller builds it standalone
+    function __tblContinueSegment(obj){
+      var seg = (obj && obj.segment) ? obj.segment : null;
+      if (!seg || !(parseInt(seg.index, 10) > 0)) return false;
+      var tag = "[TABLE][seg " + seg.id + " " + seg.index + "/" + seg.count + "]";
+      var tbl = __TBL_SEGMENTS[seg.id];
+      if (!tbl || !tbl.isValid){
+        try{ log("[WARN]" + tag + " base table missing; placing segment as its own table"); }catch(_){}
+        return false;
+      }
+      try{
+        var cols = tbl.columns.length;
+        var hr = parseInt(obj.headerRows || 0, 10);
+        if (!isFinite(hr) || hr < 0) hr = 0;
+        var data = obj.data || [];
+        var body = data.slice(Math.min(hr, data.length));
+        var n = body.length;
+        if (n > 0){
+          var start = tbl.rows.length;
+          tbl.bodyRowCount = tbl.bodyRowCount + n;
+          var MAX_ROWSPAN_INLINE = 25;
+          var skip = [], merges = [];
+          for (var r=0; r<n; r++){ skip[r] = []; }
+          for (var r=0; r<n; r++){
+            var row = tbl.rows[start + r];
+            try{ row.autoGrow = true; row.heightType = RowHeightType.AT_LEAST; row.minimumHeight = 0; row.keepWithNext = false; }catch(_rowFmt){}
+            var entries = body[r] || [];
+            var cPtr = 0;
+            for (var e=0; e<entries.length; e++){
+              var spec = entries[e];
+              if (spec == null) spec = {text:""};
+              if (typeof spec === "string") spec = {text: spec};
+              var rs = spec.rowspan==null ? 1 : parseInt(spec.rowspan,10);
+              var cs = spec.colspan==null ? 1 : parseInt(spec.colspan,10);
+              if (!isFinite(rs)) rs = 1;
+              if (!isFinite(cs)) cs = 1;
+              if (rs === 0 || cs === 0){ cPtr += (cs <= 0) ? 1 : cs; continue; }
+              while (cPtr < cols && skip[r][cPtr]) cPtr++;
+              if (cPtr >= cols) break;
+              var spanRows = Math.min(Math.max(1, rs), n - r);
+              var spanCols = Math.min(Math.max(1, cs), cols - cPtr);
+              var cell = row.cells[cPtr];
+              try{ cell.texts[0].contents = smartWrapStr(String(spec.text||"").replace(/\r?\n/g, "\r")); }catch(_txt){}
+              try{ cell.texts[0].paragraphs.everyItem().justification = __mapAlign(spec.align || "left"); }catch(_al){}
+              try{ cell.verticalJustification = __mapVAlign(spec.valign || "top"); }catch(_va){}
+              __tblCellFill(cell, spec.shading);
+              for (var rr=r; rr<r+spanRows; rr++){
+                for (var cc=cPtr; cc<cPtr+spanCols; cc++){
+                  if (rr !== r || cc !== cPtr) skip[rr][cc] = true;
+                }
+              }
+              if (spanRows > MAX_ROWSPAN_INLINE){
+                try{ log("[WARN]" + tag + " degrade rowspan rows=" + spanRows + " at r=" + (start + r) + " c=" + cPtr); }catch(_dg){}
+                if (spanCols > 1) merges.push({r:r, c:cPtr, rs:1, cs:spanCols});
+              } else if (spanRows > 1 || spanCols > 1){
+                merges.push({r:r, c:cPtr, rs:spanRows, cs:spanCols});
+              }
+              cPtr += spanCols;
+            }
+          }
+          merges.sort(function(a,b){ return (a.c !== b.c) ? (b.c - a.c) : (a.r - b.r); });
+          for (var i=0; i<merges.length; i++){
+            var m = merges[i];
+            try{
+              tbl.cells.itemByRange(tbl.rows[start + m.r].cells[m.c], tbl.rows[start + m.r + m.rs - 1].cells[m.c + m.cs - 1]).merge();
+            }catch(_mg){}
+          }
+          try{
+            var __segStyle = __cfgTableStyleName();
+            var ps = __segStyle ? app.activeDocument.paragraphStyles.itemByName(__segStyle) : null;
+            if (ps && ps.isValid){
+              for (var sr=start; sr<start+n; sr++){
+                try{ tbl.rows[sr].cells.everyItem().texts[0].paragraphs.everyItem().appliedParagraphStyle = ps; }catch(_ps){}
+              }
+            }
+          }catch(_style){}
+        }
+        try{
+          var segStory = tbl.storyOffset.parentStory;
+          segStory.recompose();
+          if (typeof flushOverflow === "function" && story && story.isValid && segStory.id === story.id && tf && tf.isValid){
+            var st = flushOverflow(story, page, tf);
+            if (st && st.frame && st.page){ page = st.page; tf = st.frame; story = tf.parentStory; curTextFrame = tf; }
+          }
+        }catch(_flow){}
+        try{ log(tag + " appended rows=" + n + " totalRows=" + tbl.rows.length); }catch(_){}
+      }catch(eSeg){
+        try{ log("[ERROR]" + tag + " append failed: " + eSeg); }catch(_){}
+      }
+      try{ __progressBump("TABLE", "seg=" + seg.id + ":" + seg.index); }catch(_){}
+      return true;
+    }
+    function __tblCellFill(cell, shading){
+      if (!shading || !/^#([0-9a-fA-F]{6})$/.test(shading)) return;
+      try{
+        var cname = "CellFill_" + shading.substr(1);
+        var col = null;
+        try{ col = app.activeDocument.colors.itemByName(cname); }catch(_){}
+        if (!col || !col.isValid){
+          col = app.activeDocument.colors.add({
+            name:cname, model:ColorModel.PROCESS, space:ColorSpace.RGB,
+            colorValue:[parseInt(shading.substr(1,2),16), parseInt(shading.substr(3,2),16), parseInt(shading.substr(5,2),16)]
+          });
+        }
+        cell.fillTint = 100;
+        cell.fillColor = col;
+      }catch(_){}
+    }
+    function __cfgTableStyleName(){
+      try{
+        var cfg = (typeof CONFIG !== "undefined" && CONFIG.styles) ? CONFIG.styles : {};
+        var names = [cfg.tableBody || %TABLE_BODY_STYLE%, cfg.tableBodyFallback || %TABLE_BODY_STYLE_FALLBACK%,
+                     cfg.tableBodyAuto || %TABLE_BODY_STYLE_AUTO%];
+        for (var i=0; i<names.length; i++){
+          var st = names[i] ? app.activeDocument.paragraphStyles.itemByName(names[i]) : null;
+          if (st && st.isValid) return names[i];
+        }
+      }catch(_){}
+      return null;
+    }
+
     function fixAllTables(){
         try{
             var doc = app.activeDocument;
@@ -1,5 +1,7 @@
 ﻿var CONFIG = %JSX_CONFIG%;
 if (!CONFIG) CONFIG = {};
+// note table: [kind, id, text], filled by "note" ops; paragraphs reference entries as [[NOTE:n]]
+var __NOTES = [];
 var __DEBUG_WRITE = false;
 
 // JSON helpers (ExtendScript 可能没有内置 JSON 对象)
@@ -26,6 +28,36 @@ function __jsonParseSafe(str){
   }
   try{ return eval("(" + str + ")"); }catch(__){ return null; }
 }
+// strict JSON for plain data read back outside the script (e.g. the chunk state file)
+function __jsonEncode(v){
+  if (v === null || v === undefined) return "null";
+  var t = typeof v;
+  if (t === "number") return isFinite(v) ? String(v) : "null";
+  if (t === "boolean") return v ? "true" : "false";
+  if (t === "string"){
+    return '"' + v.replace(/[\\"\u0000-\u001f\u2028\u2029]/g, function(c){
+      if (c === '"') return '\\"';
+      if (c === "\\") return "\\\\";
+      if (c === "\n") return "\\n";
+      if (c === "\r") return "\\r";
+      if (c === "\t") return "\\t";
+      return "\\u" + ("0000" + c.charCodeAt(0).toString(16)).slice(-4);
+    }) + '"';
+  }
+  var parts = [];
+  if (v instanceof Array){
+    for (var i = 0; i < v.length; i++) parts.push(__jsonEncode(v[i]));
+    return "[" + parts.join(",") + "]";
+  }
+  if (t === "object"){
+    for (var k in v){
+      if (!v.hasOwnProperty(k) || typeof v[k] === "function") continue;
+      parts.push(__jsonEncode(String(k)) + ":" + __jsonEncode(v[k]));
+    }
+    return "{" + parts.join(",") + "}";
+  }
+  return "null";
+}
 
 // ----- superscript/subscript style helpers -----
 var __SUPSUB_CACHE = {doc: null, sup: null, sub: null, sup2: null, sub2: null};
@@ -276,6 +308,18 @@ function __processNoteMatch(m, ctx){
     ctx.pendingNoteId = null;
     return;
   }
+  if (m[8]) {
+    var note = __NOTES[parseInt(m[8], 10)];
+    if (!note) { log("[NOTE][WARN] missing note table entry " + m[8]); return; }
+    var noteId = note[1] ? parseInt(note[1], 10) : null;
+    try {
+      log("[NOTE] create " + note[0] + " id=" + noteId + " len=" + (note[2]||"").length);
+      if (note[0] === "FN") createFootnoteAt(story.insertionPoints[-1], note[2], noteId);
+      else createEndnoteAt(story.insertionPoints[-1], note[2], noteId);
+    } catch(e){ log("[NOTE][ERR] " + e); }
+    ctx.pendingNoteId = null;
+    return;
+  }
   if (m[4]) {
     // format toggles [[/I]] etc
     var closing = m[4] === "/";
@@ -2,13 +2,23 @@
 import os, sys, subprocess, re
 import argparse
 import xml.etree.ElementTree as ET
+try:
+    from lxml import etree as LXML_ETREE
+except ImportError:  # optional: the stdlib parser is used instead
+    LXML_ETREE = None
 from docx_to_xml_outline_notes_v13 import DOCXOutlineExporter
 import json
 import time
 import threading
+from itertools import chain, islice
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from pipeline_logger import PipelineLogger
+from paragraph_ir import (
+    STYLE_B, STYLE_I, STYLE_SUB, STYLE_SUP, STYLE_U,
+    FrameClose, FrameOpen, ImageRef, NoteRef, Paragraph, TableRef, TextRun,
+    append_text, strip_tokens, tokens_to_marker_text,
+)
 
 def _runtime_base_dir() -> str:
     """
@@ -57,6 +67,17 @@ AUTO_RUN_WINDOWS = True
 AUTO_RUN_MACOS = True
 AUTO_EXPORT_IDML = True 
 LOG_WRITE = False
+# write the op stream (note bodies included) to <jsx>.payload.jsonl instead of embedding it in the JSX
+JSX_PAYLOAD_SIDECAR = False
+# write buffer for the JSX / payload file; ops are streamed into it as they are generated
+JSX_WRITE_BUFFER = 1 << 20
+# split the run into chunk scripts of about this many ops (0 = one script); see run_jsx_chunks
+JSX_CHUNK_OPS = 0
+# extra attempts per chunk before run_jsx_chunks gives up (a later --resume continues from there)
+JSX_CHUNK_RETRIES = 1
+# parser behind iter_paragraphs_with_levels: "etree" (stdlib) or "lxml" (used only if installed).
+# etree stays the default: lxml measured slower on inline-heavy XML (benchmarks/xml_reader_bench.py)
+XML_READER_BACKEND = "etree"
 
 TABLE_BODY_PAR_STYLE = "TableBody"
 TABLE_BODY_PAR_STYLE_FALLBACK = "DocxTable"
@@ -223,6 +244,10 @@ def _debug_log(message: str):
     if PIPELINE_LOGGER:
         PIPELINE_LOGGER.debug(message)
 
+def _debug_enabled() -> bool:
+    # lets hot loops skip building debug messages nobody will see
+    return bool(PIPELINE_LOGGER and PIPELINE_LOGGER.enable_debug)
+
 def _log_snippet(text: str, limit: int = 120) -> str:
     if not text:
         return ""
@@ -260,217 +285,288 @@ def _strip_ns(tag):
     return tag.split('}', 1)[-1].lower()
 
 
+_LOCAL_NAMES: Dict[str, str] = {}
+
+
+def _local_name(tag):
+    """_strip_ns() memoized per raw tag; documents only use a handful of distinct tags."""
+    name = _LOCAL_NAMES.get(tag)
+    if name is None:
+        name = _LOCAL_NAMES[tag] = _strip_ns(tag)
+    return name
+
+
+def _reader_lxml() -> bool:
+    return XML_READER_BACKEND == "lxml" and LXML_ETREE is not None
+
+
+def _iterparse(xml_path):
+    """(event, element) pairs for start/end events from the XML_READER_BACKEND parser."""
+    if _reader_lxml():
+        # huge_tree lifts libxml2's per-node size limits for very large exports
+        return LXML_ETREE.iterparse(xml_path, events=("start", "end"), remove_comments=True,
+                                    remove_pis=True, huge_tree=True)
+    return ET.iterparse(xml_path, events=("start", "end"))
+
+
 _hn_re = re.compile(r'^h(\d+)$', re.I)
 _leveln_re = re.compile(r'^level(\d+)$', re.I)
 
 
 def _collect_all_text(elem):
     parts = []
-    if elem.text: parts.append(elem.text)
-    for c in elem:
-        parts.append(_collect_all_text(c))
-        if c.tail: parts.append(c.tail)
+    stack = [elem]
+    while stack:
+        node = stack.pop()
+        if type(node) is str:
+            parts.append(node)
+            continue
+        if node.text: parts.append(node.text)
+        for c in reversed(node):
+            if c.tail: stack.append(c.tail)
+            stack.append(c)
     return "".join(parts)
 
 
-def _index_notes(root):
-    foot_map, end_map = {}, {}
-    stack = [root]
-    while stack:
-        n = stack.pop()
-        tag = _strip_ns(n.tag)
-        if tag == "footnotes":
-            for ch in list(n):
-                if _strip_ns(ch.tag) == "footnote":
-                    fid = ch.attrib.get("id") or ch.attrib.get("rid") or ch.attrib.get("ref")
-                    if fid:
-                        note_text = _collect_all_text(ch).strip().replace("]]", "】】")
-                        foot_map[str(fid)] = note_text
-                        _debug_log(f"[NOTE-FOOT] id={fid} len={len(note_text)} snippet={_log_snippet(note_text)}")
-            continue
-        if tag == "endnotes":
-            for ch in list(n):
-                if _strip_ns(ch.tag) == "endnote":
-                    eid = ch.attrib.get("id") or ch.attrib.get("rid") or ch.attrib.get("ref")
-                    if eid:
-                        note_text = _collect_all_text(ch).strip().replace("]]", "】】")
-                        end_map[str(eid)] = note_text
-                        _debug_log(f"[NOTE-END] id={eid} len={len(note_text)} snippet={_log_snippet(note_text)}")
-            continue
-        stack.extend(list(n))
+_NOTE_CONTAINERS = {"footnotes": ("footnote", "NOTE-FOOT"), "endnotes": ("endnote", "NOTE-END")}
+
+
+class _NoteIndexTarget:
+    """XMLParser target for the notes prepass: keeps the text of <footnotes>/<endnotes> children only."""
+
+    def __init__(self):
+        self.maps = {"footnotes": {}, "endnotes": {}}
+        self.depth = 0
+        self.container = None
+        self.container_depth = 0
+        self.note_id = None
+        self.parts = None  # text of the note being read, None outside one
+        self.debug = _debug_enabled()
+
+    def start(self, tag, attrib):
+        name = _local_name(tag)
+        if self.container is None:
+            if name in self.maps:
+                self.container = name
+                self.container_depth = self.depth
+        elif self.depth == self.container_depth + 1 and name == _NOTE_CONTAINERS[self.container][0]:
+            nid = attrib.get("id") or attrib.get("rid") or attrib.get("ref")
+            if nid:
+                self.note_id = nid
+                self.parts = []
+        self.depth += 1
+
+    def end(self, tag):
+        self.depth -= 1
+        if self.container is None:
+            return
+        if self.depth == self.container_depth:
+            self.container = None
+        elif self.depth == self.container_depth + 1 and self.parts is not None:
+            nid = self.note_id
+            note_text = "".join(self.parts).strip()
+            self.maps[self.container][str(nid)] = note_text
+            if self.debug:
+                log_tag = _NOTE_CONTAINERS[self.container][1]
+                _debug_log(f"[{log_tag}] id={nid} len={len(note_text)} snippet={_log_snippet(note_text)}")
+            self.note_id = self.parts = None
+
+    def data(self, text):
+        if self.parts is not None:
+            self.parts.append(text)
+
+    def close(self):
+        return self.maps["footnotes"], self.maps["endnotes"]
+
+
+def _index_notes(xml_path):
+    """Prepass over the XML: index <footnotes>/<endnotes> bodies by id without building elements."""
+    target = _NoteIndexTarget()
+    if _reader_lxml():
+        parser = LXML_ETREE.XMLParser(target=target, huge_tree=True)
+    else:
+        parser = ET.XMLParser(target=target)
+    with open(xml_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            parser.feed(chunk)
+    foot_map, end_map = parser.close()
     _debug_log(f"[NOTES] indexed footnotes={len(foot_map)} endnotes={len(end_map)}")
     return foot_map, end_map
 
 
-def _collect_inline_with_notes(elem, foot_map, end_map):
-    parts = []
-    if elem.text:
-        parts.append(elem.text)
-    for c in elem:
-        tag = _strip_ns(c.tag)
+# how _collect_inline_with_notes treats each child element
+_INLINE_SKIP, _INLINE_STYLE, _INLINE_NOTE, _INLINE_NOTE_REF, _INLINE_IMG, _INLINE_DESCEND = range(6)
+_INLINE_HANDLERS = {
+    "meta": (_INLINE_SKIP, 0), "prop": (_INLINE_SKIP, 0),
+    "footnotes": (_INLINE_SKIP, 0), "endnotes": (_INLINE_SKIP, 0),
+    "i": (_INLINE_STYLE, STYLE_I), "em": (_INLINE_STYLE, STYLE_I),
+    "b": (_INLINE_STYLE, STYLE_B), "strong": (_INLINE_STYLE, STYLE_B),
+    "u": (_INLINE_STYLE, STYLE_U),
+    "sup": (_INLINE_STYLE, STYLE_SUP),
+    "sub": (_INLINE_STYLE, STYLE_SUB),
+    "footnote": (_INLINE_NOTE, "FN"), "fn": (_INLINE_NOTE, "FN"),
+    "endnote": (_INLINE_NOTE, "EN"), "en": (_INLINE_NOTE, "EN"),
+    "fnref": (_INLINE_NOTE_REF, "FN"), "enref": (_INLINE_NOTE_REF, "EN"),
+    "img": (_INLINE_IMG, 0), "image": (_INLINE_IMG, 0), "graphic": (_INLINE_IMG, 0),
+    "figureimage": (_INLINE_IMG, 0), "inlinegraphic": (_INLINE_IMG, 0),
+}
+_INLINE_DEFAULT = (_INLINE_DESCEND, 0)
+# raw tag (namespace and case included) -> handler; comments/PIs from lxml trees are skipped
+_INLINE_TAG_HANDLERS: Dict[object, tuple] = {}
 
-        if tag in ("meta", "prop", "footnotes", "endnotes"):
-            if c.tail: parts.append(c.tail)
-            continue
 
-        # inline styles
-        if tag in ("i", "em"):
-            parts.append("[[I]]")
-            parts.append(_collect_inline_with_notes(c, foot_map, end_map))
-            parts.append("[[/I]]")
-            if c.tail: parts.append(c.tail)
-            continue
-        if tag in ("b", "strong"):
-            parts.append("[[B]]")
-            parts.append(_collect_inline_with_notes(c, foot_map, end_map))
-            parts.append("[[/B]]")
-            if c.tail: parts.append(c.tail)
-            continue
-        if tag == "u":
-            parts.append("[[U]]")
-            parts.append(_collect_inline_with_notes(c, foot_map, end_map))
-            parts.append("[[/U]]")
-            if c.tail: parts.append(c.tail)
-            continue
-        if tag == "sup":
-            parts.append("[[SUP]]")
-            parts.append(_collect_inline_with_notes(c, foot_map, end_map))
-            parts.append("[[/SUP]]")
-            if c.tail: parts.append(c.tail)
-            continue
-        if tag == "sub":
-            parts.append("[[SUB]]")
-            parts.append(_collect_inline_with_notes(c, foot_map, end_map))
-            parts.append("[[/SUB]]")
-            if c.tail: parts.append(c.tail)
-            continue
+def _inline_handler(tag):
+    handler = _INLINE_TAG_HANDLERS.get(tag)
+    if handler is None:
+        if isinstance(tag, str):
+            handler = _INLINE_HANDLERS.get(_strip_ns(tag), _INLINE_DEFAULT)
+        else:
+            handler = (_INLINE_SKIP, 0)
+        _INLINE_TAG_HANDLERS[tag] = handler
+    return handler
 
-        # inline notes
-        if tag in ("footnote", "fn"):
-            note = _collect_all_text(c).strip().replace("]]", "】】")
-            parts.append(f"[[FN:{note}]]")
-            if c.tail: parts.append(c.tail)
-            continue
-        if tag in ("endnote", "en"):
-            note = _collect_all_text(c).strip().replace("]]", "】】")
-            parts.append(f"[[EN:{note}]]")
-            if c.tail: parts.append(c.tail)
-            continue
 
-        # referenced notes
-        if tag == "fnref":
-            rid = c.attrib.get("id") or c.attrib.get("rid") or c.attrib.get("ref")
-            parts.append(f"[[FNI:{str(rid)}]]")
-            note = foot_map.get(str(rid), "")
-            parts.append(f"[[FN:{note}]]" if note else "[*]")
-            _debug_log(
-                f"[FNREF] id={rid} has_note={bool(note)} noteSnippet={_log_snippet(note)} tailSnippet={_log_snippet(c.tail)}"
-            )
-            if c.tail: parts.append(c.tail)
-            continue
-        if tag == "enref":
-            rid = c.attrib.get("id") or c.attrib.get("rid") or c.attrib.get("ref")
-            parts.append(f"[[FNI:{str(rid)}]]")
-            note = end_map.get(str(rid), "")
-            parts.append(f"[[EN:{note}]]" if note else "[*]")
-            _debug_log(
-                f"[ENREF] id={rid} has_note={bool(note)} noteSnippet={_log_snippet(note)} tailSnippet={_log_snippet(c.tail)}"
-            )
-            if c.tail: parts.append(c.tail)
-            continue
+def _collect_inline_with_notes(elem, foot_map, end_map, tokens=None, style=0):
+    """Append the paragraph IR tokens for elem's content (not its tail) and return them.
 
-        if tag in ("img", "image", "graphic", "figureimage", "inlinegraphic"):
-            src = c.attrib.get("src") or c.attrib.get("href") or c.attrib.get("xlink:href") or ""
-            w = c.attrib.get("w") or c.attrib.get("width") or ""
-            h = c.attrib.get("h") or c.attrib.get("height") or ""
-            align = c.attrib.get("align") or c.attrib.get("placement") or ""
-            if src:
-                parts.append(f'[[IMG src="{src}" w="{w}" h="{h}" align="{align}"]]')
+    Walks the subtree with an explicit stack, so nesting depth is not bound by the
+    recursion limit; each entry is (children left, inline style, element whose tail
+    follows once they are done).
+    """
+    if tokens is None:
+        tokens = []
+    if elem.text:
+        append_text(tokens, elem.text, style)
+    if not len(elem):
+        return tokens
+    debug = _debug_enabled()
+    handlers = _INLINE_TAG_HANDLERS
+    stack = [(iter(elem), style, None)]
+    while stack:
+        top = stack[-1]
+        children, style = top[0], top[1]
+        for c in children:
+            kind, arg = handlers.get(c.tag) or _inline_handler(c.tag)
+            if kind == _INLINE_STYLE or kind == _INLINE_DESCEND:
+                child_style = style | arg
+                if c.text:
+                    append_text(tokens, c.text, child_style)
+                stack.append((iter(c), child_style, c))
+                break
+            if kind == _INLINE_NOTE_REF:
+                rid = c.attrib.get("id") or c.attrib.get("rid") or c.attrib.get("ref")
+                note = (foot_map if arg == "FN" else end_map).get(str(rid), "")
+                tokens.append(NoteRef(arg, str(rid), note, style))
+                if debug:
+                    _debug_log(
+                        f"[{arg}REF] id={rid} has_note={bool(note)} noteSnippet={_log_snippet(note)} tailSnippet={_log_snippet(c.tail)}"
+                    )
+            elif kind == _INLINE_NOTE:
+                note = _collect_all_text(c).strip()
+                tokens.append(NoteRef(arg, None, note, style))
+            elif kind == _INLINE_IMG:
+                src = c.attrib.get("src") or c.attrib.get("href") or c.attrib.get("xlink:href") or ""
+                if src:
+                    w = c.attrib.get("w") or c.attrib.get("width") or ""
+                    h = c.attrib.get("h") or c.attrib.get("height") or ""
+                    align = c.attrib.get("align") or c.attrib.get("placement") or ""
+                    attr_text = f'src="{src}" w="{w}" h="{h}" align="{align}"'
+                    tokens.append(ImageRef(attr_text, f"[[IMG {attr_text}]]"))
             if c.tail:
-                parts.append(c.tail)
-            continue
-
-        parts.append(_collect_inline_with_notes(c, foot_map, end_map))
-        if c.tail:
-            parts.append(c.tail)
-    return "".join(parts)
-
-
-def extract_paragraphs_with_levels(xml_path):
-    _debug_log(f"[XML] parsing paragraphs from {xml_path}")
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-    foot_map, end_map = _index_notes(root)
+                append_text(tokens, c.tail, style)
+        else:
+            stack.pop()
+            owner = top[2]
+            if owner is not None and owner.tail:
+                append_text(tokens, owner.tail, stack[-1][1])
+    return tokens
 
-    out = []
 
-    def walk(elem, current_level):
-        tag = _strip_ns(elem.tag)
+_SKIPPED_TAGS = ("meta", "prop", "footnotes", "endnotes")
+_CONTAINER_LEVELS = {"chapter": 1, "section": 2, "subsection": 3}
 
-        if tag in ("meta", "prop", "footnotes", "endnotes"):
-            if elem.tail and elem.tail.strip():
-                out.append(("Body", elem.tail.strip()))
-            return
 
-        m = _hn_re.match(tag)
-        if m:
-            lvl = int(m.group(1))
-            txt = _collect_inline_with_notes(elem, foot_map, end_map).strip()
-            if txt:
-                out.append((f"Level{lvl}", txt))
-            if elem.tail and elem.tail.strip():
-                out.append(("Body", elem.tail.strip()))
-            return
+def iter_paragraphs_with_levels(xml_path):
+    """Yield the document's paragraphs as paragraph_ir.Paragraph objects in reading order.
 
-        if tag == "p":
-            txt = _collect_inline_with_notes(elem, foot_map, end_map).strip()
-            if txt:
-                out.append(("Body", txt))
-            if elem.tail and elem.tail.strip():
-                out.append(("Body", elem.tail.strip()))
-            return
-
-        if tag == "title":
-            lvl = current_level if current_level >= 1 else 1
-            txt = _collect_inline_with_notes(elem, foot_map, end_map).strip()
-            if txt:
-                out.append((f"Level{lvl}", txt))
-            if elem.tail and elem.tail.strip():
-                out.append(("Body", elem.tail.strip()))
-            return
+    Notes are indexed in a prepass; the document is then streamed with iterparse, each
+    paragraph is yielded as its element closes and finished elements are released, so
+    memory stays flat however large the XML is.
+    """
+    _debug_log(f"[XML] parsing paragraphs from {xml_path}")
+    foot_map, end_map = _index_notes(xml_path)
+
+    # open container elements: [elem, level, text not read yet]
+    frames = []
+    # closed element whose tail is read (and which is released) on the next event
+    pending = None
+    # depth inside a paragraph-level or skipped element
+    inside = 0
+    count = 0
+    for event, elem in _iterparse(xml_path):
+        if inside:
+            if event == "start":
+                inside += 1
+                continue
+            inside -= 1
+            if inside:
+                continue
+            tag = _local_name(elem.tag)
+            if tag not in _SKIPPED_TAGS:
+                m = _hn_re.match(tag)
+                if m:
+                    style = f"Level{int(m.group(1))}"
+                elif tag == "title":
+                    level = frames[-1][1] if frames else 0
+                    style = f"Level{level if level >= 1 else 1}"
+                else:
+                    style = "Body"
+                tokens = strip_tokens(_collect_inline_with_notes(elem, foot_map, end_map))
+                if tokens:
+                    count += 1
+                    yield Paragraph(style, tokens, attrs=dict(elem.attrib) or None)
+            pending = elem
+            continue
 
-        new_level = current_level
-        if tag == "chapter":
-            new_level = 1
-        elif tag == "section":
-            new_level = 2
-        elif tag == "subsection":
-            new_level = 3
-        else:
+        # text and tails are complete once the parser reports the next tag
+        if frames and frames[-1][2]:
+            frames[-1][2] = False
+            container = frames[-1][0]
+            if container.text and container.text.strip() and _local_name(container.tag) not in ("document", "root"):
+                count += 1
+                yield Paragraph.from_marker_text("Body", container.text.strip())
+        if pending is not None:
+            if pending.tail and pending.tail.strip():
+                count += 1
+                yield Paragraph.from_marker_text("Body", pending.tail.strip())
+            if frames:
+                frames[-1][0].remove(pending)
+            pending.clear()
+            pending = None
+
+        if event == "end":
+            frames.pop()
+            pending = elem
+            continue
+        tag = _local_name(elem.tag)
+        if tag in _SKIPPED_TAGS or tag in ("p", "title") or _hn_re.match(tag):
+            inside = 1
+            continue
+        level = _CONTAINER_LEVELS.get(tag)
+        if level is None:
             m2 = _leveln_re.match(tag)
-            if m2:
-                new_level = int(m2.group(1))
-
-        if elem.text and elem.text.strip() and tag not in ("document", "root"):
-            out.append(("Body", elem.text.strip()))
-
-        for c in elem:
-            walk(c, new_level)
+            level = int(m2.group(1)) if m2 else (frames[-1][1] if frames else 0)
+        frames.append([elem, level, True])
 
-        if elem.tail and elem.tail.strip():
-            out.append(("Body", elem.tail.strip()))
+    if pending is not None and pending.tail and pending.tail.strip():
+        count += 1
+        yield Paragraph.from_marker_text("Body", pending.tail.strip())
+    _debug_log(f"[XML] extracted paragraphs={count} from {xml_path}")
 
-    walk(root, 0)
-    _debug_log(f"[XML] extracted paragraphs={len(out)} from {xml_path}")
-    return out
 
-
-def escape_js(s: str) -> str:
-    s = s.replace("\\", "\\\\").replace('"', '\\"')
-    s = s.replace("\\r\\n", " ").replace("\\r", " ").replace("\\n", " ")
-    s = s.replace("\r\n", " ").replace("\r", " ").replace("\n", " ")
-    s = re.sub(r"\s+", " ", s)
-    return s
+def extract_paragraphs_with_levels(xml_path):
+    """List form of iter_paragraphs_with_levels(), for callers that need random access."""
+    return list(iter_paragraphs_with_levels(xml_path))
 
 
 # External JSX template is required; inline template removed.
@@ -492,26 +588,20 @@ def build_toc_entries(levels_used):
 
 
 
-def _load_jsx_template():
-    """Load external JSX template; inline template has been removed."""
+_FRAGMENT_SLOT_RE = re.compile(r"\{\{([A-Z]+)\}\}")
+
+
+def _jsx_template_sources():
+    """Resolve the wrapper template and fragment paths (env overrides first, then the onefile extraction dir)."""
     tpl_path = os.environ.get("JSX_TEMPLATE_PATH", JSX_TEMPLATE_PATH)
     tpl_abs = os.path.abspath(tpl_path) if tpl_path else None
-    # fallback: try alongside this file (onefile extraction dir)
-    alt_tpl = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates", "indesign_autoflow_map_levels.tpl.jsx")
     if not tpl_abs:
         raise FileNotFoundError("JSX template path is not set. Set JSX_TEMPLATE_PATH or run --dump-jsx-template to see the default path.")
-    try:
-        with open(tpl_abs, "r", encoding="utf-8") as fh:
-            base_text = fh.read()
-    except FileNotFoundError:
+    if not os.path.exists(tpl_abs):
+        # fallback: try alongside this file (onefile extraction dir)
+        alt_tpl = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates", "indesign_autoflow_map_levels.tpl.jsx")
         if os.path.exists(alt_tpl):
             tpl_abs = alt_tpl
-            with open(tpl_abs, "r", encoding="utf-8") as fh:
-                base_text = fh.read()
-        else:
-            raise FileNotFoundError(f"JSX template not found: {tpl_abs}")
-    except Exception as exc:
-        raise RuntimeError(f"Failed to read JSX template: {tpl_abs} err={exc}")
 
     frag_dir = os.environ.get("JSX_FRAGMENT_DIR", JSX_FRAGMENT_DIR)
     frag_dir = os.path.abspath(frag_dir)
@@ -520,20 +610,97 @@ def _load_jsx_template():
         alt_frag_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "templates", "jsx")
         if os.path.isdir(alt_frag_dir):
             frag_dir = alt_frag_dir
+    return tpl_abs, [(key, os.path.join(frag_dir, fname)) for key, fname in JSX_FRAGMENTS.items()]
+
+
+def _load_jsx_template(sources=None):
+    """Load external JSX template; inline template has been removed."""
+    tpl_abs, fragment_paths = sources or _jsx_template_sources()
+    try:
+        with open(tpl_abs, "r", encoding="utf-8") as fh:
+            base_text = fh.read()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"JSX template not found: {tpl_abs}")
+    except Exception as exc:
+        raise RuntimeError(f"Failed to read JSX template: {tpl_abs} err={exc}")
+
     fragments = {}
-    for key, fname in JSX_FRAGMENTS.items():
-        frag_path = os.path.join(frag_dir, fname)
+    for key, frag_path in fragment_paths:
         try:
             with open(frag_path, "r", encoding="utf-8") as fh:
                 fragments[key] = fh.read()
         except Exception as exc:
             raise FileNotFoundError(f"Missing JSX fragment {key}: {frag_path} ({exc})")
 
-    composed = base_text
-    for key, content in fragments.items():
-        composed = composed.replace(f'{{{{{key}}}}}', content)
+    composed = _FRAGMENT_SLOT_RE.sub(lambda m: fragments.get(m.group(1), m.group(0)), base_text)
     return composed, tpl_abs
 
+
+# placeholders filled by write_jsx; re.split() with this group alternates literal text and slot names
+_TEMPLATE_SLOT_RE = re.compile(r"(%[A-Z_][A-Z0-9_]*%|__STYLE_LINES__)")
+_JSX_TEMPLATE_COMPILED = None
+
+
+@dataclass
+class _CompiledJsxTemplate:
+    key: list
+    source: str
+    segments: List[str]
+
+    def render(self, values: Dict[str, str], segments: Optional[List[str]] = None) -> List[str]:
+        """Fill every slot in one pass; inserted values are never rescanned for placeholders.
+
+        segments defaults to the whole template; pass one half from split_at() to render just that.
+        """
+        parts = list(self.segments if segments is None else segments)
+        missing = set()
+        for i in range(1, len(parts), 2):
+            value = values.get(parts[i])
+            if value is None:
+                missing.add(parts[i])
+            else:
+                parts[i] = value
+        if missing:
+            raise RuntimeError(f"JSX placeholder not replaced: {sorted(missing)}")
+        return parts
+
+    def split_at(self, slot: str):
+        """Segments before and after the single occurrence of slot, each still alternating text/slot."""
+        where = [i for i in range(1, len(self.segments), 2) if self.segments[i] == slot]
+        if len(where) != 1:
+            raise RuntimeError(f"JSX template must contain {slot} exactly once (found {len(where)})")
+        return self.segments[:where[0]], self.segments[where[0] + 1:]
+
+
+def _template_source_key(tpl_abs, fragment_paths):
+    key = []
+    for path in [tpl_abs] + [frag_path for _, frag_path in fragment_paths]:
+        try:
+            st = os.stat(path)
+            key.append([path, st.st_mtime_ns, st.st_size])
+        except OSError:
+            key.append([path, None, None])
+    return key
+
+
+def _compiled_jsx_template():
+    """Composed template split into literal segments and slots, cached for the process.
+
+    The cache is keyed by path, mtime and size of the wrapper and every fragment, so editing a
+    fragment (or pointing JSX_FRAGMENT_DIR elsewhere) recompiles it on the next write_jsx.
+    """
+    global _JSX_TEMPLATE_COMPILED
+    sources = _jsx_template_sources()
+    key = _template_source_key(*sources)
+    compiled = _JSX_TEMPLATE_COMPILED
+    if compiled is None or compiled.key != key:
+        composed, tpl_abs = _load_jsx_template(sources)
+        compiled = _CompiledJsxTemplate(key, tpl_abs, _TEMPLATE_SLOT_RE.split(composed))
+        _debug_log(f"[JSX-TPL] compiled source={tpl_abs} slots={len(compiled.segments) // 2}")
+        _JSX_TEMPLATE_COMPILED = compiled
+    return compiled
+
+
 def _dump_jsx_template(path: str):
     tpl_abs = os.path.abspath(path)
     if os.path.exists(tpl_abs):
@@ -543,23 +710,26 @@ def _dump_jsx_template(path: str):
     return False
 
 
-
-IMG_PLACEHOLDER_FULL_RE = re.compile(r'^\s*(\[\[IMG\s+.+?\]\])\s*$', re.I)
-IMG_PLACEHOLDER_ANY_RE = re.compile(r'\[\[IMG\s+(.+?)\]\]', re.I)
 IMG_KV_PATTERN = r'(\w+)=["\'\u201c\u201d]([^"\'\u201c\u201d]*)["\'\u201c\u201d]'
-FRAME_OPEN_RE = re.compile(r'\[\[FRAME\s+([^\]]+)\]\]', re.I)
-FRAME_CLOSE_TOKEN = "[[/FRAME]]"
-
-
-def _js_escape_simple(val: str) -> str:
-    return (
-        (val or "")
-        .replace("\\", "\\\\")
-        .replace('"', '\\"')
-        .replace("\r\n", "\\n")
-        .replace("\r", "\\n")
-        .replace("\n", "\\n")
-    )
+
+
+# attribute order of the positional spec values in "img"/"frame" ops; sent once with the op stream
+IMAGE_SPEC_KEYS = (
+    "src", "w", "h", "pxw", "pxh", "dpi", "colorMode", "orientation", "align", "inline", "wrap",
+    "posH", "posHref", "posV", "posVref", "rotation", "flipH", "flipV", "offX", "offY",
+    "distT", "distB", "distL", "distR", "cropT", "cropB", "cropL", "cropR",
+    "spaceBefore", "spaceAfter", "caption", "docPrId", "docPrName", "anchorId", "anchorEditId",
+    "wordPageWidth", "wordPageHeight", "wordPageSeq",
+)
+_IMAGE_SPEC_DEFAULTS = {"spaceBefore": "6", "spaceAfter": "6"}
+FRAME_SPEC_KEYS = (
+    "id", "wrap", "wrapSide", "wrapText", "posH", "posHref", "posV", "posVref", "offX", "offY", "w", "h",
+    "distT", "distB", "distL", "distR", "relativeHeight", "behindDoc", "allowOverlap", "layoutInCell",
+    "hidden", "locked", "simplePosX", "simplePosY", "effectL", "effectT", "effectR", "effectB",
+    "sizeRelH", "sizeRelHref", "sizeRelV", "sizeRelVref", "docPrId", "docPrName", "anchorId", "anchorEditId",
+    "bodyInsetL", "bodyInsetT", "bodyInsetR", "bodyInsetB", "bodyWrap", "bodyRtlCol", "pageHint",
+    "wordPageWidth", "wordPageHeight", "wordPageSeq",
+)
 
 
 @dataclass
@@ -577,137 +747,22 @@ class ImageSpec:
         value = self.attrs.get(key, "")
         return value if value not in (None, "") else default
 
-    def to_js_block(self) -> str:
-        src_for_log = self.get("src")
-        inline_for_log = self.get("inline")
-        spec_js = self._build_spec_js_literal()
-        return f'''(function(){{
-              try {{
-                var spec={spec_js};
-                var __imgCtx = spec.logContext || null;
-                var __imgTag = "[IMG]";
-                if (__imgCtx && __imgCtx.id) __imgTag = "[IMG][" + __imgCtx.id + "]";
-                var __imgWarnTag = "[ERROR]";
-                if (__imgCtx && __imgCtx.id) __imgWarnTag = "[ERROR][IMG " + __imgCtx.id + "]";
-                if (__imgCtx){{
-                  var __imgPrev = __imgCtx.preview ? String(__imgCtx.preview) : "";
-                  if (__imgPrev.length > 80) __imgPrev = __imgPrev.substring(0,80) + "...";
-                  var __imgSummary = ' para=' + (__imgCtx.paraIndex||"?") + ' style=' + (__imgCtx.style||"");
-                  if (__imgPrev) __imgSummary += ' text="' + __imgPrev + '"';
-                  log(__imgTag + " ctx" + __imgSummary);
-                }}
-                log(__imgTag + " pyMeta src={src_for_log} inline={inline_for_log}");
-                // 0) 环境检查
-                log("[DBG] typeof __imgAddFloatingImage=" + (typeof __imgAddFloatingImage)
-                    + " typeof __imgAddImageAtV2=" + (typeof __imgAddImageAtV2)
-                    + " typeof __imgNormPath=" + (typeof __imgNormPath));
-                log("[DBG] tf=" + (tf&&tf.isValid) + " story=" + (story&&story.isValid) + " page=" + (page&&page.isValid));
-
-                // 1) 排版溢出
-                try{{ if(typeof flushOverflow==="function"){{ var _rs=flushOverflow(story,page,tf);
-                  if(_rs&&_rs.frame&&_rs.page){{ page=_rs.page; tf=_rs.frame; story=tf.parentStory; curTextFrame=tf; }} }} }}catch(_){{
-                }}
-
-                // 2) 锚点
-                var ip=(tf&&tf.isValid)?_safeIP(tf):story.insertionPoints[-1];
-                // 3) 路径
-                var f=__imgNormPath("{_js_escape_simple(src_for_log)}");
-                log("[DBG] __imgNormPath ok=" + (!!f) + " exists=" + (f&&f.exists ? "Y":"N") + " fsName=" + (f?f.fsName:"NA"));
-
-                if(f&&f.exists){{
-                  var inl=_trim(spec.inline); // 兼容 InDesign 2020
-                  log(__imgTag + " dispatch src="+spec.src+" inline="+inl+" posH="+(spec.posH||"")+" posV="+(spec.posV||""));
-
-                  if(inl==="0"||/^false$/i.test(inl)){{
-                  log("[DBG] dispatch -> __imgAddFloatingImage");
-                    var rect=__imgAddFloatingImage(tf,story,page,spec);
-                    if(rect&&rect.isValid) log(__imgTag + " ok (float): " + spec.src);
-                    try{{
-                      if (__FLOAT_CTX && __FLOAT_CTX.lastTf && __FLOAT_CTX.lastTf.isValid){{
-                        tf = __FLOAT_CTX.lastTf;
-                        story = tf.parentStory;
-                        if(__FLOAT_CTX.lastPage && __FLOAT_CTX.lastPage.isValid){{
-                          page = __FLOAT_CTX.lastPage;
-                        }} else {{
-                          page = tf.parentPage;
-                        }}
-                        try{{
-                          if(typeof _safeIP==="function"){{
-                            ip = _safeIP(tf);
-                          }}
-                        }}catch(_){{
-                        }}
-                        if((!ip || !ip.isValid) && tf && tf.isValid && tf.insertionPoints && tf.insertionPoints.length){{
-                          ip = tf.insertionPoints[-1];
-                        }}
-                      }}
-                    }}catch(_){{
-                    }}
-                  }} else {{
-                  log("[DBG] dispatch -> __imgAddImageAtV2");
-                    var rect=__imgAddImageAtV2(ip,spec);
-                    if(rect&&rect.isValid) log(__imgTag + " ok (inline): " + spec.src);
-                  }}
-                }} else {{
-                  log(__imgWarnTag + " missing: {src_for_log}");
-                }}
-                try{{
-                  var __imgDetail = (__imgCtx && __imgCtx.id) ? ("id=" + __imgCtx.id) : ("src=" + (spec && spec.src ? spec.src : ""));
-                  __progressBump("IMG", __imgDetail);
-                }}catch(_){{
-                }}
-              }} catch(e) {{
-                log(__imgWarnTag + " exception " + e);
-              }}
-            }})();'''
-
-    def _build_spec_js_literal(self) -> str:
-        align_val = self.attrs.get("align")
-        if align_val is None:
-            align_val = "center"
-
-        ordered_keys = [
-            ("src", self.get("src")),
-            ("w", self.get("w")),
-            ("h", self.get("h")),
-            ("pxw", self.get("pxw")),
-            ("pxh", self.get("pxh")),
-            ("align", align_val),
-            ("inline", self.get("inline")),
-            ("wrap", self.get("wrap")),
-            ("posH", self.get("posH")),
-            ("posHref", self.get("posHref")),
-            ("posV", self.get("posV")),
-            ("posVref", self.get("posVref")),
-            ("rotation", self.get("rotation")),
-            ("flipH", self.get("flipH")),
-            ("flipV", self.get("flipV")),
-            ("offX", self.get("offX")),
-            ("offY", self.get("offY")),
-            ("distT", self.get("distT")),
-            ("distB", self.get("distB")),
-            ("distL", self.get("distL")),
-            ("distR", self.get("distR")),
-            ("cropT", self.get("cropT")),
-            ("cropB", self.get("cropB")),
-            ("cropL", self.get("cropL")),
-            ("cropR", self.get("cropR")),
-            ("spaceBefore", self.get("spaceBefore", "6")),
-            ("spaceAfter", self.get("spaceAfter", "6")),
-            ("caption", self.get("caption")),
-            ("docPrId", self.get("docPrId")),
-            ("docPrName", self.get("docPrName")),
-            ("anchorId", self.get("anchorId")),
-            ("anchorEditId", self.get("anchorEditId")),
-            ("wordPageWidth", self.get("wordPageWidth")),
-            ("wordPageHeight", self.get("wordPageHeight")),
-            ("wordPageSeq", self.get("wordPageSeq")),
-        ]
-        parts = [f'{k}:"{_js_escape_simple(v)}"' for k, v in ordered_keys]
-        parts.append(f"forceBlock:{str(self.force_block).lower()}")
-        if self.log_context:
-            parts.append(f"logContext:{json.dumps(self.log_context, ensure_ascii=False)}")
-        return "{%s}" % ",".join(parts)
+    def op_values(self) -> List[str]:
+        """Attribute values in IMAGE_SPEC_KEYS order (the JSX rebuilds the spec object from them)."""
+        values = []
+        for key in IMAGE_SPEC_KEYS:
+            if key == "align":
+                align_val = self.attrs.get("align")
+                values.append("center" if align_val is None else align_val)
+            else:
+                values.append(self.get(key, _IMAGE_SPEC_DEFAULTS.get(key, "")))
+        return values
+
+    def op_item(self) -> list:
+        return [self.op_values(), 1 if self.force_block else 0, self.log_context]
+
+    def to_op(self) -> list:
+        return ["img"] + self.op_item()
 
 
 @dataclass
@@ -720,96 +775,16 @@ class FrameSpec:
         clean = {k: (v or "") for k, v in mapping.items()}
         return cls(attrs=clean, text=text or "")
 
-    def _build_spec_js_literal(self) -> str:
-        keys = [
-            "id",
-            "wrap",
-            "wrapSide",
-            "wrapText",
-            "posH",
-            "posHref",
-            "posV",
-            "posVref",
-            "offX",
-            "offY",
-            "w",
-            "h",
-            "distT",
-            "distB",
-            "distL",
-            "distR",
-            "relativeHeight",
-            "behindDoc",
-            "allowOverlap",
-            "layoutInCell",
-            "hidden",
-            "locked",
-            "simplePosX",
-            "simplePosY",
-            "effectL",
-            "effectT",
-            "effectR",
-            "effectB",
-            "sizeRelH",
-            "sizeRelHref",
-            "sizeRelV",
-            "sizeRelVref",
-            "docPrId",
-            "docPrName",
-            "anchorId",
-            "anchorEditId",
-            "bodyInsetL",
-            "bodyInsetT",
-            "bodyInsetR",
-            "bodyInsetB",
-            "bodyWrap",
-            "bodyRtlCol",
-            "pageHint",
-            "wordPageWidth",
-            "wordPageHeight",
-            "wordPageSeq",
-        ]
-        parts = [f'{k}:"{_js_escape_simple(self.attrs.get(k, ""))}"' for k in keys]
-        parts.append(f'text:"{_js_escape_simple(self.text)}"')
-        return "{%s}" % ",".join(parts)
-
-    def to_js_block(self) -> str:
-        spec_js = self._build_spec_js_literal()
-        frame_id = self.attrs.get("id", "")
-        return f'''(function(){{
-              log("[PY][frame] id={frame_id} len={len(self.text)}");
-              try {{
-                var spec={spec_js};
-                if (typeof __imgAddFloatingFrame === "function") {{
-                  __imgAddFloatingFrame(tf, story, page, spec);
-                }} else {{
-                  log("[FRAME][WARN] addFloatingFrame missing; fallback insert text only (typeof=" + (typeof __imgAddFloatingFrame) + ")");
-                  try {{
-                    var __ip = (typeof _safeIP==="function") ? _safeIP(tf) : null;
-                    if (!__ip || !__ip.isValid) {{
-                      if (tf && tf.isValid && tf.insertionPoints && tf.insertionPoints.length) __ip = tf.insertionPoints[-1];
-                      else if (story && story.isValid) __ip = story.insertionPoints[-1];
-                    }}
-                    if (__ip && __ip.isValid) {{
-                      var txt = spec.text || "";
-                      if (typeof smartWrapStr === "function") txt = smartWrapStr(txt);
-                      __ip.contents = txt + "\\r";
-                    }}
-                  }} catch(__fb) {{
-                    log("[FRAME][WARN] fallback insert failed: " + __fb);
-                  }}
-                }}
-              }} catch(e) {{
-                log("[FRAME][EXC] " + e);
-              }}
-            }})();'''
-
-
-def _prepare_paragraphs_for_jsx(paragraphs, img_pattern):
-    """Normalize paragraphs list: split texts around image markers."""
+    def to_op(self) -> list:
+        return ["frame", [self.attrs.get(k, "") for k in FRAME_SPEC_KEYS], self.text]
+
+
+def _prepare_paragraphs_for_jsx(paragraphs, note_marker=None):
+    """Normalize paragraphs list: split each Paragraph around its image/table/frame tokens."""
     expanded = []
-    for idx, (style, text) in enumerate(paragraphs, 1):
-        chunks = _split_media_chunks(style, text)
+    for idx, para in enumerate(paragraphs, 1):
+        style = para.style
+        chunks = _paragraph_media_chunks(para, note_marker)
         # group consecutive ImageSpec chunks for multi-image placement
         merged = []
         img_group = []
@@ -833,9 +808,9 @@ def _prepare_paragraphs_for_jsx(paragraphs, img_pattern):
                 merged.append((style, img_group.copy()))
         if PIPELINE_LOGGER:
             kinds = [_classify_chunk_value(chunk) for _, chunk in merged]
-            _debug_log(f"[PARA-SPLIT idx={idx} style={style}] origLen={len(text or '')} chunks={len(merged)} kinds={kinds}")
+            _debug_log(f"[PARA-SPLIT idx={idx} style={style}] tokens={len(para.tokens)} chunks={len(merged)} kinds={kinds}")
         expanded.extend(merged)
-    return expanded or paragraphs
+    return expanded
 
 
 def _preflight_snippet(text: str, limit: int = 120) -> str:
@@ -870,100 +845,92 @@ def _preflight_reason(style: str, text: str, max_chars: int = 600000) -> Optiona
     return None
 
 
-def _split_media_chunks(style, text):
-    if not text:
-        return [(style, text)]
-
-    parts = []
-    stripped_all = text.strip()
-    idx = 0
-    length = len(text)
-    token_pattern = re.compile(r'\[\[(IMG|FRAME|TABLE)\b', re.I)
-
-    def _extract_table_block(start_idx: int):
-        json_start = text.find("{", start_idx)
-        if json_start == -1:
-            return None, start_idx
-        brace = 0
-        in_string = False
-        escape = False
-        pos = json_start
-        json_end = None
-        while pos < length:
-            ch = text[pos]
-            if escape:
-                escape = False
-            elif ch == "\\":
-                escape = True
-            elif ch == '"':
-                in_string = not in_string
-            elif not in_string:
-                if ch == "{":
-                    brace += 1
-                elif ch == "}":
-                    brace -= 1
-                    if brace == 0:
-                        json_end = pos + 1
-                        break
-            pos += 1
-        if json_end is None:
-            return None, start_idx
-        close_idx = text.find("]]", json_end)
-        if close_idx == -1:
-            return None, start_idx
-        return text[start_idx:close_idx + 2], close_idx + 2
-
-    search_pos = 0
-    while True:
-        marker = token_pattern.search(text, search_pos)
-        if not marker:
-            break
-        marker_start = marker.start()
-        if marker_start > idx:
-            parts.append((style, text[idx:marker_start]))
-        token = marker.group(1).lower()
-        if token == "img":
-            img_match = IMG_PLACEHOLDER_ANY_RE.match(text, marker_start)
-            if not img_match:
-                search_pos = marker_start + 2
-                continue
-            attr_section = img_match.group(1)
-            only_img = stripped_all == img_match.group(0).strip()
-            spec = _image_spec_from_attrs(attr_section, force_block=only_img)
-            parts.append((style, spec))
-            idx = img_match.end()
-            search_pos = idx
-            continue
-        if token == "frame":
-            open_match = FRAME_OPEN_RE.match(text, marker_start)
-            if not open_match:
-                search_pos = marker_start + 2
-                continue
-            close_idx = text.find(FRAME_CLOSE_TOKEN, open_match.end())
-            if close_idx == -1:
-                search_pos = marker_start + 2
-                continue
-            inner_text = text[open_match.end():close_idx]
-            spec = _frame_spec_from_attrs(open_match.group(1), inner_text)
-            parts.append((style, spec))
-            idx = close_idx + len(FRAME_CLOSE_TOKEN)
-            search_pos = idx
-            continue
-        if token == "table":
-            table_chunk, next_idx = _extract_table_block(marker_start)
-            if not table_chunk:
-                search_pos = marker_start + 2
-                continue
-            parts.append((style, table_chunk))
-            idx = next_idx
-            search_pos = next_idx
-            continue
-        search_pos = marker_start + 2
+class NoteTable:
+    """Footnote/endnote bodies sent once as "note" ops (into __NOTES); paragraphs carry [[NOTE:n]].
 
-    if idx < length:
-        parts.append((style, text[idx:]))
+    A referenced note used twice keeps one entry; inline notes get one entry per NoteRef. Only the
+    entry numbers are kept here, the bodies go out with the next flush().
+    """
 
-    return [(style, chunk) for style, chunk in parts if chunk not in ("", None)]
+    def __init__(self):
+        self.count = 0
+        self._index: Dict[object, int] = {}
+        self._inline: Dict[object, int] = {}
+        self._pending: List[list] = []
+
+    def marker(self, ref: NoteRef) -> str:
+        if ref.rid is not None and not ref.text:
+            return ref.marker()  # unknown id: keep the visible [*] placeholder
+        index = self._index if ref.rid is not None else self._inline
+        key = (ref.kind, ref.rid) if ref.rid is not None else ref
+        idx = index.get(key)
+        if idx is None:
+            idx = index[key] = self.count
+            self.count += 1
+            # whitespace collapsed as it was when the body travelled inside the paragraph text
+            self._pending.append(["note", ref.kind, ref.rid or "", re.sub(r"\s+", " ", ref.text)])
+        return f"[[NOTE:{idx}]]"
+
+    def next_paragraph(self):
+        # inline notes are keyed by token, which is only serialized again within its own paragraph
+        self._inline.clear()
+
+    def flush(self) -> List[list]:
+        """Note ops for the entries added since the last flush; they must precede the ops using them."""
+        pending, self._pending = self._pending, []
+        return pending
+
+
+_INLINE_TOKENS = (TextRun, NoteRef)
+
+
+def _paragraph_media_chunks(para, note_marker=None):
+    """Return (style, chunk) pairs: marker text for runs, ImageSpec/FrameSpec/TableRef for media."""
+    style = para.style
+    tokens = para.tokens
+    if all(type(tok) in _INLINE_TOKENS for tok in tokens):
+        text = para.marker_text()
+        return [(style, text)] if text else []
+    images = [tok for tok in tokens if type(tok) is ImageRef]
+    only_img = len(images) == 1 and all(
+        tok is images[0] or (type(tok) is TextRun and not tok.style and not tok.text.strip())
+        for tok in tokens
+    )
+    parts = []
+    pending = []
+
+    def flush():
+        if pending:
+            text = tokens_to_marker_text(pending, note_marker)
+            if text:
+                parts.append((style, text))
+            pending.clear()
+
+    i = 0
+    count = len(tokens)
+    while i < count:
+        tok = tokens[i]
+        kind = type(tok)
+        if kind is ImageRef:
+            flush()
+            parts.append((style, _image_spec_from_attrs(tok.attr_text, force_block=only_img)))
+        elif kind is TableRef:
+            flush()
+            parts.append((style, tok))
+        elif kind is FrameOpen:
+            close = next((j for j in range(i + 1, count) if type(tokens[j]) is FrameClose), -1)
+            if close < 0:
+                pending.append(tok)
+            else:
+                flush()
+                inner_text = tokens_to_marker_text(tokens[i + 1:close])
+                parts.append((style, _frame_spec_from_attrs(tok.attr_text, inner_text)))
+                i = close
+        else:
+            pending.append(tok)
+        i += 1
+    flush()
+    return parts
 
 
 def _classify_chunk_value(chunk):
@@ -979,6 +946,8 @@ def _classify_chunk_value(chunk):
         if upper.startswith("[[FRAME"):
             return "FRAME_MARKER"
         return f"text(len={len(trimmed)})"
+    if isinstance(chunk, TableRef):
+        return "TABLE_MARKER"
     name = getattr(chunk, "__class__", type(chunk)).__name__
     if isinstance(chunk, dict):
         if "rows" in chunk and "cols" in chunk:
@@ -1002,14 +971,6 @@ def _normalize_style_name(style, levels_used):
     return sty
 
 
-def _match_img_marker(text):
-    attr_match = IMG_PLACEHOLDER_ANY_RE.search(text)
-    if not attr_match:
-        return None, False
-    only_img = bool(IMG_PLACEHOLDER_FULL_RE.match(text))
-    return attr_match.group(1), only_img
-
-
 def _image_spec_from_attrs(attr_text, force_block=False):
     kv = dict(re.findall(IMG_KV_PATTERN, attr_text))
     inline_flag = (kv.get("inline", "") or "").strip().lower()
@@ -1030,11 +991,7 @@ def _frame_spec_from_attrs(attr_text, inner_text):
     return FrameSpec.from_mapping(kv, text=inner_text.strip())
 
 
-def _handle_table_marker(text, add_lines, ctx=None):
-    m_tbl = re.match(r'^\s*\[\[TABLE\s+(\{[\s\S]*\})\s*\]\]\s*$', text)
-    if not m_tbl:
-        return False
-    payload = m_tbl.group(1)
+def _add_table(payload, ops, ctx=None):
     parse_source = "json"
     try:
         obj = json.loads(payload)
@@ -1045,9 +1002,11 @@ def _handle_table_marker(text, add_lines, ctx=None):
     rows = int(obj.get("rows", 0))
     cols = int(obj.get("cols", 0))
     data = obj.get("data") or []
+    segment = obj.get("segment") or {}
     ctx_label = _ctx_label(ctx)
+    seg_label = f" segment={segment.get('index')}/{segment.get('count')} id={segment.get('id')}" if segment else ""
     _debug_log(
-        f"[TABLE]{ctx_label} marker rows={rows} cols={cols} dataRows={len(data)} source={parse_source}"
+        f"[TABLE]{ctx_label} marker rows={rows} cols={cols} dataRows={len(data)} source={parse_source}{seg_label}"
     )
     if ctx:
         obj["logContext"] = {
@@ -1057,53 +1016,15 @@ def _handle_table_marker(text, add_lines, ctx=None):
             "preview": ctx.get("preview"),
         }
     # rows/cols/data kept here for debugging
-    add_lines.append('__tblAddTableHiFi(%s);\ntry{if(__DEFAULT_LAYOUT && __DEFAULT_LAYOUT.pageOrientation=="landscape"){log("[TABLE][restore] skip: default landscape (py-gen)");}else{__tableRestoreLayout(); __ensureLayoutDefault();}}catch(__tblRest){}' % (json.dumps(obj, ensure_ascii=False)))
-    return True
-
-
-def _handle_img_marker(text, add_lines, ctx=None):
-    # support multiple IMG markers in one chunk
-    all_matches = re.findall(IMG_PLACEHOLDER_ANY_RE, text)
-    if not all_matches:
-        return False
-    if len(all_matches) > 1:
-        specs = []
-        for m in all_matches:
-            spec = _image_spec_from_attrs(m, force_block=False)
-            spec.log_context = {
-                "id": ctx.get("id") if ctx else None,
-                "paraIndex": ctx.get("paraIndex") if ctx else None,
-                "style": ctx.get("style") if ctx else None,
-                "preview": ctx.get("preview") if ctx else None,
-            } if ctx else None
-            specs.append(spec)
-        ctx_label = _ctx_label(ctx)
-        _debug_log(f"[IMG-GROUP]{ctx_label} count={len(specs)}")
-        specs_js = "[" + ",".join([s._build_spec_js_literal() for s in specs]) + "]"
-        add_lines.append("__ensureLayoutDefault();")
-        add_lines.append("(function(){ try{ __imgPlaceImageGroup(tf, story, page, %s); }catch(__e){ try{ log('[IMG-GROUP][ERR] '+__e); }catch(_){ } } })();" % specs_js)
+    if segment and int(segment.get("index", 0) or 0) + 1 < int(segment.get("count", 1) or 1):
+        # more segments follow and will be appended to this table; keep its layout active
+        ops.append(["tbl", obj, 0])
         return True
-
-    match, only_img = _match_img_marker(text)
-    if not match:
-        return False
-    spec = _image_spec_from_attrs(match, force_block=only_img)
-    spec.log_context = {
-        "id": ctx.get("id") if ctx else None,
-        "paraIndex": ctx.get("paraIndex") if ctx else None,
-        "style": ctx.get("style") if ctx else None,
-        "preview": ctx.get("preview") if ctx else None,
-    } if ctx else None
-    ctx_label = _ctx_label(ctx)
-    _debug_log(
-        f"[IMG]{ctx_label} marker src={spec.get('src')} inline={spec.get('inline')} force_block={spec.force_block}"
-    )
-    add_lines.append("__ensureLayoutDefault();")
-    add_lines.append(spec.to_js_block())
+    ops.append(["tbl", obj, 1])
     return True
 
 
-def _handle_html_table(text, add_lines, ctx=None):
+def _handle_html_table(text, ops, ctx=None):
     if not re.match(r'^\s*<table\b[\s\S]*</table>\s*$', text, flags=re.I):
         return False
     try:
@@ -1141,7 +1062,7 @@ def _handle_html_table(text, add_lines, ctx=None):
             "style": ctx.get("style"),
             "preview": ctx.get("preview"),
         }
-    add_lines.append('__tblAddTableHiFi(%s);\ntry{if(__DEFAULT_LAYOUT && __DEFAULT_LAYOUT.pageOrientation=="landscape"){log("[TABLE][restore] skip: default landscape (py-gen)");}else{__tableRestoreLayout(); __ensureLayoutDefault();}}catch(__tblRest){}' % (json.dumps(obj, ensure_ascii=False)))
+    ops.append(["tbl", obj, 1])
     return True
 
 
@@ -1181,7 +1102,7 @@ def _build_html_image_spec(text):
     }
     return ImageSpec.from_mapping(attrs)
 
-def _handle_html_image(text, add_lines, ctx=None):
+def _handle_html_image(text, ops, ctx=None):
     spec = _build_html_image_spec(text)
     if not spec:
         return False
@@ -1195,42 +1116,191 @@ def _handle_html_image(text, add_lines, ctx=None):
     _debug_log(
         f"[HTML-IMG]{ctx_label} src={spec.get('src')} inline={spec.get('inline')} force_block={spec.force_block}"
     )
-    add_lines.append("__ensureLayoutDefault();")
-    add_lines.append(spec.to_js_block())
+    ops.append(spec.to_op())
     return True
 
 
-def _append_default_paragraph(add_lines, sty, esc):
-    add_lines.append("__ensureLayoutDefault();")
-    add_lines.append(f'addParaWithNotes(story, "{sty}", "{esc}");')
+def _para_text(s: str) -> str:
+    """Paragraph text as addParaWithNotes receives it: literal \\r/\\n escapes and whitespace runs become one space."""
+    s = s.replace("\\r\\n", " ").replace("\\r", " ").replace("\\n", " ")
+    return re.sub(r"\s+", " ", s)
 
 
-def write_jsx(jsx_path, paragraphs):
-    add_lines = []
-    levels_used = set()
+def payload_path_for(jsx_path: str) -> str:
+    """Sidecar written next to the JSX when JSX_PAYLOAD_SIDECAR is on."""
+    return os.path.splitext(jsx_path)[0] + ".payload.jsonl"
+
+
+def chunk_path_for(jsx_path: str, index: int) -> str:
+    """Script for chunk index (1-based) when JSX_CHUNK_OPS splits the run."""
+    base, ext = os.path.splitext(jsx_path)
+    return f"{base}.part{index:03d}{ext or '.jsx'}"
+
+
+def chunk_state_path_for(jsx_path: str) -> str:
+    """State shared by the chunk scripts and run_jsx_chunks (chunk list, last completed chunk, resume point)."""
+    return os.path.splitext(jsx_path)[0] + ".chunks.json"
+
+
+def chunk_work_path_for(jsx_path: str) -> str:
+    """Document the chunk scripts save after each chunk, reopened on resume."""
+    return os.path.splitext(jsx_path)[0] + ".work.indd"
+
+
+def reported_jsx_paths(jsx_path: str):
+    """(script, payload or None) to show the user for what write_jsx produced at jsx_path.
+
+    In chunk mode that is the state file and a pattern for the per-chunk payloads.
+    """
+    if JSX_CHUNK_OPS:
+        data = os.path.splitext(jsx_path)[0] + ".part*.payload.jsonl" if JSX_PAYLOAD_SIDECAR else None
+        return chunk_state_path_for(jsx_path), data
+    return jsx_path, (payload_path_for(jsx_path) if JSX_PAYLOAD_SIDECAR else None)
+
+
+def _ops_json(payload) -> str:
+    # JSON is valid JS except for raw U+2028/U+2029 inside strings (ExtendScript is ES3)
+    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return text.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+class _JsxWriter:
+    """Streams ops into the script (or its payload sidecar) being written; stands in for the op list.
+
+    With chunk_ops, new_chunk() closes the current script at the first paragraph boundary after
+    chunk_ops ops (never between the segments of a split table) and starts the next one.
+    """
+
+    def __init__(self, jsx_path, template, values, jsx_config, sidecar, chunk_ops, levels_used):
+        self.jsx_path = jsx_path
+        self.template = template
+        self.head, self.tail = template.split_at("%OPS_JSON%")
+        self.values = values
+        self.jsx_config = jsx_config
+        self.sidecar = sidecar
+        self.chunk_ops = chunk_ops
+        self.levels_used = levels_used
+        self.scripts: List[str] = []
+        self.kinds = set()
+        self.count = 0
+        self.total = 0
+        self._fh = None
+        self._tmp = None
+        self._path = None
+        self._payload = None
+        self._open_segment = False
+
+    def start(self):
+        index = len(self.scripts) + 1
+        self._path = chunk_path_for(self.jsx_path, index) if self.chunk_ops else self.jsx_path
+        config = self.jsx_config
+        if self.chunk_ops:
+            state_path = os.path.abspath(chunk_state_path_for(self.jsx_path)).replace("\\", "/")
+            config = dict(config, chunk={"index": index, "state": state_path})
+        self.values["%JSX_CONFIG%"] = json.dumps(config, ensure_ascii=False)
+        spec_keys = {"imgKeys": IMAGE_SPEC_KEYS, "frameKeys": FRAME_SPEC_KEYS}
+        self.count = 0
+        if self.sidecar:
+            self._payload = os.path.abspath(payload_path_for(self._path))
+            # streamed into a temp file so a failure part-way never leaves a truncated file behind
+            self._tmp = self._payload + ".tmp"
+            self._fh = open(self._tmp, "w", encoding="utf-8", newline="\n", buffering=JSX_WRITE_BUFFER)
+            # header record, then one op per line
+            self._fh.write(_ops_json(spec_keys))
+            self._fh.write("\n")
+            self._sep = "\n"
+        else:
+            self._tmp = self._path + ".tmp"
+            self._fh = open(self._tmp, "w", encoding="utf-8", buffering=JSX_WRITE_BUFFER)
+            self._fh.writelines(self.template.render(self.values, self.head))
+            # {"imgKeys":[..],"frameKeys":[..],"ops":[ <op>,<op>,... ]}
+            self._fh.write(_ops_json(spec_keys)[:-1] + ',"ops":[')
+            self._sep = ","
+
+    def append(self, op):
+        if self.count:
+            self._fh.write(self._sep)
+        self._fh.write(_ops_json(op))
+        self.count += 1
+        self.total += 1
+        self.kinds.add(op[0])
+        if op[0] == "tbl":
+            seg = op[1].get("segment") if isinstance(op[1], dict) else None
+            try:
+                self._open_segment = bool(seg) and int(seg.get("index", 0)) + 1 < int(seg.get("count", 1))
+            except (AttributeError, TypeError, ValueError):
+                self._open_segment = False
+
+    def new_chunk(self) -> bool:
+        """Start the next chunk script if the current one is full; True when it did."""
+        if not self.chunk_ops or self.count < self.chunk_ops or self._open_segment:
+            return False
+        # chunk scripts take the progress total from the state file
+        self.finish(0)
+        self.start()
+        return True
+
+    def finish(self, progress_total):
+        self.append(["end", self.count])
+        self.values["%PROGRESS_TOTAL%"] = str(max(progress_total, 0))
+        self.values["__STYLE_LINES__"] = build_style_lines(self.levels_used)
+        if self.sidecar:
+            self._fh.write("\n")
+            self._fh.close()
+            os.replace(self._tmp, self._payload)
+            _debug_log(f"[WRITE-JSX] payload sidecar={self._payload} ops={self.count}")
+            self.values["%OPS_JSON%"] = _ops_json({"payload": self._payload.replace("\\", "/")})
+            with open(self._path, "w", encoding="utf-8") as f:
+                f.writelines(self.template.render(self.values))
+        else:
+            self._fh.write("]}")
+            self._fh.writelines(self.template.render(self.values, self.tail))
+            self._fh.close()
+            os.replace(self._tmp, self._path)
+        self._fh = self._tmp = None
+        self.scripts.append(self._path)
+
+    def abort(self):
+        if self._fh is not None:
+            self._fh.close()
+            try:
+                os.remove(self._tmp)
+            except OSError:
+                pass
+            self._fh = self._tmp = None
+
+
+def _write_paragraph_ops(paragraphs, ops, levels_used):
+    """Generate the ops for paragraphs (consumed once) into ops; returns (count, progress_total)."""
+    notes = NoteTable()
     table_seq = 0
     image_seq = 0
     para_chunks = 0
 
-    add_lines.append("function onNewLevel1(){ var pkt = startNewChapter(story, page, tf); story=pkt.story; page=pkt.page; tf=pkt.frame; }")
-    add_lines.append("firstChapterSeen = false;")
-
-    img_pattern = re.compile(r'\[\[IMG\s+[^\]]+\]\]', re.I)
-    _debug_log(f"[WRITE-JSX] totalParas={len(paragraphs)}")
-    for idx, (style, text) in enumerate(paragraphs, 1):
+    idx = 0
+    for idx, para in enumerate(paragraphs, 1):
+        if ops.new_chunk():
+            notes = NoteTable()  # each chunk script starts with an empty __NOTES
+        if not isinstance(para, Paragraph):
+            para = Paragraph.from_marker_text(*para)
+        style = para.style
         sty = _normalize_style_name(style, levels_used)
-        normalized_text = text or ""
+        # marker text as emitted: notes become [[NOTE:n]] references into the note table
+        notes.next_paragraph()
+        jsx_para = Paragraph(sty, para.tokens, tokens_to_marker_text(para.tokens, notes.marker))
+        normalized_text = jsx_para.marker_text()
         preview = normalized_text[:40].replace("\n", " ").strip()
         _debug_log(f"[WRITE-JSX idx={idx}] inStyle={style} normalized={sty} origLen={len(normalized_text)} preview={preview!r}")
+        # sent even for a skipped paragraph: a later reference to the same id reuses the entry number
+        for note_op in notes.flush():
+            ops.append(note_op)
         reason = _preflight_reason(style, normalized_text)
         if reason:
-            preview = escape_js(_preflight_snippet(normalized_text))
-            js_reason = escape_js(f"preflight: {reason}")
-            add_lines.append(f'__logSkipParagraph(__nextParaSeq(), "{sty}", "{js_reason}", "{preview}")')
+            ops.append(["skip", sty, _para_text(f"preflight: {reason}"), _para_text(_preflight_snippet(normalized_text))])
             print(f"[ERROR] 段落 {idx+1} ({style}) 预检查失败：{reason}，已跳过")
             continue
 
-        expanded = _prepare_paragraphs_for_jsx([(sty, normalized_text)], img_pattern)
+        expanded = _prepare_paragraphs_for_jsx([jsx_para], notes.marker)
         if not expanded:
             expanded = [(sty, normalized_text)]
 
@@ -1239,54 +1309,69 @@ def write_jsx(jsx_path, paragraphs):
             chunk_desc = _classify_chunk_value(chunk)
             _debug_log(f"[WRITE-JSX chunk idx={idx}] type={chunk_desc}")
             if level1_pending:
-                add_lines.append("if (firstChapterSeen) { var __fl = flushOverflow(story, page, tf); story = __fl.frame.parentStory; page = __fl.page; tf = __fl.frame; onNewLevel1(); } else { firstChapterSeen = true; }")
+                ops.append(["ch"])
                 level1_pending = False
 
-            if isinstance(chunk, ImageSpec):
-                add_lines.append("__ensureLayoutDefault();")
-                add_lines.append(chunk.to_js_block())
+            if isinstance(chunk, (ImageSpec, FrameSpec)):
+                ops.append(chunk.to_op())
                 continue
             if isinstance(chunk, list) and chunk and all(isinstance(x, ImageSpec) for x in chunk):
-                specs_js = "[" + ",".join([x._build_spec_js_literal() for x in chunk]) + "]"
                 _debug_log(f"[WRITE-JSX][IMG-GROUP] idx={idx} count={len(chunk)} style={sub_style}")
-                add_lines.append("__ensureLayoutDefault();")
-                add_lines.append("(function(){try{__imgPlaceImageGroup(tf, story, page, %s);}catch(__e){try{log('[IMG-GROUP][ERR] '+__e);}catch(_ee){}}})();" % specs_js)
+                ops.append(["imgs", [x.op_item() for x in chunk]])
                 continue
-            if isinstance(chunk, FrameSpec):
-                add_lines.append("__ensureLayoutDefault();")
-                add_lines.append(chunk.to_js_block())
+
+            if isinstance(chunk, TableRef):
+                table_ctx = _make_chunk_context("tbl", table_seq + 1, idx, sub_style, chunk.raw)
+                if _add_table(chunk.json_text, ops, ctx=table_ctx):
+                    table_seq += 1
                 continue
 
             text_chunk = chunk or ""
             sty_chunk = _normalize_style_name(sub_style, levels_used)
-            esc = escape_js(text_chunk)
 
-            table_ctx = _make_chunk_context("tbl", table_seq + 1, idx, sty_chunk, text_chunk)
-            if _handle_table_marker(text_chunk, add_lines, ctx=table_ctx):
-                table_seq += 1
-                continue
-            img_ctx = _make_chunk_context("img", image_seq + 1, idx, sty_chunk, text_chunk)
-            if _handle_img_marker(text_chunk, add_lines, ctx=img_ctx):
-                image_seq += 1
-                continue
-            if _handle_html_table(text_chunk, add_lines, ctx=table_ctx):
-                table_seq += 1
-                continue
-            if _handle_html_image(text_chunk, add_lines, ctx=img_ctx):
-                image_seq += 1
-                continue
+            # [[IMG]]/[[TABLE]] markers were already lifted into tokens; only raw HTML is left
+            if "<" in text_chunk:
+                table_ctx = _make_chunk_context("tbl", table_seq + 1, idx, sty_chunk, text_chunk)
+                img_ctx = _make_chunk_context("img", image_seq + 1, idx, sty_chunk, text_chunk)
+                if _handle_html_table(text_chunk, ops, ctx=table_ctx):
+                    table_seq += 1
+                    continue
+                if _handle_html_image(text_chunk, ops, ctx=img_ctx):
+                    image_seq += 1
+                    continue
 
-            _append_default_paragraph(add_lines, sty_chunk, esc)
+            ops.append(["p", sty_chunk, _para_text(text_chunk)])
             para_chunks += 1
 
+    _debug_log(f"[WRITE-JSX] totalParas={idx}")
     progress_total = para_chunks + table_seq + image_seq
     if progress_total <= 0:
-        progress_total = len(paragraphs)
+        progress_total = idx
     _debug_log(
         f"[WRITE-JSX] progress units para={para_chunks} table={table_seq} img={image_seq} total={progress_total}"
     )
+    return idx, progress_total
+
+
+def write_jsx(jsx_path, paragraphs, sidecar=None, chunk_ops=None):
+    """Write the JSX for paragraphs, consumed in one pass (any iterable); returns how many were read.
 
-    style_lines = build_style_lines(levels_used)
+    The document content goes in as one JSON operation stream (__OPS) run by __runOps in entry.js.
+    Ops are written to the file as they are generated: the template text before %OPS_JSON% goes
+    out first, the slots that need the whole document (progress total, style lines) come after
+    it, and note bodies travel as "note" ops. With sidecar (default JSX_PAYLOAD_SIDECAR) the ops
+    go to payload_path_for(jsx_path) and the JSX only carries that path; the script reads the
+    records one line at a time.
+
+    With chunk_ops (default JSX_CHUNK_OPS) the run is split into chunk_path_for(jsx_path, n)
+    scripts of about chunk_ops ops each, listed in chunk_state_path_for(jsx_path) for
+    run_jsx_chunks; jsx_path itself is not written.
+    """
+    if sidecar is None:
+        sidecar = JSX_PAYLOAD_SIDECAR
+    if chunk_ops is None:
+        chunk_ops = JSX_CHUNK_OPS
+    chunk_ops = max(int(chunk_ops or 0), 0)
 
     img_dirs = [
         OUT_DIR,
@@ -1322,40 +1407,64 @@ def write_jsx(jsx_path, paragraphs):
         "imgDirs": _norm,
     }
 
-    jsx, tpl_used = _load_jsx_template()
-    jsx = jsx.replace("%TEMPLATE_PATH%", TEMPLATE_PATH.replace("\\", "\\\\"))
-    jsx = jsx.replace("%OUT_IDML%", IDML_OUT_PATH.replace("\\", "\\\\"))
-    jsx = jsx.replace("%AUTO_EXPORT%", "true" if AUTO_EXPORT_IDML else "false")
-    jsx = jsx.replace("%BODY_PT%", str(BODY_PT))
-    jsx = jsx.replace("%BODY_LEADING%", str(BODY_LEADING))
-    jsx = jsx.replace("%FN_MARK_PT%", str(FN_MARK_PT))
-    jsx = jsx.replace("%FN_FALLBACK_PT%", str(FN_FALLBACK_PT))
-    jsx = jsx.replace("%FN_FALLBACK_LEAD%", str(FN_FALLBACK_LEAD))
-    jsx = jsx.replace("%EVENT_LOG_PATH%", LOG_PATH.replace("\\", "/"))
-    jsx = jsx.replace("%LOG_WRITE%", "true" if LOG_WRITE else "false")  # ← 新增
-    jsx = jsx.replace("%PROGRESS_TOTAL%", str(max(progress_total, 0)))
-    jsx = jsx.replace("%PROGRESS_HEARTBEAT%", str(PROGRESS_HEARTBEAT_MS))
-    jsx = jsx.replace("%JSX_CONFIG%", json.dumps(jsx_config, ensure_ascii=False))
-    jsx = jsx.replace("%TABLE_BODY_STYLE%", json.dumps(TABLE_BODY_PAR_STYLE))
-    jsx = jsx.replace("%TABLE_BODY_STYLE_FALLBACK%", json.dumps(TABLE_BODY_PAR_STYLE_FALLBACK))
-    jsx = jsx.replace("%TABLE_BODY_STYLE_BASE%", json.dumps(TABLE_BODY_PAR_STYLE_BASE))
-    jsx = jsx.replace("%TABLE_BODY_STYLE_AUTO%", json.dumps(TABLE_BODY_PAR_STYLE_AUTO))
-    jsx = jsx.replace("__STYLE_LINES__", style_lines)
-    jsx = jsx.replace("__ADD_LINES__", "\n    ".join(add_lines))
-    jsx = jsx.replace("%IMG_DIRS_JSON%", json.dumps(_norm).replace("\\", "\\\\"))
-
-    leftovers = sorted(set(m.group(0) for m in re.finditer(r"%[A-Z_][A-Z0-9_]*%", jsx)))
-    if leftovers:
-        raise RuntimeError(f"JSX placeholder not replaced: {leftovers}")
-
-    with open(jsx_path, "w", encoding="utf-8") as f:
-        f.write(jsx)
+    template = _compiled_jsx_template()
+    tpl_used = template.source
+    values = {
+        "%TEMPLATE_PATH%": TEMPLATE_PATH.replace("\\", "\\\\"),
+        "%OUT_IDML%": IDML_OUT_PATH.replace("\\", "\\\\"),
+        "%AUTO_EXPORT%": "true" if AUTO_EXPORT_IDML else "false",
+        "%BODY_PT%": str(BODY_PT),
+        "%BODY_LEADING%": str(BODY_LEADING),
+        "%FN_MARK_PT%": str(FN_MARK_PT),
+        "%FN_FALLBACK_PT%": str(FN_FALLBACK_PT),
+        "%FN_FALLBACK_LEAD%": str(FN_FALLBACK_LEAD),
+        "%EVENT_LOG_PATH%": LOG_PATH.replace("\\", "/"),
+        "%LOG_WRITE%": "true" if LOG_WRITE else "false",
+        "%PROGRESS_HEARTBEAT%": str(PROGRESS_HEARTBEAT_MS),
+        "%TABLE_BODY_STYLE%": json.dumps(TABLE_BODY_PAR_STYLE),
+        "%TABLE_BODY_STYLE_FALLBACK%": json.dumps(TABLE_BODY_PAR_STYLE_FALLBACK),
+        "%TABLE_BODY_STYLE_BASE%": json.dumps(TABLE_BODY_PAR_STYLE_BASE),
+        "%TABLE_BODY_STYLE_AUTO%": json.dumps(TABLE_BODY_PAR_STYLE_AUTO),
+        "%IMG_DIRS_JSON%": json.dumps(_norm).replace("\\", "\\\\"),
+    }
+
+    levels_used = set()
+    ops = _JsxWriter(jsx_path, template, values, jsx_config, sidecar, chunk_ops, levels_used)
+    try:
+        ops.start()
+        idx, progress_total = _write_paragraph_ops(paragraphs, ops, levels_used)
+        ops.finish(0 if chunk_ops else progress_total)
+    except BaseException:
+        ops.abort()
+        raise
+
+    if chunk_ops:
+        state_path = chunk_state_path_for(jsx_path)
+        state = {
+            "chunks": [os.path.basename(path) for path in ops.scripts],
+            "done": 0,
+            "progressTotal": max(progress_total, 0),
+            "work": os.path.abspath(chunk_work_path_for(jsx_path)).replace("\\", "/"),
+            "eventLog": LOG_PATH,
+        }
+        _write_chunk_state(state_path, state)
+        # scripts left over from an earlier run that had more chunks
+        stale = len(ops.scripts) + 1
+        while os.path.exists(chunk_path_for(jsx_path, stale)):
+            for path in (chunk_path_for(jsx_path, stale), payload_path_for(chunk_path_for(jsx_path, stale))):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            stale += 1
+        _debug_log(f"[WRITE-JSX] chunks={len(ops.scripts)} ops={ops.total} state={state_path}")
     # print("[OK] JSX 写入:", jsx_path)
     if tpl_used:
         pass
         # print("[INFO] JSX 模板来源:", tpl_used)
     # print(f"[INFO] JSX 事件日志: {LOG_PATH}")
-    print("[DEBUG] JSX 是否包含 addImageAtV2：", any("__imgAddImageAtV2(" in ln for ln in add_lines))
+    print("[DEBUG] JSX 是否包含 addImageAtV2：", "img" in ops.kinds)
+    return idx
 
 
 def run_indesign_windows(jsx_path):
@@ -1447,6 +1556,71 @@ def run_indesign_macos(jsx_path):
     return False
 
 
+def _write_chunk_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _read_chunk_state(path) -> Optional[dict]:
+    """State file as last written by Python or a chunk script; the .tmp copy covers an interrupted rename."""
+    for candidate in (path, path + ".tmp"):
+        try:
+            with open(candidate, "r", encoding="utf-8-sig") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(state, dict) and isinstance(state.get("chunks"), list):
+            return state
+    return None
+
+
+def run_jsx_chunks(state_path, runner, retries=None) -> bool:
+    """Run the chunk scripts listed in state_path in order, starting after the last completed one.
+
+    runner(jsx_path) -> bool runs one script (run_indesign_windows / run_indesign_macos). A chunk
+    only counts as completed once the script itself has recorded it in the state file ("done"),
+    after saving the document, so calling this again after a crash resumes where it stopped.
+    benchmarks/chunk_resume_check.py drives it with a fake runner.
+    """
+    if retries is None:
+        retries = JSX_CHUNK_RETRIES
+    state = _read_chunk_state(state_path)
+    if state is None:
+        print(f"[ERR] 未找到分段状态文件：{state_path}")
+        return False
+    base_dir = os.path.dirname(os.path.abspath(state_path))
+    chunks = state["chunks"]
+    failures = 0
+    while True:
+        done = int(state.get("done") or 0)
+        if done >= len(chunks):
+            print(f"[OK] 分段脚本已全部完成：{len(chunks)} 段")
+            return True
+        index = done + 1
+        script = os.path.join(base_dir, chunks[done])
+        print(f"[CHUNK] 执行第 {index}/{len(chunks)} 段：{script}")
+        ok = runner(script)
+        state = _read_chunk_state(state_path) or state
+        if int(state.get("done") or 0) >= index:
+            failures = 0
+            _debug_log(f"[CHUNK] done={index}/{len(chunks)} page={state.get('page')} frame={state.get('frame')}")
+            continue
+        failures += 1
+        print(f"[ERR] 第 {index} 段未完成（runner={ok}，第 {failures} 次失败）")
+        if failures > retries:
+            print(f"[ERR] 已停止；可用 --resume 从第 {index} 段继续")
+            return False
+
+
+def run_jsx(jsx_path, runner) -> bool:
+    """Run what write_jsx produced for jsx_path: the chunk scripts when JSX_CHUNK_OPS is set, else the JSX."""
+    if JSX_CHUNK_OPS:
+        return run_jsx_chunks(chunk_state_path_for(jsx_path), runner)
+    return runner(jsx_path)
+
+
 def _relay_jsx_events(
     logger: PipelineLogger,
     log_path: str,
@@ -1532,6 +1706,17 @@ def main():
         default=None,
         help="正则分级最大层级，0 表示不限制（默认 200）",
     )
+    parser.add_argument(
+        "--hybrid-workers",
+        type=int,
+        default=0,
+        help="hybrid 模式下用 N 个进程并行细分各一级章节（0/1 表示串行）",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="流式读取 word/document.xml，不加载完整 DOM（超大文档降低内存峰值）",
+    )
     parser.add_argument(
         "--skip-docx",
         action="store_true",
@@ -1541,11 +1726,32 @@ def main():
         "--xml-path",
         help="手动指定 XML 输入/输出路径，默认 formatted_output.xml",
     )
+    parser.add_argument(
+        "--keep-xml",
+        action="store_true",
+        help="解析 DOCX 时同时写出 XML（调试用，供之后 --skip-docx 复用）；--debug-log 时默认写出",
+    )
     parser.add_argument(
         "--no-run",
         action="store_true",
         help="只生成 XML/JSX，不实际调用 InDesign",
     )
+    parser.add_argument(
+        "--payload-sidecar",
+        action="store_true",
+        help="正文/表格数据写入 JSX 旁的 .payload.jsonl，由脚本运行时逐行读取（JSX 只保留驱动代码）",
+    )
+    parser.add_argument(
+        "--chunk-ops",
+        type=int,
+        default=None,
+        help="把 JSX 拆成每段约 N 个操作的多个脚本依次执行，每段结束保存进度（0 表示不拆分）",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="不重新生成，按分段状态文件从上次完成的下一段继续执行",
+    )
     parser.add_argument(
         "--dump-jsx-template",
         action="store_true",
@@ -1567,7 +1773,7 @@ def main():
         return
 
 
-    global XML_PATH, LOG_PATH, LOG_WRITE, PIPELINE_LOGGER
+    global XML_PATH, LOG_PATH, LOG_WRITE, PIPELINE_LOGGER, JSX_PAYLOAD_SIDECAR, JSX_CHUNK_OPS
     if args.xml_path:
         XML_PATH = os.path.abspath(args.xml_path)
     docx_input = os.path.abspath(args.docx or "1.docx")
@@ -1580,11 +1786,34 @@ def main():
     )
     LOG_PATH = str(PIPELINE_LOGGER.jsx_event_log_path)
     LOG_WRITE = args.debug_log
+    if args.payload_sidecar:
+        JSX_PAYLOAD_SIDECAR = True
+    if args.chunk_ops is not None:
+        JSX_CHUNK_OPS = max(args.chunk_ops, 0)
     PIPELINE_LOGGER.describe_paths()
     print(f"[LOG] 用户日志: {PIPELINE_LOGGER.user_log_path}")
     if args.debug_log:
         print(f"[LOG] 调试日志: {PIPELINE_LOGGER.debug_log_path}")
 
+    runner = None
+    if AUTO_RUN_WINDOWS and sys.platform.startswith("win"):
+        runner = run_indesign_windows
+    elif AUTO_RUN_MACOS and sys.platform == "darwin":
+        runner = run_indesign_macos
+
+    if args.resume:
+        state_path = chunk_state_path_for(JSX_PATH)
+        if runner is None:
+            print("[ERR] --resume 需要在 Windows/macOS 上调用 InDesign")
+            return
+        # the chunk scripts keep writing to the event log of the run that generated them
+        LOG_PATH = (_read_chunk_state(state_path) or {}).get("eventLog") or LOG_PATH
+        ran = run_jsx_chunks(state_path, runner)
+        PIPELINE_LOGGER.user(f"[CHUNK] resume state={state_path} ok={ran}")
+        _relay_jsx_events(PIPELINE_LOGGER, LOG_PATH, warn_missing=True, cleanup=False)
+        return
+
+    write_xml = args.keep_xml or args.debug_log
     if args.skip_docx:
         if not os.path.exists(XML_PATH):
             msg = f"[ERR] --skip-docx 指定但未找到 XML：{XML_PATH}"
@@ -1605,6 +1834,8 @@ def main():
             mode=args.mode,
             regex_config_path=args.regex_config,
             regex_max_depth=args.regex_max_depth,
+            streaming=args.stream,
+            hybrid_workers=args.hybrid_workers,
         )
         if args.mode in ("regex", "hybrid"):
             rules_path = getattr(exporter, "regex_rules_path", None)
@@ -1614,7 +1845,7 @@ def main():
                 msg = "[INFO] regex 使用默认规则"
             print(msg)
             PIPELINE_LOGGER.user(msg)
-        summary = exporter.process(XML_PATH)
+        summary = exporter.process(XML_PATH, write_xml=write_xml)
         _debug_log(f"[DOCX] summary raw={summary}")
         report = (
             f"[REPORT] DOCX 解析完毕: paragraphs={summary.get('word_paragraphs')} "
@@ -1624,29 +1855,36 @@ def main():
         print(report)
         PIPELINE_LOGGER.user(report)
 
-    paragraphs = extract_paragraphs_with_levels(XML_PATH)
-    _debug_log(f"[XML] paragraphs_ready={len(paragraphs)} mode={args.mode}")
-    para_msg = f"[INFO] 解析到 {len(paragraphs)} 段；示例： {paragraphs[:3]}"
+    if args.skip_docx:
+        # streamed from the XML while write_jsx consumes it
+        paragraphs = iter_paragraphs_with_levels(XML_PATH)
+    else:
+        # hand the tree over in-process; the XML (if written) is only a debug artifact
+        paragraphs = exporter.iter_paragraphs()
+    sample = list(islice(paragraphs, 3))
+    para_total = write_jsx(JSX_PATH, chain(sample, paragraphs))
+    _debug_log(f"[XML] paragraphs_ready={para_total} mode={args.mode}")
+    para_msg = f"[INFO] 解析到 {para_total} 段；示例： {sample}"
     print(para_msg)
     PIPELINE_LOGGER.user(para_msg)
-
-    write_jsx(JSX_PATH, paragraphs)
     PIPELINE_LOGGER.user(f"[JSX] 已生成 {JSX_PATH}")
 
     ran = False
-    if not args.no_run:
-        if AUTO_RUN_WINDOWS and sys.platform.startswith("win"):
-            ran = run_indesign_windows(JSX_PATH)
-        elif AUTO_RUN_MACOS and sys.platform == "darwin":
-            ran = run_indesign_macos(JSX_PATH)
+    if not args.no_run and runner is not None:
+        ran = run_jsx(JSX_PATH, runner)
 
     print("\n=== 完成 ===")
-    print("XML: ", XML_PATH)
-    print("JSX: ", JSX_PATH)
+    if args.skip_docx or write_xml:
+        print("XML: ", XML_PATH)
+    jsx_shown, data_shown = reported_jsx_paths(JSX_PATH)
+    print("JSX: ", jsx_shown)
+    if data_shown:
+        print("DATA:", data_shown)
     print("LOG: ", LOG_PATH)
     print("IDML:", IDML_OUT_PATH)
-    PIPELINE_LOGGER.user(f"[OUTPUT] XML: {XML_PATH}")
-    PIPELINE_LOGGER.user(f"[OUTPUT] JSX: {JSX_PATH}")
+    if args.skip_docx or write_xml:
+        PIPELINE_LOGGER.user(f"[OUTPUT] XML: {XML_PATH}")
+    PIPELINE_LOGGER.user(f"[OUTPUT] JSX: {jsx_shown}")
     PIPELINE_LOGGER.user(f"[OUTPUT] IDML: {IDML_OUT_PATH}")
 
     stats = _relay_jsx_events(